@@ -18,32 +18,87 @@ Examples:
     # Analyze single scenario
     python3 tools/workflow-sync/analyze-workflow-sync.py --scenario workflow-complet
 
+    # Delta analysis of what changed since the last report (e.g. in CI on pull requests)
+    python3 tools/workflow-sync/analyze-workflow-sync.py --since last-report
+
+    # Every project bootstrapped from bmad-templates, one combined report
+    python3 tools/workflow-sync/analyze-workflow-sync.py --projects '~/forks/*'
+
+    # Preview, then apply the proposals of the latest analysis
+    python3 tools/workflow-sync/analyze-workflow-sync.py --apply --dry-run
+    python3 tools/workflow-sync/analyze-workflow-sync.py --apply
+
 Options:
     --dry-run       Use cached data or mock data, no LLM API calls
     --verbose       Enable DEBUG logging (prompts, tokens, file ops)
-    --scenario      Analyze single scenario: workflow-complet, quick-flow, document-project
+    --scenario      Analyze single scenario (any directory under bmad-templates/stories/)
+    --since         Delta analysis of what changed since a commit or the last report
+    --fresh         Do not resume an interrupted run
+    --max-tokens-per-call N
+                    Split/trim prompts estimated above N input tokens
+    --max-cost USD  Hard ceiling on run cost, checked before every LLM call
+    --call-timeout SECONDS
+                    Per-call deadline (default 600)
+    --deadline SECONDS
+                    Total run deadline, checked before every LLM call
+    --hedge [SECONDS|p95]
+                    Duplicate calls slower than SECONDS (default: past p95)
+    --combined      Analyze all scenarios in one call (workflow corpus sent once)
+    --apply [RESULTS_JSON]
+                    Apply the proposals of the latest (or given) results file;
+                    combine with --dry-run to preview
+    --progress fd:N|unix:PATH
+                    Stream NDJSON progress events (scan, cache, LLM tokens,
+                    actions, report) to a file descriptor or unix socket
+    --serve [stdio|unix:PATH]
+                    Persistent JSON-RPC worker (analyze, scan, report, cache-stats)
+    --queue DIR     Distribute scenario analyses as jobs in a queue directory
+    --queue-worker DIR
+                    Run jobs from a queue directory (any host sharing it)
+    --projects LIST|GLOB
+                    Analyze several projects concurrently (comma-separated
+                    paths or globs, @FILE for a list), one combined report
+    --cache-dir DIR Analysis cache shared between projects/checkouts
     --help          Show this help message
 
 Cost Warning:
-    Full analysis costs ~$0.54 per run. Use --dry-run first to validate.
+    Full analysis costs ~$0.54 per run. Use --dry-run first to validate,
+    and --max-cost for scheduled runs. Each run writes a cost ledger
+    (estimated vs actual) next to the report.
 """
 
 import os
 import sys
 import logging
 import argparse
+import asyncio
+import difflib
+import email.utils
+import functools
+import glob
 import hashlib
+import io
 import json
+import random
+import re
+import socket
+import socketserver
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from typing import Callable, Dict, List, Any, Iterable, Optional, Tuple
 import time
 
 try:
     import frontmatter
     from dotenv import load_dotenv
     import yaml
-    from litellm import completion
+    from litellm import completion, acompletion, stream_chunk_builder, supports_response_schema
+    from litellm import (RateLimitError, APIConnectionError, Timeout, ServiceUnavailableError,
+                         InternalServerError, BadGatewayError, BadRequestError, UnsupportedParamsError)
 except ImportError as e:
     print(f"ERROR: Missing required dependency: {e}")
     print("Install with: pip install -r tools/workflow-sync/requirements.txt")
@@ -54,6 +109,109 @@ except ImportError as e:
 # CONFIGURATION & LOGGING
 # ============================================================================
 
+# Historical scenario order (discovered scenarios not listed here follow alphabetically).
+# The first scenario containing a shared story owns its analysis.
+SCENARIO_ORDER = ['workflow-complet', 'quick-flow', 'document-project']
+
+# Workflow categories covered by each scenario (matched on scenario name substring)
+SCENARIO_COVERAGE = {
+    'workflow-complet': [
+        '1-analysis', '2-plan-workflows', '3-solutioning', '4-implementation',
+        'testarch',  # TEA workflows are INTEGRATED into story generation, not separate scenarios
+        'qa'         # QA automation enriches workflow-complet
+    ],
+    'quick-flow': ['bmad-quick-flow'],
+    'document-project': [
+        'document-project',
+        'generate-project-context', 'excalidraw-diagrams'  # These enrich document-project scenario
+    ],
+}
+
+# Workflow directories scanned, relative to bmad-templates/_bmad
+WORKFLOW_DIRS = {'BMM': 'bmm/workflows', 'TEA': 'tea/workflows'}
+
+# Prompt excerpt sizes (stories are sent as digests, see extract_story_digest)
+WORKFLOW_BODY_CHARS = 2000  # Increased to 2000 chars for step-based workflows
+
+# Workflow references in story bodies: workflow file paths and bmad-* commands
+WORKFLOW_REF_PATTERN = re.compile(r'_bmad/[\w./-]+?/workflow\.(?:md|yaml)|\bbmad-[\w-]+/[\w-]+')
+
+# Keys every cached scenario analysis must contain
+ANALYSIS_REQUIRED_KEYS = ['stories_to_delete', 'stories_to_modify', 'stories_to_add']
+
+# Part of every cache key: bump when a prompt or the response schema changes
+# (the scenario instructions text is also hashed into scenario keys)
+PROMPT_SCHEMA_VERSION = 3
+
+# Frontmatter fields that do not change an analysis, left out of checksums
+CHECKSUM_IGNORED_FRONTMATTER = {'updated', 'updated_at', 'last_updated', 'modified', 'last_modified', 'date_modified'}
+
+# Pricing in USD per 1M tokens (input, output), matched on the longest substring of the model name.
+# Override for BASE_MODEL with BASE_PRICE_INPUT / BASE_PRICE_OUTPUT in .env
+MODEL_PRICING = {
+    'opus': (15.0, 75.0),
+    'sonnet': (3.0, 15.0),
+    'haiku': (0.80, 4.0),
+    'gpt-4o-mini': (0.15, 0.60),
+    'gpt-4o': (2.50, 10.0),
+    'gpt-4': (30.0, 60.0),
+}
+DEFAULT_PRICING = (15.0, 75.0)  # Unknown models are priced like the most expensive tier
+
+# Optional numeric .env settings and their types
+NUMERIC_SETTINGS = {
+    'BASE_PRICE_INPUT': float,
+    'BASE_PRICE_OUTPUT': float,
+    'FAST_PRICE_INPUT': float,
+    'FAST_PRICE_OUTPUT': float,
+    'ROUTING_FAST_MAX_STORIES': int,
+    'ROUTING_FAST_MAX_CHANGE': float,
+    'ROUTING_FAST_MAX_TOKENS': int,
+    'RATE_LIMIT_RPM': int,
+    'RATE_LIMIT_TPM': int,
+    'RATE_LIMIT_CONCURRENCY': int,
+    'BASE_CONTEXT_TOKENS': int,
+}
+
+# Cheap-first routing (only active when FAST_MODEL is set in .env):
+# a call goes to FAST_MODEL when it sends few stories OR little changed since the last
+# analysis, and always fits the fast model's prompt limit. Overridable in .env.
+ROUTING_DEFAULTS = {
+    'ROUTING_FAST_MAX_STORIES': 6,     # Stories sent in full in the call
+    'ROUTING_FAST_MAX_CHANGE': 0.2,    # Fraction of stories/workflows changed since last analysis
+    'ROUTING_FAST_MAX_TOKENS': 100000,  # Estimated prompt tokens
+}
+
+# Client-side rate limiting per endpoint (see RateLimiter). RPM/TPM are unlimited unless set
+# in .env or reported by the provider's x-ratelimit-limit-* headers.
+RATE_LIMIT_DEFAULTS = {
+    'RATE_LIMIT_CONCURRENCY': 4,  # Max calls in flight to one endpoint
+}
+RATE_LIMIT_MAX_RETRIES = 6   # Retries of one call on rate-limit (429) and transport errors
+RATE_LIMIT_BASE_DELAY = 1.0  # Seconds, doubled per retry (full jitter) when no Retry-After is given
+RATE_LIMIT_MAX_DELAY = 60.0
+
+# Per-call deadline (--call-timeout) and hedged requests (--hedge)
+DEFAULT_CALL_TIMEOUT = 600.0  # Seconds; a stuck upstream request fails (and is retried) instead of hanging
+HEDGE_MIN_SAMPLES = 5         # Past calls of a model needed before --hedge p95 is trusted
+HEDGE_HISTORY_LEDGERS = 20    # Newest cost ledgers read for the latency history
+
+# Combined analysis (--combined): all scenarios in one call while the estimated prompt and
+# completions fit BASE_MODEL's context window, per-scenario calls otherwise. Overridable in .env.
+CONTEXT_DEFAULTS = {
+    'BASE_CONTEXT_TOKENS': 200000,
+}
+
+# Structured output (STRUCTURED_OUTPUT in .env): 'json_schema' sends the response schema as
+# response_format, 'tool' as the arguments of a forced tool call, 'off' keeps the text path;
+# 'auto' uses json_schema when litellm knows the model supports it
+STRUCTURED_OUTPUT_MODES = ('auto', 'json_schema', 'tool', 'off')
+
+# Offline token estimation: JSON-heavy prompts average ~3.5 chars per token (conservative)
+CHARS_PER_TOKEN = 3.5
+# Completion size assumed for pre-flight cost estimates
+ESTIMATED_OUTPUT_TOKENS = 4000
+
 def setup_logging(verbose: bool = False) -> logging.Logger:
     """Setup logging with appropriate level based on verbosity."""
     level = logging.DEBUG if verbose else logging.INFO
@@ -77,6 +235,8 @@ def load_llm_config(logger: logging.Logger) -> Dict[str, str]:
 
     Returns:
         Dict with BASE_URL, BASE_KEY, BASE_MODEL
+        (+ optional FAST_MODEL/FAST_URL/FAST_KEY, pricing overrides, routing thresholds,
+        STRUCTURED_OUTPUT mode)
 
     Raises:
         SystemExit if configuration invalid or insecure
@@ -125,15 +285,250 @@ def load_llm_config(logger: logging.Logger) -> Dict[str, str]:
         logger.error(f"Missing required environment variables: {', '.join(missing)}")
         sys.exit(1)
 
+    # Optional fast tier for cheap-first routing (endpoint and key default to BASE_*)
+    if os.getenv('FAST_MODEL'):
+        config['FAST_MODEL'] = os.getenv('FAST_MODEL')
+        config['FAST_URL'] = os.getenv('FAST_URL') or config['BASE_URL']
+        config['FAST_KEY'] = os.getenv('FAST_KEY') or config['BASE_KEY']
+
+    config['STRUCTURED_OUTPUT'] = (os.getenv('STRUCTURED_OUTPUT') or 'auto').lower()
+    if config['STRUCTURED_OUTPUT'] not in STRUCTURED_OUTPUT_MODES:
+        logger.error(f"Invalid STRUCTURED_OUTPUT: {config['STRUCTURED_OUTPUT']!r} "
+                     f"(expected one of {', '.join(STRUCTURED_OUTPUT_MODES)})")
+        sys.exit(1)
+
+    # Optional pricing overrides (USD per 1M tokens), routing thresholds, rate limits, context size
+    config.update(ROUTING_DEFAULTS)
+    config.update(RATE_LIMIT_DEFAULTS)
+    config.update(CONTEXT_DEFAULTS)
+    for key, cast in NUMERIC_SETTINGS.items():
+        value = os.getenv(key)
+        if value:
+            try:
+                config[key] = cast(value)
+            except ValueError:
+                logger.error(f"Invalid {key}: {value!r} (expected {cast.__name__})")
+                sys.exit(1)
+
     # Log masked credentials
     key = config['BASE_KEY']
     masked_key = f"{key[:4]}...{key[-4:]}" if len(key) > 8 else "****"
     logger.info(f"LLM Config loaded: {config['BASE_MODEL']} at {config['BASE_URL']}")
     logger.debug(f"API Key (masked): {masked_key}")
+    if 'FAST_MODEL' in config:
+        logger.info(f"Fast tier enabled: {config['FAST_MODEL']} at {config['FAST_URL']}")
 
     return config
 
 
+# ============================================================================
+# COMPACT RECORDS & PROMPT WRITER
+# ============================================================================
+
+class WorkflowRecord:
+    """
+    Compact scanned workflow: identity, checksum and name/description only.
+
+    The parsed frontmatter, body excerpt or YAML config are re-read from
+    disk on demand (load_content) instead of being held for the whole run.
+    """
+
+    __slots__ = ('category', 'name', 'type', 'path', 'source', 'checksum', 'title', 'description')
+
+    def __init__(self, category: str, name: str, wf_type: str, path: str, source: Path,
+                 checksum: str, title: str, description: str):
+        self.category = category
+        self.name = name
+        self.type = wf_type
+        self.path = path
+        self.source = source
+        self.checksum = checksum
+        self.title = title
+        self.description = description
+
+    def load_content(self) -> Dict[str, Any]:
+        """Parse the workflow file (frontmatter + body excerpt, or YAML config)."""
+        with open(self.source, 'r', encoding='utf-8') as f:
+            if self.type == 'md':
+                fm = frontmatter.load(f)
+                return {
+                    'name': self.title,
+                    'description': self.description,
+                    'frontmatter': fm.metadata,
+                    'body': fm.content[:WORKFLOW_BODY_CHARS]
+                }
+            return {
+                'name': self.title,
+                'description': self.description,
+                'config': yaml.safe_load(f)
+            }
+
+    def to_prompt(self) -> Dict[str, Any]:
+        """Return the prompt representation (content loaded on demand)."""
+        return {'type': self.type, 'content': self.load_content(), 'checksum': self.checksum, 'path': self.path}
+
+
+class StoryRecord:
+    """
+    Compact scanned story: filename parts, frontmatter and content hash.
+
+    Prompts carry the story's digest (see extract_story_digest), parsed on
+    demand and cached by content hash; the full text is only sent when the
+    story is to be modified (see request_story_edits).
+    'analyzed_in' is set when the story is only referenced in prompts
+    (analyzed in another scenario/call, or unchanged in a delta run).
+    """
+
+    __slots__ = ('file_path', 'filename', 'wave', 'epic', 'story', 'slug',
+                 'frontmatter', 'content_hash', 'analyzed_in', 'preview_limit')
+
+    def __init__(self, story_path: Path, metadata: Dict, content_hash: str):
+        # Parse Wave-Epic-Story from filename (e.g., 1-1-0-quick-spec.md)
+        parts = story_path.stem.split('-')
+        self.file_path = str(story_path)
+        self.filename = story_path.name
+        self.wave = parts[0] if len(parts) > 0 else ''
+        self.epic = parts[1] if len(parts) > 1 else ''
+        self.story = parts[2] if len(parts) > 2 else ''
+        self.slug = '-'.join(parts[3:]) if len(parts) > 3 else ''
+        self.frontmatter = metadata
+        self.content_hash = content_hash
+        self.analyzed_in = None
+        self.preview_limit = None  # Chars of acceptance criteria sent (None: all)
+
+    def digest(self) -> Dict[str, Any]:
+        """Structured digest of the story body (parsed once per content hash)."""
+        with STORY_DIGESTS_LOCK:
+            digest = STORY_DIGESTS.get(self.content_hash)
+            if digest is not None:
+                STORY_DIGESTS.move_to_end(self.content_hash)
+                return digest
+        with open(self.file_path, 'r', encoding='utf-8') as f:
+            digest = extract_story_digest(frontmatter.load(f).content)
+        with STORY_DIGESTS_LOCK:
+            STORY_DIGESTS[self.content_hash] = digest
+            while len(STORY_DIGESTS) > STORY_DIGESTS_MAX:
+                STORY_DIGESTS.popitem(last=False)
+        return digest
+
+    def trimmed(self, limit: int) -> 'StoryRecord':
+        """Return a copy whose prompt digest keeps at most limit chars of acceptance criteria."""
+        copy = StoryRecord.__new__(StoryRecord)
+        for slot in StoryRecord.__slots__:
+            setattr(copy, slot, getattr(self, slot))
+        copy.preview_limit = limit if self.preview_limit is None else min(limit, self.preview_limit)
+        return copy
+
+    def cache_token(self) -> str:
+        """
+        Stable string identifying what the prompt sends for this story.
+        Uses the filename, not file_path, so it is the same in any checkout.
+        """
+        return f"{self.filename}|{self.content_hash}|{self.analyzed_in}|{self.preview_limit}"
+
+    def to_prompt(self) -> Dict[str, Any]:
+        """Return the prompt representation (digest loaded on demand)."""
+        digest = self.digest()
+        criteria = digest['acceptance_criteria']
+        if self.preview_limit is not None:
+            kept, used = [], 0
+            for criterion in criteria:
+                used += len(criterion)
+                if used > self.preview_limit:
+                    break
+                kept.append(criterion)
+            criteria = kept
+        prompt = {
+            'filename': self.filename,
+            'wave': self.wave,
+            'epic': self.epic,
+            'story': self.story,
+            'title': digest['title'],
+            'status': digest['status'],
+            'user_story': digest['user_story'],
+            'acceptance_criteria': criteria,
+            'workflow_refs': digest['workflow_refs'],
+            'sections': digest['sections']
+        }
+        if self.frontmatter:
+            prompt['frontmatter'] = self.frontmatter
+        return prompt
+
+
+class PromptWriter:
+    """
+    Assemble a prompt in a single buffer.
+
+    Records are serialized one at a time straight into the buffer, so no
+    intermediate json.dumps copy of the whole corpus is ever built.
+    """
+
+    __slots__ = ('buffer',)
+
+    def __init__(self):
+        self.buffer = io.StringIO()
+
+    def text(self, text: str) -> 'PromptWriter':
+        self.buffer.write(text)
+        return self
+
+    def json(self, obj: Any) -> 'PromptWriter':
+        json.dump(obj, self.buffer, default=str)
+        return self
+
+    def json_list(self, items: Iterable[Any]) -> 'PromptWriter':
+        """Write a JSON array with one item per line."""
+        self.buffer.write('[')
+        for index, item in enumerate(items):
+            self.buffer.write(',\n  ' if index else '\n  ')
+            self.json(item)
+        self.buffer.write('\n]')
+        return self
+
+    def workflows(self, workflows_data: Dict) -> 'PromptWriter':
+        """Write {category: {workflow_name: record}} with one workflow per line."""
+        self.buffer.write('{')
+        for cat_index, (category, wfs) in enumerate(workflows_data.items()):
+            self.buffer.write(',\n  ' if cat_index else '\n  ')
+            self.json(category).text(': {')
+            for wf_index, (wf_name, record) in enumerate(wfs.items()):
+                self.buffer.write(',\n    ' if wf_index else '\n    ')
+                self.json(wf_name).text(': ').json(record.to_prompt())
+            self.buffer.write('\n  }')
+        self.buffer.write('\n}')
+        return self
+
+    def getvalue(self) -> str:
+        return self.buffer.getvalue()
+
+
+@functools.lru_cache(maxsize=4)
+def render_workflow_records(records: Tuple[Tuple[str, Tuple[WorkflowRecord, ...]], ...]) -> str:
+    """Render workflow records once per distinct set (prompts of a run share it)."""
+    return PromptWriter().workflows({
+        category: {record.name: record for record in wfs}
+        for category, wfs in records
+    }).getvalue()
+
+
+def render_workflows(workflows_data: Dict) -> str:
+    """Render {category: {name: WorkflowRecord}} for a prompt."""
+    return render_workflow_records(tuple(
+        (category, tuple(wfs.values())) for category, wfs in workflows_data.items()
+    ))
+
+
+def get_peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process in MB (None where unsupported)."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS, kilobytes elsewhere
+    return round(peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024, 1)
+
+
 # ============================================================================
 # FILE SCANNING & CHECKSUM
 # ============================================================================
@@ -156,25 +551,23 @@ def validate_path_safety(path: Path, project_root: Path) -> bool:
         return False
 
 
-def scan_workflows(base_path: Path, logger: logging.Logger) -> Dict[str, Any]:
+def scan_workflows(base_path: Path, logger: logging.Logger,
+                   project_root: Optional[Path] = None) -> Dict[str, Dict[str, WorkflowRecord]]:
     """
     Recursively scan BMAD workflows and extract metadata with checksums.
 
     Returns dict structure:
     {
         'category': {
-            'workflow_name': {
-                'type': 'md' | 'yaml',
-                'content': {...parsed frontmatter...},
-                'checksum': 'sha256...',
-                'path': 'relative/path'
-            }
+            'workflow_name': WorkflowRecord(type, path, checksum, ...)
         }
     }
+    Workflow content is loaded on demand (WorkflowRecord.load_content).
+    Paths outside project_root (default: current directory) are skipped.
     """
     logger.info(f"Scanning workflows in {base_path}")
 
-    project_root = Path.cwd()
+    project_root = project_root or Path.cwd()
     workflows = {}
 
     # Find all workflow.md and workflow.yaml files
@@ -194,29 +587,17 @@ def scan_workflows(base_path: Path, logger: logging.Logger) -> Dict[str, Any]:
             parts = relative_path.parts
             category = parts[0] if len(parts) > 1 else "root"
 
-            # Parse file based on type
-            if wf_path.suffix == ".md":
-                with open(wf_path, 'r', encoding='utf-8') as f:
-                    fm = frontmatter.load(f)
-                    content = {
-                        'name': fm.get('name', ''),
-                        'description': fm.get('description', ''),
-                        'frontmatter': fm.metadata,
-                        'body': fm.content[:2000]  # Increased to 2000 chars for step-based workflows
-                    }
+            # Parse file based on type (only name/description are kept)
+            with open(wf_path, 'r', encoding='utf-8') as f:
+                if wf_path.suffix == ".md":
+                    post = frontmatter.load(f)
+                    meta = post.metadata
                     wf_type = 'md'
-            else:  # .yaml
-                with open(wf_path, 'r', encoding='utf-8') as f:
-                    data = yaml.safe_load(f)
-                    content = {
-                        'name': data.get('name', ''),
-                        'description': data.get('description', ''),
-                        'config': data
-                    }
+                    checksum = compute_content_hash(meta, post.content)
+                else:  # .yaml
+                    meta = yaml.safe_load(f)
                     wf_type = 'yaml'
-
-            # Compute checksum
-            checksum = compute_checksum(wf_path)
+                    checksum = compute_content_hash(meta)
 
             # Store in structure
             if category not in workflows:
@@ -224,12 +605,10 @@ def scan_workflows(base_path: Path, logger: logging.Logger) -> Dict[str, Any]:
 
             workflow_name = wf_path.parent.name if wf_path.name in ['workflow.md', 'workflow.yaml'] else wf_path.stem
 
-            workflows[category][workflow_name] = {
-                'type': wf_type,
-                'content': content,
-                'checksum': checksum,
-                'path': str(relative_path)
-            }
+            workflows[category][workflow_name] = WorkflowRecord(
+                category, workflow_name, wf_type, str(relative_path), wf_path, checksum,
+                meta.get('name', ''), meta.get('description', '')
+            )
 
             logger.debug(f"Scanned {category}/{workflow_name}: {checksum}")
 
@@ -241,14 +620,115 @@ def scan_workflows(base_path: Path, logger: logging.Logger) -> Dict[str, Any]:
     return workflows
 
 
-def scan_stories(scenario_path: Path, logger: logging.Logger) -> List[Dict[str, Any]]:
+def normalize_markdown_body(text: str) -> str:
+    """Normalize a markdown body (line endings, trailing whitespace, blank line runs) before hashing."""
+    lines = text.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+    return re.sub(r'\n{3,}', '\n\n', '\n'.join(line.rstrip() for line in lines)).strip()
+
+
+def canonical_frontmatter(metadata: Dict) -> str:
+    """Key-order independent frontmatter, without fields irrelevant to the analysis."""
+    relevant = {k: v for k, v in (metadata or {}).items() if k not in CHECKSUM_IGNORED_FRONTMATTER}
+    return json.dumps(relevant, sort_keys=True, default=str, ensure_ascii=False)
+
+
+def compute_content_hash(metadata: Dict, body: str = '') -> str:
+    """
+    Compute SHA256 checksum of a document's semantically relevant content:
+    canonical frontmatter (or YAML config) and whitespace-normalized body.
+    Reformatting, key order or an ignored field leave it unchanged.
+    """
+    normalized = f"{canonical_frontmatter(metadata)}\n{normalize_markdown_body(body)}"
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()[:16]
+
+
+# Story digests by content hash: identical stories (across scenarios and projects) are parsed once.
+# Least recently used entries are evicted past STORY_DIGESTS_MAX so a --serve worker stays bounded.
+STORY_DIGESTS_MAX = 4096
+STORY_DIGESTS: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+STORY_DIGESTS_LOCK = threading.Lock()
+
+
+def extract_story_digest(body: str) -> Dict[str, Any]:
+    """
+    Compact structured view of a story body: title, status, user story,
+    acceptance criteria (complete, never cut), workflow references and
+    section headings. Headings inside code blocks are ignored.
+    """
+    digest = {'title': '', 'status': '', 'user_story': '', 'acceptance_criteria': [],
+              'workflow_refs': sorted(set(WORKFLOW_REF_PATTERN.findall(body))), 'sections': []}
+    user_story = []
+    section = ''
+    in_fence = False
+
+    for line in body.splitlines():
+        stripped = line.strip()
+        if stripped.startswith('```'):
+            in_fence = not in_fence
+            continue
+        if in_fence or not stripped:
+            continue
+        if line.startswith('#'):
+            heading = line.lstrip('#').strip()
+            if line.startswith('# ') and not digest['title']:
+                digest['title'] = heading
+            else:
+                digest['sections'].append(heading)
+                section = heading.lower()
+            continue
+
+        status = re.match(r'\*\*Status:\*\*\s*(.+)', stripped)
+        if status and not digest['status']:
+            digest['status'] = status.group(1).strip()
+        elif section.startswith('user story'):
+            user_story.append(stripped.replace('**', ''))
+        elif section.startswith('acceptance criteria'):
+            item = re.match(r'(?:\d+[.)]|[-*])\s+(?:\[[ xX]\]\s*)?(.+)', stripped)
+            if item:
+                digest['acceptance_criteria'].append(item.group(1))
+            elif digest['acceptance_criteria']:
+                digest['acceptance_criteria'][-1] += f" {stripped}"  # Continuation line
+
+    digest['user_story'] = ' '.join(user_story)
+    return digest
+
+
+def discover_scenarios(stories_base: Path, logger: logging.Logger) -> Dict[str, Path]:
+    """
+    Discover scenario directories under the stories base path.
+
+    Every subdirectory containing at least one story file is a scenario.
+    Known scenarios keep their historical order, others follow alphabetically.
+    """
+    if not stories_base.exists():
+        logger.warning(f"Stories path does not exist: {stories_base}")
+        return {}
+
+    found = {
+        path.name: path
+        for path in stories_base.iterdir()
+        if path.is_dir() and any(path.glob("*.md"))
+    }
+
+    def order(name: str):
+        if name in SCENARIO_ORDER:
+            return (0, SCENARIO_ORDER.index(name), name)
+        return (1, 0, name)
+
+    scenarios = {name: found[name] for name in sorted(found, key=order)}
+    logger.info(f"Discovered {len(scenarios)} scenarios: {', '.join(scenarios)}")
+    return scenarios
+
+
+def scan_stories(scenario_path: Path, logger: logging.Logger) -> List[StoryRecord]:
     """
     Scan story files in a scenario directory and extract metadata.
 
-    Returns list of story objects with:
+    Returns list of StoryRecord with:
     - file_path, wave, epic, story, slug
     - frontmatter metadata
-    - content preview
+    - content_hash (normalized content, identical across scenarios)
+    The digest is parsed on demand when a prompt is built.
     """
     logger.info(f"Scanning stories in {scenario_path}")
 
@@ -263,26 +743,9 @@ def scan_stories(scenario_path: Path, logger: logging.Logger) -> List[Dict[str,
 
     for story_path in story_files:
         try:
-            with open(story_path, 'r', encoding='utf-8') as f:
-                fm = frontmatter.load(f)
-
-                # Parse Wave-Epic-Story from filename (e.g., 1-1-0-quick-spec.md)
-                filename = story_path.stem
-                parts = filename.split('-')
-
-                story_obj = {
-                    'file_path': str(story_path),
-                    'filename': story_path.name,
-                    'wave': parts[0] if len(parts) > 0 else '',
-                    'epic': parts[1] if len(parts) > 1 else '',
-                    'story': parts[2] if len(parts) > 2 else '',
-                    'slug': '-'.join(parts[3:]) if len(parts) > 3 else '',
-                    'frontmatter': fm.metadata,
-                    'content_preview': fm.content[:1000]  # Increased to 1000 chars for ACs and workflow refs
-                }
-
-                stories.append(story_obj)
-                logger.debug(f"Scanned story: {story_path.name}")
+            post = frontmatter.loads(story_path.read_text(encoding='utf-8'))
+            stories.append(StoryRecord(story_path, post.metadata, compute_content_hash(post.metadata, post.content)))
+            logger.debug(f"Scanned story: {story_path.name}")
 
         except Exception as e:
             logger.warning(f"Failed to parse {story_path}: {e}")
@@ -292,44 +755,189 @@ def scan_stories(scenario_path: Path, logger: logging.Logger) -> List[Dict[str,
     return stories
 
 
+# ============================================================================
+# CROSS-SCENARIO DEDUPLICATION
+# ============================================================================
+
+def build_story_index(scenario_stories: Dict[str, List[StoryRecord]]) -> Dict[str, List[str]]:
+    """
+    Group stories by content hash across scenarios.
+
+    Returns {content_hash: [scenario_name, ...]} in scenario order.
+    """
+    index = {}
+    for scenario_name, stories in scenario_stories.items():
+        for story in stories:
+            scenarios = index.setdefault(story.content_hash, [])
+            if scenario_name not in scenarios:
+                scenarios.append(scenario_name)
+    return index
+
+
+def assign_story_owners(scenario_stories: Dict[str, List[StoryRecord]], logger: logging.Logger) -> Dict[str, str]:
+    """
+    Assign each unique story to the first scenario containing it.
+
+    Only the owner sends the story to the LLM; other scenarios reference it
+    by filename and receive the owner's verdict. Sets every story's
+    analyzed_in (owner scenario, or None when the story is owned).
+
+    Returns {content_hash: owner_scenario}.
+    """
+    owners = {}
+    for scenario_name, stories in scenario_stories.items():
+        for story in stories:
+            owner = owners.setdefault(story.content_hash, scenario_name)
+            story.analyzed_in = owner if owner != scenario_name else None
+
+    total = sum(len(stories) for stories in scenario_stories.values())
+    logger.info(f"Story deduplication: {len(owners)} unique of {total} stories")
+    return owners
+
+
+def share_story_verdicts(
+    analysis_results: Dict[str, Dict],
+    scenario_stories: Dict[str, List[StoryRecord]],
+    story_index: Dict[str, List[str]],
+    logger: logging.Logger,
+    receivers: Iterable[str] = ()
+) -> Dict[str, Dict]:
+    """
+    Propagate delete/modify verdicts of shared stories to every scenario containing them.
+
+    Verdicts on a shared story are only trusted from its owner scenario.
+    'affects_other_scenarios' is recomputed from the story index rather than
+    taken from the LLM. receivers are scenarios not analyzed in this run that
+    still receive the verdicts on the stories they share (they get a result
+    with only those verdicts). Returns new result dicts (cached results are not mutated).
+    """
+    by_filename = {
+        scenario_name: {s.filename: s for s in stories}
+        for scenario_name, stories in scenario_stories.items()
+    }
+    shared = {
+        scenario_name: {'stories_to_delete': [], 'stories_to_modify': []}
+        for scenario_name in list(analysis_results) + list(receivers)
+    }
+    results = {}
+
+    for scenario_name, result in analysis_results.items():
+        result = dict(result)
+        stories = by_filename.get(scenario_name, {})
+
+        for key in ('stories_to_delete', 'stories_to_modify'):
+            kept = []
+            for item in result.get(key, []):
+                story = stories.get(Path(item.get('file_path', '')).name)
+                if story is None:
+                    kept.append(item)
+                    continue
+                if story.analyzed_in:
+                    logger.warning(f"Ignoring {key} verdict on shared story {story.filename} "
+                                   f"in {scenario_name} (analyzed in {story.analyzed_in})")
+                    continue
+
+                others = [name for name in story_index.get(story.content_hash, []) if name != scenario_name]
+                item = dict(item, affects_other_scenarios=others)
+                kept.append(item)
+
+                for other in others:
+                    if other in shared:
+                        shared[other][key].append(dict(
+                            item,
+                            file_path=f"stories/{other}/{story.filename}",
+                            affects_other_scenarios=[n for n in story_index[story.content_hash] if n != other],
+                            shared_from=scenario_name
+                        ))
+            result[key] = kept
+
+        results[scenario_name] = result
+
+    for scenario_name, items in shared.items():
+        for key, shared_items in items.items():
+            if shared_items:
+                results.setdefault(scenario_name, {name: [] for name in ANALYSIS_REQUIRED_KEYS})
+                results[scenario_name][key] = results[scenario_name].get(key, []) + shared_items
+                logger.debug(f"Shared {len(shared_items)} {key} verdicts into {scenario_name}")
+
+    return results
+
+
 # ============================================================================
 # CACHE MANAGEMENT
 # ============================================================================
 
 def get_cache_key(workflows_checksums: Dict, scenario_name: str, stories_data: List = None) -> str:
-    """Generate cache key from workflow and story checksums and scenario."""
+    """
+    Generate cache key from workflow and story checksums, scenario and prompt version.
+
+    Checksums are normalized (compute_content_hash) and paths repo-relative,
+    so the key is the same across checkouts and formatting-only edits.
+    """
     # Flatten all workflow checksums
     all_checksums = []
     for category, wfs in workflows_checksums.items():
         for wf_name, wf_data in wfs.items():
-            all_checksums.append(wf_data['checksum'])
+            all_checksums.append(f"{category}/{wf_name}:{wf_data.checksum}")
 
     # Add story file checksums if provided
     if stories_data:
         for story in stories_data:
             # Compute checksum of story file
-            story_checksum = hashlib.sha256(str(story).encode()).hexdigest()[:16]
+            story_checksum = hashlib.sha256(story.cache_token().encode()).hexdigest()[:16]
             all_checksums.append(story_checksum)
 
     # Sort for consistency
     all_checksums.sort()
-    combined = f"{scenario_name}:{''.join(all_checksums)}"
+    prompt_version = hashlib.sha256(SCENARIO_PROMPT_INSTRUCTIONS.encode()).hexdigest()[:8]
+    combined = f"v{PROMPT_SCHEMA_VERSION}-{prompt_version}:{scenario_name}:{''.join(all_checksums)}"
 
     return hashlib.sha256(combined.encode()).hexdigest()[:16]
 
 
-def load_from_cache(cache_path: Path, cache_key: str, logger: logging.Logger) -> Optional[Dict]:
+def get_new_scenarios_cache_key(all_workflows: Dict, uncovered: List[str], existing_scenarios: List[str]) -> str:
+    """Generate cache key for new scenario detection from the uncovered categories' checksums."""
+    checksums = sorted(
+        f"{category}/{wf_name}:{wf_data.checksum}"
+        for category in uncovered
+        for wf_name, wf_data in all_workflows[category].items()
+    )
+    combined = f"v{PROMPT_SCHEMA_VERSION}:new-scenarios:{','.join(sorted(existing_scenarios))}:{''.join(checksums)}"
+    return f"new-scenarios-{hashlib.sha256(combined.encode()).hexdigest()[:16]}"
+
+
+def compute_run_fingerprint(all_workflows: Dict, scenario_stories: Dict[str, List[StoryRecord]]) -> str:
+    """Fingerprint the run inputs (workflow checksums + story content) for journal resumption."""
+    checksums = sorted(
+        f"{category}/{wf_name}:{wf_data.checksum}"
+        for category, wfs in all_workflows.items()
+        for wf_name, wf_data in wfs.items()
+    )
+    checksums += sorted(
+        f"{scenario_name}/{story.filename}:{story.content_hash}"
+        for scenario_name, stories in scenario_stories.items()
+        for story in stories
+    )
+    return hashlib.sha256(''.join(checksums).encode()).hexdigest()[:16]
+
+
+def load_from_cache(
+    cache_path: Path,
+    cache_key: str,
+    logger: logging.Logger,
+    required_keys: List[str] = ANALYSIS_REQUIRED_KEYS
+) -> Optional[Dict]:
     """Load cached analysis result if exists and valid."""
     cache_file = cache_path / f"{cache_key}.json"
 
     if cache_file.exists():
         logger.info(f"Cache HIT: {cache_key}")
+        PROGRESS.emit('cache_hit', key=cache_key)
         try:
             with open(cache_file, 'r') as f:
                 data = json.load(f)
 
             # Validate cache has required schema
-            required_keys = ['stories_to_delete', 'stories_to_modify', 'stories_to_add']
             if all(key in data for key in required_keys):
                 return data
             else:
@@ -340,607 +948,3623 @@ def load_from_cache(cache_path: Path, cache_key: str, logger: logging.Logger) ->
             return None
 
     logger.info(f"Cache MISS: {cache_key}")
+    PROGRESS.emit('cache_miss', key=cache_key)
     return None
 
 
-def save_to_cache(cache_path: Path, cache_key: str, data: Dict, logger: logging.Logger):
-    """Save analysis result to cache."""
-    cache_path.mkdir(parents=True, exist_ok=True)
-    cache_file = cache_path / f"{cache_key}.json"
+def write_json_atomic(path: Path, data: Any):
+    """Write JSON atomically (see write_text_atomic)."""
+    write_text_atomic(path, json.dumps(data, indent=2))
+
+
+def write_text_atomic(path: Path, text: str):
+    """
+    Write to a temporary file in the same directory, then rename it over
+    the target, so concurrent readers never see a partially written file.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    mode = path.stat().st_mode & 0o777 if path.exists() else 0o644
+    fd, tmp_name = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    try:
+        os.fchmod(fd, mode)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except OSError:
+            pass
+        raise
 
-    with open(cache_file, 'w') as f:
-        json.dump(data, f, indent=2)
 
+def save_to_cache(cache_path: Path, cache_key: str, data: Dict, logger: logging.Logger):
+    """Save analysis result to cache (atomically, safe for concurrent runs)."""
+    write_json_atomic(cache_path / f"{cache_key}.json", data)
     logger.debug(f"Saved to cache: {cache_key}")
 
 
-# ============================================================================
-# LLM ANALYSIS
-# ============================================================================
+class CacheLock:
+    """
+    Lock file guarding the computation of one cache key across processes.
 
-def validate_llm_response(response: Dict, workflows_data: Dict, stories_data: List, logger: logging.Logger) -> bool:
+    Created with O_CREAT|O_EXCL and holding the owner's pid, host, start time
+    and a random token identifying this acquisition. The owner touches the
+    file every HEARTBEAT_SECONDS while it computes; a lock is stale when its
+    owner process is gone (same host) or its heartbeat is older than
+    STALE_SECONDS (other hosts sharing the cache directory).
     """
-    Validate LLM response to ensure all referenced files exist.
 
-    Checks:
-    - stories_to_delete reference existing stories
-    - stories_to_modify reference existing stories
-    - stories_to_add follow naming convention
-    - No duplicate filenames
+    HEARTBEAT_SECONDS = 30
+    STALE_SECONDS = HEARTBEAT_SECONDS * 4
+    POLL_SECONDS = 2.0
 
-    Returns True if valid, False otherwise.
-    """
-    logger.debug("Validating LLM response")
+    def __init__(self, cache_path: Path, cache_key: str, logger: logging.Logger):
+        self.path = cache_path / f"{cache_key}.lock"
+        self.break_path = cache_path / f"{cache_key}.break.lock"
+        self.logger = logger
+        self.token = None
+        self.held = False
 
-    # Validate top-level keys exist
-    required_keys = ['stories_to_delete', 'stories_to_modify', 'stories_to_add']
-    for key in required_keys:
-        if key not in response:
-            logger.error(f"Validation failed: missing required key '{key}' in LLM response")
+    def try_acquire(self) -> bool:
+        """Create the lock file; False if another process holds it."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
             return False
+        self.token = os.urandom(8).hex()
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'pid': os.getpid(), 'host': socket.gethostname(),
+                       'created': datetime.now().isoformat(), 'token': self.token}, f)
+        # Re-read the token: back off if a stale-lock breaker removed ours in the meantime
+        self.held = self.owns()
+        return self.held
+
+    def owns(self) -> bool:
+        """Whether the lock file on disk is still this acquisition's."""
+        owner = self.read_owner()
+        return bool(owner) and owner.get('token') == self.token
+
+    def heartbeat(self):
+        """Refresh the lock's mtime so waiters on other hosts see it is alive."""
+        if self.held and self.owns():
+            try:
+                os.utime(self.path)
+            except FileNotFoundError:
+                pass
+
+    def release(self):
+        """Remove the lock file if this process holds it (never a lock taken over by another)."""
+        if self.held:
+            if self.owns():
+                try:
+                    self.path.unlink()
+                except FileNotFoundError:
+                    pass
+            self.held = False
 
-    # Extract story filenames
-    existing_story_files = {s['filename'] for s in stories_data}
-
-    # Validate stories_to_delete
-    for item in response.get('stories_to_delete', []):
-        file_path = item.get('file_path', '')
-        filename = Path(file_path).name
-        if filename not in existing_story_files:
-            logger.error(f"Validation failed: stories_to_delete references non-existent file: {filename}")
-            return False
+    def read_owner(self) -> Optional[Dict]:
+        """Return the current owner info, None if there is no lock."""
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (json.JSONDecodeError, IOError):
+            return {}  # Owner is still writing its info
 
-    # Validate stories_to_modify
-    for item in response.get('stories_to_modify', []):
-        file_path = item.get('file_path', '')
-        filename = Path(file_path).name
-        if filename not in existing_story_files:
-            logger.error(f"Validation failed: stories_to_modify references non-existent file: {filename}")
+    def is_stale(self, owner: Dict) -> bool:
+        """Whether the lock outlived its owner."""
+        try:
+            age = time.time() - self.path.stat().st_mtime
+        except FileNotFoundError:
             return False
+        if age > self.STALE_SECONDS:
+            return True
+        if owner.get('host') == socket.gethostname() and owner.get('pid'):
+            try:
+                os.kill(owner['pid'], 0)
+            except ProcessLookupError:
+                return True
+            except PermissionError:
+                pass  # Process exists but belongs to another user
+        return False
 
-    # Validate stories_to_add naming convention
-    proposed_files = []
-    for item in response.get('stories_to_add', []):
-        filename = item.get('filename', '')
-        if not filename:
-            logger.error("Validation failed: stories_to_add missing filename")
+    def break_stale(self, owner: Dict) -> bool:
+        """
+        Remove a stale lock. Breakers are serialized by a <key>.break.lock and
+        re-check that the lock still holds the same stale owner before removing
+        it, so a live lock taken meanwhile by another waiter is never removed.
+        Returns False if another process is breaking the lock.
+        """
+        try:
+            fd = os.open(self.break_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            try:
+                # Breaking takes milliseconds: an old break lock was left by a breaker that died
+                if time.time() - self.break_path.stat().st_mtime > self.HEARTBEAT_SECONDS:
+                    self.break_path.unlink()
+            except FileNotFoundError:
+                pass
             return False
+        os.close(fd)
+        try:
+            if self.read_owner() == owner and self.is_stale(owner):
+                self.path.unlink()
+                self.logger.warning(f"Removed stale cache lock {self.path.name} "
+                                    f"(pid {owner.get('pid')} on {owner.get('host')})")
+        except FileNotFoundError:
+            pass
+        finally:
+            self.break_path.unlink()
+        return True
 
-        # Check naming convention: {wave}-{epic}-{story}-{slug}.md
-        if not filename.endswith('.md'):
-            logger.error(f"Validation failed: filename doesn't end with .md: {filename}")
-            return False
 
-        parts = filename[:-3].split('-')
-        if len(parts) < 4:
-            logger.error(f"Validation failed: filename doesn't follow {'{wave}-{epic}-{story}-{slug}'}.md: {filename}")
-            return False
+def single_flight(
+    cache_path: Path,
+    cache_key: str,
+    compute,
+    logger: logging.Logger,
+    required_keys: List[str] = ANALYSIS_REQUIRED_KEYS
+) -> Tuple[Dict, bool]:
+    """
+    Return the cached value of cache_key, computing it at most once across
+    concurrent processes sharing the cache directory.
 
-        # Check for duplicates
-        if filename in proposed_files:
-            logger.error(f"Validation failed: duplicate filename proposed: {filename}")
-            return False
+    The process that takes the lock calls compute() and saves its result; the
+    others wait for the lock to go away and read the result from the cache. If
+    the owner fails or dies without saving, a waiter takes over.
 
-        proposed_files.append(filename)
+    Returns (result, computed_here).
+    """
+    lock = CacheLock(cache_path, cache_key, logger)
+    cache_file = cache_path / f"{cache_key}.json"
+    waiting = False  # Only log the wait once
 
-    # Warn about suspicious patterns
-    if len(response.get('stories_to_delete', [])) > len(existing_story_files) * 0.5:
-        logger.warning(f"Suspicious: proposing to delete {len(response['stories_to_delete'])} of {len(existing_story_files)} stories (>50%)")
+    while True:
+        if lock.try_acquire():
+            stop = threading.Event()
 
-    if not response.get('stories_to_modify') and not response.get('stories_to_add') and not response.get('stories_to_delete'):
-        logger.warning("No changes detected in LLM response")
+            def beat():
+                while not stop.wait(lock.HEARTBEAT_SECONDS):
+                    lock.heartbeat()
 
-    logger.debug("LLM response validation passed")
-    return True
+            threading.Thread(target=beat, daemon=True).start()
+            try:
+                # Another process may have saved the result just before we got the lock
+                cached = load_from_cache(cache_path, cache_key, logger, required_keys) if cache_file.exists() else None
+                if cached:
+                    return cached, False
+                result = compute()
+                save_to_cache(cache_path, cache_key, result, logger)
+                return result, True
+            finally:
+                stop.set()
+                lock.release()
+
+        owner = lock.read_owner()
+        if owner is None:
+            continue  # Released between our attempt and the read
+        if lock.is_stale(owner):
+            if not lock.break_stale(owner):
+                time.sleep(lock.POLL_SECONDS)
+            continue
 
+        if not waiting:
+            logger.info(f"Another process is computing {cache_key} "
+                        f"(pid {owner.get('pid')} on {owner.get('host')}), waiting for its result")
+            waiting = True
+        # The owner saves its result before releasing the lock
+        while lock.path.exists():
+            time.sleep(lock.POLL_SECONDS)
+            owner = lock.read_owner()
+            if owner is not None and lock.is_stale(owner):
+                break
 
-def analyze_scenario(
-    workflows_data: Dict,
-    stories_data: List,
-    scenario_name: str,
-    llm_config: Dict,
-    logger: logging.Logger
-) -> Dict:
+
+class RunJournal:
     """
-    Perform LLM-based semantic analysis of workflows vs stories.
+    Resumable record of a run's progress, stored in the cache directory.
 
-    Returns structured dict with:
-    - stories_to_delete: [{'file_path': str, 'reason': str}]
-    - stories_to_modify: [{'file_path': str, 'changes': str, 'diff': str}]
-    - stories_to_add: [{'filename': str, 'content': str}]
+    Tracks finished scenarios, results of individual LLM calls (keyed by
+    prompt hash, so split scenarios resume mid-way) and the cost spent so
+    far. A run interrupted by a crash or --max-cost picks up where it
+    stopped as long as workflows and stories are unchanged.
     """
-    logger.info(f"Analyzing scenario: {scenario_name}")
 
-    # Construct prompt
-    prompt = f"""You are analyzing BMAD workflow synchronization for the "{scenario_name}" scenario.
+    FILENAME = "run-journal.json"
+
+    def __init__(self, path: Path, fingerprint: str, data: Optional[Dict] = None):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.data = data or {
+            'fingerprint': fingerprint,
+            'started': datetime.now().isoformat(),
+            'status': 'running',
+            'scenarios': {},
+            'calls': {},
+            'ledger': []
+        }
 
-WORKFLOWS DATA:
-{json.dumps(workflows_data, indent=2)}
+    @classmethod
+    def open(cls, cache_path: Path, fingerprint: str, logger: logging.Logger, fresh: bool = False) -> 'RunJournal':
+        """Resume the journal of an interrupted run with the same inputs, or start a new one."""
+        path = cache_path / cls.FILENAME
+        if path.exists() and not fresh:
+            try:
+                with open(path, 'r') as f:
+                    data = json.load(f)
+                if data.get('fingerprint') == fingerprint and data.get('status') == 'running':
+                    logger.info(f"Resuming interrupted run from {data['started']}: "
+                                f"{len(data['scenarios'])} scenarios and {len(data['calls'])} calls already done, "
+                                f"${sum(e['actual_cost'] for e in data['ledger']):.4f} already spent")
+                    return cls(path, fingerprint, data)
+                logger.debug("Previous run journal is complete or stale, starting a new one")
+            except (json.JSONDecodeError, IOError, KeyError) as e:
+                logger.warning(f"Run journal unreadable, starting a new one: {e}")
+        return cls(path, fingerprint)
+
+    def save(self):
+        """Persist the journal (called after every unit of progress)."""
+        write_json_atomic(self.path, self.data)
+
+    def scenario_done(self, scenario_name: str, cache_key: str, ledger_entries: List[Dict]):
+        """Record a scenario whose result is now in the cache and the spend so far."""
+        self.data['scenarios'][scenario_name] = cache_key
+        self.data['ledger'] = ledger_entries
+        self.save()
+
+    def get_call(self, prompt_key: str) -> Optional[Dict]:
+        """Return the validated result of an already completed call, if any."""
+        return self.data['calls'].get(prompt_key)
+
+    def record_call(self, prompt_key: str, result: Dict, ledger_entries: List[Dict]):
+        """Record a validated call result and the spend so far."""
+        self.data['calls'][prompt_key] = result
+        self.data['ledger'] = ledger_entries
+        self.save()
+
+    def complete(self, ledger_entries: List[Dict]):
+        """Mark the run complete so the next run starts a new journal."""
+        self.data['status'] = 'complete'
+        self.data['ledger'] = ledger_entries
+        self.data['calls'] = {}  # Call results live in the scenario cache once complete
+        self.save()
 
-EXISTING STORIES:
-{json.dumps([{
-    'filename': s['filename'],
-    'wave': s['wave'],
-    'epic': s['epic'],
-    'story': s['story'],
-    'frontmatter': s['frontmatter'],
-    'content_preview': s['content_preview']
-} for s in stories_data], indent=2)}
 
-CONTEXT - META-BMAD FRAMEWORK:
-These stories are META-STORIES to generate BMAD itself in Vibe Kanban.
-The goal: execute BMAD workflows to generate COMPLETE STORY FILES that will be re-imported into Vibe Kanban.
+# ============================================================================
+# RATE LIMITING
+# ============================================================================
 
-A COMPLETE STORY FILE contains the ENTIRE lifecycle in ONE file:
-- ATDD (acceptance tests before dev)
-- Dev (implementation)
-- Code review
-- Test review
-- Trace/traceability
-All these steps are EMBEDDED in the story file, not separate stories.
+def parse_duration(value: Any) -> Optional[float]:
+    """Parse a rate-limit header duration to seconds ('20', '1.5s', '6m0s', '20ms' or an HTTP date)."""
+    if value is None:
+        return None
+    text = str(value).strip()
+    try:
+        return max(0.0, float(text))
+    except ValueError:
+        pass
+    parts = re.findall(r'(\d+(?:\.\d+)?)(ms|h|m|s)', text)
+    if parts and ''.join(number + unit for number, unit in parts) == text:
+        units = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+        return sum(float(number) * units[unit] for number, unit in parts)
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(text).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
 
-STORY TYPES TO VERIFY:
-1. PREPARATION STORIES (Waves 0-3):
-   - Wave 0-1: Project setup, analysis, research, product brief
-   - Wave 2: Planning (PRD, UX design, architecture)
-   - Wave 3: Solutioning (epics/stories generation, implementation readiness)
-   These create the INPUTS needed to generate complete stories.
 
-2. STORY GENERATION (Wave 4):
-   - Workflows that CREATE complete story files (with embedded ATDD, dev, review, trace)
-   - Sprint planning, create-story workflows generate stories
-   - dev-story workflow EXECUTES stories in Vibe Kanban - NOT a meta-story itself
-   - After import-vibe-kanban, stories are executed ONE BY ONE in Vibe Kanban using dev-story
-   - TEA workflows (atdd, test-review, trace) should be INTEGRATED into story generation, NOT separate stories
-   - Code-review workflow is INTEGRATED into dev-story execution, NOT a separate story
-   - Sprint-status, retrospective, correct-course are ORCHESTRATION workflows, NOT separate stories per feature
+def get_rate_limit_headers(source: Any) -> Dict[str, str]:
+    """
+    Response headers of a litellm response or exception, with lowercase names
+    and litellm's 'llm_provider-' prefix removed. Empty if unavailable.
+    """
+    hidden = getattr(source, '_hidden_params', None)
+    headers = hidden.get('additional_headers') if isinstance(hidden, dict) else None
+    headers = headers or getattr(source, 'litellm_response_headers', None)
+    if not headers:
+        headers = getattr(getattr(source, 'response', None), 'headers', None)
+
+    normalized = {}
+    for name, value in dict(headers or {}).items():
+        name = name.lower()
+        if name.startswith('llm_provider-'):
+            name = name[len('llm_provider-'):]
+        normalized.setdefault(name, value)
+    return normalized
+
+
+def get_usage_tokens(response: Any, estimated_input: int) -> Tuple[int, int]:
+    """
+    (input, output) tokens reported by a response. A provider or stream that
+    reports no usage is charged the call's estimate instead.
+    """
+    usage = getattr(response, 'usage', None)
+    input_tokens = getattr(usage, 'prompt_tokens', None)
+    output_tokens = getattr(usage, 'completion_tokens', None)
+    if input_tokens is None or output_tokens is None:
+        return estimated_input, ESTIMATED_OUTPUT_TOKENS
+    return input_tokens, output_tokens
+
+
+def get_retry_after(headers: Dict[str, str]) -> Optional[float]:
+    """Seconds to wait after a 429: retry-after-ms, retry-after, else the x-ratelimit reset."""
+    if 'retry-after-ms' in headers:
+        delay = parse_duration(headers['retry-after-ms'])
+        return delay / 1000 if delay is not None else None
+    if 'retry-after' in headers:
+        return parse_duration(headers['retry-after'])
+    resets = [parse_duration(headers.get(f'x-ratelimit-reset-{kind}')) for kind in ('requests', 'tokens')]
+    resets = [reset for reset in resets if reset is not None]
+    return max(resets) if resets else None
+
+
+def classify_llm_error(error: Exception) -> Optional[str]:
+    """'rate_limit' or 'transport' for errors worth retrying after a pause, None otherwise."""
+    status = getattr(error, 'status_code', None)
+    if isinstance(error, RateLimitError) or status == 429:
+        return 'rate_limit'
+    if isinstance(error, (APIConnectionError, Timeout, ServiceUnavailableError, InternalServerError,
+                          BadGatewayError, ConnectionError, TimeoutError, asyncio.TimeoutError)):
+        return 'transport'
+    if status in (408, 500, 502, 503, 504):
+        return 'transport'
+    return None
 
-3. DOCUMENTATION (Wave 2-3, NOT after dev):
-   - Diagrams (excalidraw) belong in architecture phase (Wave 2-3)
-   - NOT in Wave 6 - they're needed BEFORE development
 
-4. INFRASTRUCTURE & TOOLING (Valid meta-stories):
-   - renumber-waves: Manual reorganization task for wave structure
-   - import-vibe-kanban: External tooling integration scripts
-   - Templates (X-X-X-*): Template files for story generation
-   These are NORMAL and should NOT be deleted - they're part of the meta-framework
+class RateLimiter:
+    """
+    Token-bucket limiter shared by all LLM calls to one endpoint.
+
+    Two buckets refill continuously: requests (RATE_LIMIT_RPM) and tokens
+    (RATE_LIMIT_TPM, charged with the estimated prompt + output tokens and
+    corrected with the actual usage). A call waits until both buckets have
+    room and a concurrency slot is free.
+
+    The provider's headers keep it in step with quota used elsewhere (other
+    runs on the same team key): x-ratelimit-limit-* sets limits missing from
+    .env, x-ratelimit-remaining-* lowers the buckets, and a 429 pauses every
+    call until its Retry-After and halves the concurrency, which grows back
+    by one after each call that leaves headroom.
+    """
 
-TASK:
-Compare workflows with existing stories. Identify synchronization needs.
+    def __init__(self, rpm: Optional[int] = None, tpm: Optional[int] = None, max_concurrency: int = 4):
+        self.condition = threading.Condition()
+        self.limits = {'requests': rpm, 'tokens': tpm}
+        self.levels = {kind: float(limit) for kind, limit in self.limits.items() if limit}
+        self.updated = time.monotonic()
+        self.max_concurrency = max(1, max_concurrency)
+        self.concurrency = self.max_concurrency
+        self.in_flight = 0
+        self.paused_until = 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self.updated
+        self.updated = now
+        for kind, level in self.levels.items():
+            limit = self.limits[kind]
+            self.levels[kind] = min(limit, level + elapsed * limit / 60)
+
+    def _wait_time(self, tokens: int) -> float:
+        """Seconds until a call of this size fits (<= 0 when it fits now)."""
+        self._refill()
+        waits = [self.paused_until - time.monotonic()]
+        for kind, needed in (('requests', 1), ('tokens', tokens)):
+            if kind in self.levels:
+                needed = min(needed, self.limits[kind])  # A call larger than the bucket waits for a full one
+                if self.levels[kind] < needed:
+                    waits.append((needed - self.levels[kind]) * 60 / self.limits[kind])
+        return max(waits)
+
+    def acquire(self, tokens: int) -> float:
+        """Block until a call of `tokens` may be sent; returns the seconds waited."""
+        started = time.monotonic()
+        with self.condition:
+            while True:
+                if self.in_flight < self.concurrency:
+                    wait = self._wait_time(tokens)
+                    if wait <= 0:
+                        break
+                    self.condition.wait(wait)
+                else:
+                    self.condition.wait()
+            self.in_flight += 1
+            for kind, charge in (('requests', 1), ('tokens', tokens)):
+                if kind in self.levels:
+                    self.levels[kind] -= charge
+        return time.monotonic() - started
+
+    def release(
+        self,
+        headers: Dict[str, str],
+        reserved: int,
+        used: int = 0,
+        rate_limited: bool = False,
+        retry_after: Optional[float] = None
+    ):
+        """Finish a call: refund unused tokens, then adapt to the provider's headers."""
+        with self.condition:
+            self.in_flight -= 1
+            if 'tokens' in self.levels:
+                self.levels['tokens'] += reserved - used
+            self._apply_headers(headers)
+            if rate_limited:
+                self.concurrency = max(1, self.concurrency // 2)
+                pause = (retry_after if retry_after is not None else RATE_LIMIT_BASE_DELAY) + random.uniform(0, 1)
+                self.paused_until = max(self.paused_until, time.monotonic() + pause)
+            elif self.concurrency < self.max_concurrency and self._has_headroom(headers):
+                self.concurrency += 1
+            self.condition.notify_all()
+
+    def _apply_headers(self, headers: Dict[str, str]):
+        self._refill()
+        for kind in ('requests', 'tokens'):
+            limit = parse_duration(headers.get(f'x-ratelimit-limit-{kind}'))
+            remaining = parse_duration(headers.get(f'x-ratelimit-remaining-{kind}'))
+            if limit and not self.limits[kind]:
+                self.limits[kind] = int(limit)
+                self.levels[kind] = limit
+            if remaining is not None and kind in self.levels:
+                self.levels[kind] = min(self.levels[kind], remaining)
+
+    def _has_headroom(self, headers: Dict[str, str]) -> bool:
+        for kind in ('requests', 'tokens'):
+            limit = parse_duration(headers.get(f'x-ratelimit-limit-{kind}'))
+            remaining = parse_duration(headers.get(f'x-ratelimit-remaining-{kind}'))
+            if limit and remaining is not None and remaining < limit * 0.2:
+                return False
+        return True
 
-CRITICAL RULES:
-- DO NOT propose separate stories for workflows that are EMBEDDED or EXECUTED in Vibe Kanban:
-  * dev-story - executes stories IN Vibe Kanban after import, NOT a meta-story
-  * code-review - runs automatically after dev-story
-  * test-review - embedded in story completion
-  * trace - embedded in story lifecycle
-  * atdd - embedded in create-story
-  * sprint-status - orchestration tool, not a feature story
-  * retrospective - orchestration, runs after epic completion
-  * correct-course - orchestration, triggered by changes
-- DO NOT propose diagram stories in Wave 6 (they belong in Wave 2-3)
-- DO NOT delete infrastructure stories: renumber-waves, import-vibe-kanban, template files (X-X-X-*)
-  (These are valid meta-framework components)
-- TEA workflows should enhance existing story generation, not create new stories
-- One story can cover multiple workflow steps
-- Only reference files that exist in provided data
-- Follow naming: {{wave}}-{{epic}}-{{story}}-{{slug}}.md
 
-CROSS-SCENARIO AWARENESS:
-- For delete/modify: Check if story exists in OTHER scenarios (workflow-complet, quick-flow, document-project)
-  - If YES: list them in "affects_other_scenarios"
-  - If NO: use empty array []
-- For add: Specify ALL scenarios where this story should be added in "target_scenarios"
-  - Example: qa-automate story → ["workflow-complet"] only
-  - Example: project-context story → ["workflow-complet", "document-project"]
+# One limiter per endpoint, shared by every call (and both tiers when they use the same URL)
+RATE_LIMITERS: Dict[str, RateLimiter] = {}
 
-Return JSON with this exact structure:
-{{
-  "stories_to_delete": [
-    {{
-      "file_path": "stories/.../file.md",
-      "reason": "specific reason",
-      "affects_other_scenarios": ["scenario-name-1", "scenario-name-2"] or [] if only this scenario
-    }}
-  ],
-  "stories_to_modify": [
-    {{
-      "file_path": "stories/.../file.md",
-      "current_summary": "what it currently covers",
-      "changes_needed": ["specific change 1", "specific change 2"],
-      "diff": "diff content WITHOUT code fences - just the raw diff lines",
-      "affects_other_scenarios": ["scenario-name-1"] or [] if only this scenario
-    }}
-  ],
-  "stories_to_add": [
-    {{
-      "filename": "1-2-3-new-feature.md",
-      "wave": "1",
-      "epic": "2",
-      "story": "3",
-      "summary": "brief summary of what this story should cover",
-      "target_scenarios": ["workflow-complet"] or ["workflow-complet", "quick-flow"] if applies to multiple
-    }}
-  ]
-}}
 
-CRITICAL:
-- Return valid JSON only
-- Do NOT include actual newlines in string values - keep all text on single lines
-- Do NOT wrap diff content in markdown code fences (```diff...```) - the report generator will add them
-- Diff should be raw text without any wrapping"""
+def get_rate_limiter(llm_config: Dict, tier: str = 'base') -> RateLimiter:
+    """Return the shared limiter for the tier's endpoint."""
+    url = llm_config[f'{tier.upper()}_URL']
+    if url not in RATE_LIMITERS:
+        # setdefault: concurrent projects (--projects) must end up sharing one limiter
+        RATE_LIMITERS.setdefault(url, RateLimiter(
+            llm_config.get('RATE_LIMIT_RPM'), llm_config.get('RATE_LIMIT_TPM'),
+            llm_config.get('RATE_LIMIT_CONCURRENCY', RATE_LIMIT_DEFAULTS['RATE_LIMIT_CONCURRENCY'])
+        ))
+    return RATE_LIMITERS[url]
 
-    logger.debug(f"Prompt length: {len(prompt)} chars")
-    logger.debug(f"Calling LLM: {llm_config['BASE_MODEL']}")
-    logger.debug(f"Full prompt:\n{prompt}")
 
-    # Call LLM with retry logic
-    max_retries = 3
-    retry_delay = 1  # seconds
-    total_cost = 0.0  # Track accumulated cost across retries
+def backoff_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter, for errors without a Retry-After."""
+    return random.uniform(0, min(RATE_LIMIT_MAX_DELAY, RATE_LIMIT_BASE_DELAY * 2 ** attempt))
 
-    for attempt in range(max_retries):
+
+# ============================================================================
+# PROGRESS EVENTS
+# ============================================================================
+
+PROGRESS_TOKEN_INTERVAL = 1.0  # Seconds between llm_tokens events of a streamed call
+
+
+class ProgressStream:
+    """
+    NDJSON progress events (one JSON object per line) for UIs and CI dashboards.
+
+    Disabled until opened with --progress fd:N or unix:PATH. Events:
+    scan_complete, cache_hit, cache_miss, llm_start, llm_tokens, llm_done,
+    action, scenario_done, report_written, run_complete. A reader that goes
+    away disables the stream; the run itself is never interrupted.
+    """
+
+    def __init__(self):
+        self.stream = None
+        self.lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.stream is not None
+
+    def open(self, spec: str, logger: logging.Logger):
+        """Attach to an inherited file descriptor ('fd:N') or a listening unix socket ('unix:PATH')."""
         try:
-            # For OpenAI-compatible proxies - force OpenAI compatibility mode
-            # This prevents litellm from trying Vertex AI authentication
-            # Note: response_format may not be supported by all proxies, so we handle text responses
-            response = completion(
-                model=llm_config['BASE_MODEL'],
-                messages=[{"role": "user", "content": prompt}],
-                api_base=llm_config['BASE_URL'],
-                api_key=llm_config['BASE_KEY'],
-                custom_llm_provider="openai"  # Force OpenAI-compatible mode, no Google auth
+            if spec.startswith('fd:'):
+                self.stream = os.fdopen(int(spec[len('fd:'):]), 'w', encoding='utf-8')
+            elif spec.startswith('unix:'):
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                sock.connect(spec[len('unix:'):])
+                self.stream = sock.makefile('w', encoding='utf-8')
+            else:
+                logger.error(f"Invalid --progress: {spec!r} (expected fd:N or unix:PATH)")
+                sys.exit(1)
+        except (OSError, ValueError) as e:
+            logger.error(f"Cannot open progress stream {spec}: {e}")
+            sys.exit(1)
+        logger.debug(f"Progress events streamed to {spec}")
+
+    def emit(self, event: str, **fields: Any):
+        """Write one event (no-op when disabled)."""
+        if self.stream is None:
+            return
+        line = json.dumps({'event': event, 'time': datetime.now().isoformat(), **fields}, default=str)
+        with self.lock:
+            try:
+                self.stream.write(line + '\n')
+                self.stream.flush()
+            except (OSError, ValueError):
+                self.stream = None
+
+
+# Process-wide progress stream, shared by every stage of a run (and worker requests)
+PROGRESS = ProgressStream()
+
+
+def get_delta_text(delta: Any) -> str:
+    """Output text of a streamed chunk: content, or tool-call arguments with structured output."""
+    text = delta.content or ''
+    for call in getattr(delta, 'tool_calls', None) or []:
+        text += getattr(getattr(call, 'function', None), 'arguments', None) or ''
+    return text
+
+
+def stream_completion(request: Dict, label: str) -> Tuple[Any, Dict[str, str]]:
+    """
+    Run a completion with streaming, emitting llm_tokens events as output
+    arrives. Returns the reassembled response and the response headers.
+    """
+    stream = completion(**request, stream=True, stream_options={'include_usage': True})
+    chunks = []
+    output_chars = reported_chars = 0
+    last_event = time.monotonic()
+    for chunk in stream:
+        chunks.append(chunk)
+        delta = get_delta_text(chunk.choices[0].delta) if chunk.choices else None
+        if delta:
+            output_chars += len(delta)
+            if time.monotonic() - last_event >= PROGRESS_TOKEN_INTERVAL:
+                PROGRESS.emit('llm_tokens', label=label, output_tokens=int(output_chars / CHARS_PER_TOKEN))
+                last_event, reported_chars = time.monotonic(), output_chars
+    if output_chars != reported_chars:
+        PROGRESS.emit('llm_tokens', label=label, output_tokens=int(output_chars / CHARS_PER_TOKEN))
+    return stream_chunk_builder(chunks, messages=request['messages']), get_rate_limit_headers(stream)
+
+
+def emit_scenario_progress(scenario_name: str, result: Dict, cached: bool):
+    """Emit one 'action' event per proposed change of a validated result, then 'scenario_done'."""
+    for key, action, field in (('stories_to_delete', 'delete', 'file_path'),
+                               ('stories_to_modify', 'modify', 'file_path'),
+                               ('stories_to_add', 'add', 'filename')):
+        for item in result.get(key, []):
+            PROGRESS.emit('action', scenario=scenario_name, action=action, file=item.get(field),
+                          summary=item.get('reason') or item.get('current_summary') or item.get('summary'))
+    PROGRESS.emit('scenario_done', scenario=scenario_name, cached=cached,
+                  counts={key: len(result.get(key, [])) for key in ANALYSIS_REQUIRED_KEYS})
+
+
+# ============================================================================
+# TOKEN ESTIMATION & COST BUDGET
+# ============================================================================
+
+class BudgetExceededError(Exception):
+    """Raised before an LLM call that would exceed --max-tokens-per-call or --max-cost."""
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate token count offline (no tokenizer download, no API call)."""
+    return int(len(text) / CHARS_PER_TOKEN) + 1
+
+
+def get_model_pricing(model: str, llm_config: Optional[Dict] = None) -> Tuple[float, float]:
+    """
+    Return (input, output) price in USD per 1M tokens for a model.
+
+    .env overrides ({BASE,FAST}_PRICE_INPUT / _OUTPUT) apply to BASE_MODEL and
+    FAST_MODEL, otherwise the longest matching MODEL_PRICING entry wins.
+    """
+    matches = [name for name in MODEL_PRICING if name in model.lower()]
+    pricing = MODEL_PRICING[max(matches, key=len)] if matches else DEFAULT_PRICING
+
+    for tier in ('BASE', 'FAST'):
+        if llm_config and model == llm_config.get(f'{tier}_MODEL'):
+            pricing = (
+                llm_config.get(f'{tier}_PRICE_INPUT', pricing[0]),
+                llm_config.get(f'{tier}_PRICE_OUTPUT', pricing[1])
             )
+            break
+    return pricing
 
-            # Log token usage
-            usage = response.usage
-            input_tokens = usage.prompt_tokens
-            output_tokens = usage.completion_tokens
-            total_tokens = usage.total_tokens
 
-            # Rough cost estimate for Claude Opus 4.5
-            # $15/1M input, $75/1M output (as of Feb 2026, approximation)
-            cost_estimate = (input_tokens * 15 / 1_000_000) + (output_tokens * 75 / 1_000_000)
-            total_cost += cost_estimate
+def estimate_cost(input_tokens: int, output_tokens: int, pricing: Tuple[float, float]) -> float:
+    """Compute cost in USD from token counts and (input, output) per-1M pricing."""
+    return (input_tokens * pricing[0] / 1_000_000) + (output_tokens * pricing[1] / 1_000_000)
 
-            logger.info(f"LLM usage: {input_tokens} input + {output_tokens} output = {total_tokens} tokens")
-            logger.info(f"Estimated cost: ${cost_estimate:.4f}")
 
-            # Parse response
-            response_content = response.choices[0].message.content
-            logger.debug(f"Raw LLM response content (first 500 chars):\n{response_content[:500]}")
+class CostLedger:
+    """
+    Per-run ledger of estimated vs actual LLM cost and latency.
 
-            # Handle JSON wrapped in markdown code fences
-            if response_content.strip().startswith('```'):
-                # Remove markdown code fences
-                lines = response_content.strip().split('\n')
-                # Remove first line (```json or ```) and last line (```)
-                response_content = '\n'.join(lines[1:-1])
-                logger.debug("Removed markdown code fences from response")
+    Every call is checked against the run budgets (--max-cost, --deadline)
+    before it is sent, so retries can never silently exceed the ceiling.
+    Recorded latencies, together with those of previous ledgers, provide the
+    p95 used as the --hedge threshold.
+    """
 
-            try:
-                result = json.loads(response_content)
-            except json.JSONDecodeError as e:
-                logger.error(f"Failed to parse LLM response as JSON on first attempt: {e}")
-                # Show the problematic area
-                if hasattr(e, 'pos'):
-                    start = max(0, e.pos - 200)
-                    end = min(len(response_content), e.pos + 200)
-                    logger.error(f"JSON error near position {e.pos}:\n...{response_content[start:end]}...")
-
-                # Try to fix common JSON issues
-                import re
-                # First, escape newlines within string values
-                # This is a common issue where LLM puts actual newlines in strings
-                # We need to be careful to only escape newlines inside quoted strings
-
-                # Remove trailing commas before } or ]
-                cleaned = re.sub(r',(\s*[}\]])', r'\1', response_content)
-                try:
-                    result = json.loads(cleaned)
-                    logger.warning("JSON parsed after fixing trailing commas")
-                except json.JSONDecodeError as e2:
-                    logger.error(f"Failed to parse even after cleaning: {e2}")
-                    # Try one more aggressive fix: extract just the JSON object
-                    json_match = re.search(r'\{.*\}', cleaned, re.DOTALL)
-                    if json_match:
-                        try:
-                            result = json.loads(json_match.group(0))
-                            logger.warning("JSON parsed after extracting object")
-                        except:
-                            logger.error(f"Response content (full): {response_content}")
-                            raise e2
-                    else:
-                        logger.error(f"Response content (full): {response_content}")
-                        raise e2
-
-            logger.debug(f"Full LLM response:\n{json.dumps(result, indent=2)}")
+    def __init__(
+        self,
+        max_cost: Optional[float] = None,
+        max_tokens_per_call: Optional[int] = None,
+        call_timeout: Optional[float] = DEFAULT_CALL_TIMEOUT,
+        deadline: Optional[float] = None,
+        hedge: Optional[str] = None,
+        latency_history: Optional[Dict[str, List[float]]] = None
+    ):
+        self.max_cost = max_cost
+        self.max_tokens_per_call = max_tokens_per_call
+        self.call_timeout = call_timeout
+        self.deadline_at = time.monotonic() + deadline if deadline else None
+        self.hedge = hedge  # Seconds, 'p95' or None
+        self.latency_history = latency_history or {}
+        self.entries: List[Dict[str, Any]] = []
+
+    @property
+    def estimated_total(self) -> float:
+        return sum(e['estimated_cost'] for e in self.entries)
+
+    @property
+    def actual_total(self) -> float:
+        return sum(e['actual_cost'] for e in self.entries)
+
+    def check(self, label: str, estimated_input: int, estimated_cost: float):
+        """Raise BudgetExceededError if a call with this estimate must not be sent."""
+        if self.max_tokens_per_call and estimated_input > self.max_tokens_per_call:
+            raise BudgetExceededError(
+                f"{label}: estimated {estimated_input} input tokens exceeds "
+                f"--max-tokens-per-call {self.max_tokens_per_call}"
+            )
+        if self.max_cost is not None and self.actual_total + estimated_cost > self.max_cost:
+            raise BudgetExceededError(
+                f"{label}: estimated ${estimated_cost:.4f} would exceed --max-cost ${self.max_cost:.2f} "
+                f"(already spent ${self.actual_total:.4f})"
+            )
+        if self.deadline_at is not None and time.monotonic() >= self.deadline_at:
+            raise BudgetExceededError(f"{label}: run --deadline reached")
+
+    def timeout_for_call(self) -> Optional[float]:
+        """Per-call timeout, shortened to the time left before the run deadline."""
+        timeouts = [self.call_timeout] if self.call_timeout else []
+        if self.deadline_at is not None:
+            timeouts.append(max(1.0, self.deadline_at - time.monotonic()))
+        return min(timeouts) if timeouts else None
+
+    def hedge_delay(self, model: str) -> Optional[float]:
+        """Seconds to wait before hedging a call to `model`, None if hedging is off or untrained."""
+        if not self.hedge:
+            return None
+        if self.hedge != 'p95':
+            return float(self.hedge)
+        samples = self.latency_history.get(model, []) + [
+            e['latency_seconds'] for e in self.entries if e['model'] == model and e.get('hedge') != 'duplicate'
+        ]
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        samples.sort()
+        return samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+
+    def record(self, label: str, model: str, estimated_input: int, estimated_output: int,
+               estimated_cost: float, input_tokens: int, output_tokens: int, actual_cost: float,
+               tier: str = 'base', latency: float = 0.0, hedge: Optional[str] = None):
+        """Record one completed LLM call ('hedge': 'won', or 'duplicate' for the losing hedged request)."""
+        self.entries.append({
+            'label': label,
+            'tier': tier,
+            'model': model,
+            'latency_seconds': round(latency, 3),
+            'hedge': hedge,
+            'estimated_input_tokens': estimated_input,
+            'estimated_output_tokens': estimated_output,
+            'estimated_cost': round(estimated_cost, 6),
+            'input_tokens': input_tokens,
+            'output_tokens': output_tokens,
+            'actual_cost': round(actual_cost, 6),
+            'timestamp': datetime.now().isoformat()
+        })
+
+    def summary(self) -> Dict[str, Any]:
+        """Return totals (overall and per model tier) for logging and the report."""
+        by_tier = {}
+        for entry in self.entries:
+            tier = by_tier.setdefault(entry.get('tier', 'base'), {'calls': 0, 'actual_cost': 0.0, 'latency_seconds': 0.0})
+            tier['calls'] += 1
+            tier['actual_cost'] = round(tier['actual_cost'] + entry['actual_cost'], 6)
+            tier['latency_seconds'] = round(tier['latency_seconds'] + entry.get('latency_seconds', 0.0), 3)
+        return {
+            'calls': len(self.entries),
+            'estimated_cost': round(self.estimated_total, 6),
+            'actual_cost': round(self.actual_total, 6),
+            'max_cost': self.max_cost,
+            'max_tokens_per_call': self.max_tokens_per_call,
+            'hedged_calls': sum(1 for e in self.entries if e.get('hedge') == 'duplicate'),
+            'hedge_extra_cost': round(sum(e['actual_cost'] for e in self.entries if e.get('hedge') == 'duplicate'), 6),
+            'by_tier': by_tier
+        }
 
-            # Validate response
-            if not validate_llm_response(result, workflows_data, stories_data, logger):
-                raise ValueError("LLM response validation failed")
+    def save(self, path: Path, logger: logging.Logger):
+        """Write the ledger as JSON next to the report."""
+        write_json_atomic(path, {'summary': self.summary(), 'peak_rss_mb': get_peak_rss_mb(), 'calls': self.entries})
+        logger.info(f"Cost ledger saved: {path}")
 
-            return result
 
-        except Exception as e:
-            logger.error(f"LLM call failed (attempt {attempt + 1}/{max_retries}): {e}")
-            if attempt < max_retries - 1:
-                wait_time = retry_delay * (2 ** attempt)  # Exponential backoff
-                logger.info(f"Retrying in {wait_time}s...")
-                time.sleep(wait_time)
-            else:
-                logger.error(f"All retry attempts exhausted. Total cost incurred: ${total_cost:.4f}")
-                raise
+def load_latency_history(output_base: Path, logger: logging.Logger) -> Dict[str, List[float]]:
+    """Latencies of past calls per model (hedge duplicates excluded), from the newest cost ledgers."""
+    ledgers = sorted(output_base.glob("workflow-sync-ledger-*.json"), key=lambda p: p.stat().st_mtime)
+    history: Dict[str, List[float]] = {}
+    for path in ledgers[-HEDGE_HISTORY_LEDGERS:]:
+        try:
+            with open(path, 'r') as f:
+                calls = json.load(f).get('calls', [])
+        except (json.JSONDecodeError, IOError) as e:
+            logger.debug(f"Skipping unreadable ledger {path.name}: {e}")
+            continue
+        for call in calls:
+            if call.get('hedge') != 'duplicate' and 'latency_seconds' in call:
+                history.setdefault(call['model'], []).append(call['latency_seconds'])
+    return history
 
 
-def detect_new_scenarios(
-    all_workflows: Dict,
-    existing_scenarios: List[str],
+# Event loop reused by hedged calls, so litellm's async HTTP clients stay valid across calls.
+# One per thread: concurrent projects (--projects) cannot share a running loop.
+HEDGE_LOOP = threading.local()
+
+
+def run_hedged(coroutine):
+    """Run a coroutine on this thread's hedging event loop."""
+    if getattr(HEDGE_LOOP, 'loop', None) is None:
+        HEDGE_LOOP.loop = asyncio.new_event_loop()
+    return HEDGE_LOOP.loop.run_until_complete(coroutine)
+
+
+async def hedged_completion(
+    request: Dict,
+    hedge_after: float,
+    timeout: Optional[float],
+    start_hedge,
+    logger: logging.Logger,
+    label: str
+) -> Tuple[Any, Optional[Dict]]:
+    """
+    Send `request`; if no response arrives within hedge_after seconds, send a
+    duplicate and keep the first successful, non-empty response. The other
+    request is cancelled (its connection closed).
+
+    start_hedge() is called (in a worker thread) before the duplicate is sent
+    and returns False to skip hedging (e.g. budget). Returns (response, loser)
+    where loser is None without a hedge, else {'state': 'cancelled' |
+    'completed' | 'failed', 'response', 'won_by_hedge'}.
+    """
+    loop = asyncio.get_running_loop()
+    primary = asyncio.ensure_future(acompletion(**request))
+    tasks = [primary]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+        if done or not await loop.run_in_executor(None, start_hedge):
+            return await asyncio.wait_for(primary, timeout), None
+
+        logger.info(f"{label}: no response after {hedge_after:.1f}s, sending a hedged request")
+        hedge = asyncio.ensure_future(acompletion(**request))
+        tasks.append(hedge)
+
+        pending = set(tasks)
+        error = None
+        remaining = timeout
+        while pending:
+            started = time.monotonic()
+            done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                raise asyncio.TimeoutError(f"no response within {timeout:.0f}s")
+            if remaining is not None:
+                remaining -= time.monotonic() - started
+            for task in done:
+                if task.exception() is not None:
+                    error = task.exception()
+                elif not task.result().choices[0].message.content:
+                    error = ValueError("empty response")
+                else:
+                    other = hedge if task is primary else primary
+                    loser = {'state': 'cancelled', 'response': None, 'won_by_hedge': task is hedge}
+                    if other.done():
+                        failed = other.exception() is not None
+                        loser.update(state='failed' if failed else 'completed',
+                                     response=None if failed else other.result())
+                    return task.result(), loser
+        raise error
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+# (endpoint, model) pairs that rejected structured output parameters during this process
+STRUCTURED_OUTPUT_REJECTED = set()
+
+
+def get_structured_output_mode(llm_config: Dict, tier: str) -> Optional[str]:
+    """Structured output mode of a tier ('json_schema' or 'tool'), None for the text path."""
+    prefix = tier.upper()
+    model = llm_config[f'{prefix}_MODEL']
+    mode = llm_config.get('STRUCTURED_OUTPUT', 'auto')
+    if mode == 'off' or (llm_config[f'{prefix}_URL'], model) in STRUCTURED_OUTPUT_REJECTED:
+        return None
+    if mode == 'auto':
+        try:
+            return 'json_schema' if supports_response_schema(model=model, custom_llm_provider='openai') else None
+        except Exception:
+            return None
+    return mode
+
+
+def structured_output_params(mode: Optional[str], schema: str) -> Dict:
+    """Completion parameters requesting a response matching RESPONSE_SCHEMAS[schema]."""
+    if mode == 'json_schema':
+        return {'response_format': {'type': 'json_schema',
+                                    'json_schema': {'name': schema, 'schema': RESPONSE_SCHEMAS[schema]}}}
+    if mode == 'tool':
+        return {
+            'tools': [{'type': 'function', 'function': {
+                'name': schema,
+                'description': f"Return the {schema.replace('_', ' ')} result",
+                'parameters': RESPONSE_SCHEMAS[schema],
+            }}],
+            'tool_choice': {'type': 'function', 'function': {'name': schema}},
+        }
+    return {}
+
+
+def is_structured_output_rejection(error: Exception) -> bool:
+    """Whether an API error is the endpoint refusing response_format or tool parameters."""
+    if isinstance(error, UnsupportedParamsError):
+        return True
+    message = str(error).lower()
+    return isinstance(error, BadRequestError) and any(
+        word in message for word in ('response_format', 'json_schema', 'tool'))
+
+
+def call_llm(
+    prompt: str,
     llm_config: Dict,
+    logger: logging.Logger,
+    label: str,
+    ledger: Optional[CostLedger] = None,
+    tier: str = 'base',
+    schema: Optional[str] = None
+) -> str:
+    """
+    Send a single prompt to the model of the given tier after a pre-flight budget check.
+
+    With a schema (a RESPONSE_SCHEMAS name), the response is requested as
+    structured output when the tier supports it (see get_structured_output_mode);
+    an endpoint rejecting it is remembered and the call re-sent as plain text.
+
+    The call goes through the endpoint's shared RateLimiter; rate-limit (429)
+    and transport errors are retried, honoring Retry-After, up to
+    RATE_LIMIT_MAX_RETRIES times.
+
+    Returns the raw response content. Raises BudgetExceededError before
+    sending if the estimate exceeds the ledger budgets.
+    """
+    prefix = tier.upper()
+    model = llm_config[f'{prefix}_MODEL']
+    pricing = get_model_pricing(model, llm_config)
+    estimated_input = estimate_tokens(prompt)
+    estimated_cost = estimate_cost(estimated_input, ESTIMATED_OUTPUT_TOKENS, pricing)
+
+    logger.debug(f"{label} [{tier}]: estimated {estimated_input} input tokens, ~${estimated_cost:.4f}")
+
+    limiter = get_rate_limiter(llm_config, tier)
+    reserved = estimated_input + ESTIMATED_OUTPUT_TOKENS
+
+    # For OpenAI-compatible proxies - force OpenAI compatibility mode
+    # This prevents litellm from trying Vertex AI authentication
+    # Note: structured output may not be supported by all proxies, so we handle text responses
+    mode = get_structured_output_mode(llm_config, tier) if schema else None
+    request = dict(
+        model=model,
+        messages=[{"role": "user", "content": prompt}],
+        api_base=llm_config[f'{prefix}_URL'],
+        api_key=llm_config[f'{prefix}_KEY'],
+        custom_llm_provider="openai",  # Force OpenAI-compatible mode, no Google auth
+        **structured_output_params(mode, schema)
+    )
+
+    hedges_started = []
+
+    def start_hedge() -> bool:
+        """Admit the duplicate request through the budget and the rate limiter."""
+        try:
+            ledger.check(f"{label} (hedge)", estimated_input, estimated_cost)
+        except BudgetExceededError as e:
+            logger.info(f"Not hedging: {e}")
+            return False
+        limiter.acquire(reserved)
+        hedges_started.append(True)
+        return True
+
+    # Rate-limit and transport errors are retried here after a pause; any other error is raised.
+    # A structured output rejection re-sends once as text without using up a retry.
+    retries = 0
+    for attempt in range(RATE_LIMIT_MAX_RETRIES + 2):
+        if ledger:
+            ledger.check(label, estimated_input, estimated_cost)
+        timeout = ledger.timeout_for_call() if ledger else DEFAULT_CALL_TIMEOUT
+        hedge_after = ledger.hedge_delay(model) if ledger else None
+        hedges_started.clear()
+
+        waited = limiter.acquire(reserved)
+        if waited >= 1:
+            logger.info(f"{label}: held {waited:.1f}s by the rate limiter")
+        PROGRESS.emit('llm_start', label=label, tier=tier, model=model, attempt=attempt + 1,
+                      estimated_input_tokens=estimated_input)
+        started = time.monotonic()
+
+        released = False  # Every exit path hands the reservations back
+        try:
+            try:
+                if hedge_after is not None and (timeout is None or hedge_after < timeout):
+                    response, loser = run_hedged(hedged_completion(
+                        dict(request, timeout=timeout), hedge_after, timeout, start_hedge, logger, label))
+                    headers = get_rate_limit_headers(response)
+                elif PROGRESS.enabled:
+                    # Streamed so token progress can be reported while the answer is generated
+                    response, headers = stream_completion(dict(request, timeout=timeout), label)
+                    loser = None
+                else:
+                    response, loser = completion(**request, timeout=timeout), None
+                    headers = get_rate_limit_headers(response)
+            except Exception as e:
+                kind = classify_llm_error(e)
+                headers = get_rate_limit_headers(e)
+                retry_after = get_retry_after(headers) if kind == 'rate_limit' else None
+                limiter.release(headers, reserved, rate_limited=kind == 'rate_limit', retry_after=retry_after)
+                for _ in hedges_started:
+                    limiter.release({}, reserved)
+                released = True
+                if kind is None and mode and is_structured_output_rejection(e):
+                    logger.warning(f"{label}: endpoint rejected {mode} structured output ({e}), using the text path")
+                    STRUCTURED_OUTPUT_REJECTED.add((llm_config[f'{prefix}_URL'], model))
+                    for key in structured_output_params(mode, schema):
+                        request.pop(key)
+                    mode = None
+                    continue
+                if kind is None or retries == RATE_LIMIT_MAX_RETRIES:
+                    raise
+                retries += 1
+                if retry_after is not None:
+                    # The limiter holds every call until the provider's Retry-After
+                    logger.warning(f"{label}: rate limited, retrying after {retry_after:.1f}s "
+                                   f"(retry {retries}/{RATE_LIMIT_MAX_RETRIES})")
+                else:
+                    delay = backoff_delay(retries - 1)
+                    logger.warning(f"{label}: {kind.replace('_', ' ')} error ({e}), retrying in {delay:.1f}s "
+                                   f"(retry {retries}/{RATE_LIMIT_MAX_RETRIES})")
+                    time.sleep(delay)
+                continue
+
+            input_tokens, output_tokens = get_usage_tokens(response, estimated_input)
+            limiter.release(headers, reserved, input_tokens + output_tokens)
+            released = True
+        finally:
+            if not released:
+                limiter.release({}, reserved)
+                for _ in hedges_started:
+                    limiter.release({}, reserved)
+        break
+    else:
+        raise RuntimeError(f"{label}: no response after {attempt + 1} attempts")
+    latency = time.monotonic() - started
+
+    if loser is not None:
+        record_hedge_loser(loser, label, model, pricing, estimated_input, estimated_cost, latency,
+                           limiter, reserved, ledger, logger, tier)
+
+    # Log token usage
+    if getattr(response, 'usage', None) is None:
+        logger.warning(f"{label}: no token usage in the response, charging the estimate")
+    actual_cost = estimate_cost(input_tokens, output_tokens, pricing)
+
+    logger.info(f"LLM usage [{tier}: {model}]: {input_tokens} input + {output_tokens} output = "
+                f"{input_tokens + output_tokens} tokens in {latency:.1f}s")
+    logger.info(f"Cost: ${actual_cost:.4f} (estimated ${estimated_cost:.4f})")
+    PROGRESS.emit('llm_done', label=label, tier=tier, model=model, input_tokens=input_tokens,
+                  output_tokens=output_tokens, cost=round(actual_cost, 6), latency_seconds=round(latency, 3))
+
+    if ledger:
+        ledger.record(label, model, estimated_input, ESTIMATED_OUTPUT_TOKENS,
+                      estimated_cost, input_tokens, output_tokens, actual_cost, tier, latency,
+                      hedge='won' if loser is not None else None)
+
+    message = response.choices[0].message
+    if mode == 'tool' and message.tool_calls:
+        return message.tool_calls[0].function.arguments
+    return message.content
+
+
+def record_hedge_loser(
+    loser: Dict,
+    label: str,
+    model: str,
+    pricing: Tuple[float, float],
+    estimated_input: int,
+    estimated_cost: float,
+    latency: float,
+    limiter: 'RateLimiter',
+    reserved: int,
+    ledger: Optional[CostLedger],
+    logger: logging.Logger,
+    tier: str
+):
+    """
+    Account for the losing request of a hedged call. A cancelled request is
+    charged its estimated input (the provider has usually processed the
+    prompt already); a completed one its actual usage; a failed one nothing.
+    """
+    if loser['state'] == 'completed':
+        input_tokens, output_tokens = get_usage_tokens(loser['response'], estimated_input)
+    elif loser['state'] == 'cancelled':
+        input_tokens, output_tokens = estimated_input, 0
+    else:
+        input_tokens, output_tokens = 0, 0
+    extra_cost = estimate_cost(input_tokens, output_tokens, pricing)
+    limiter.release({}, reserved, input_tokens + output_tokens)
+
+    winner = 'hedged request' if loser['won_by_hedge'] else 'original request'
+    logger.info(f"{label}: {winner} won after {latency:.1f}s, other request {loser['state']} "
+                f"(extra cost ~${extra_cost:.4f})")
+    if ledger:
+        ledger.record(f"{label} (hedge)", model, estimated_input, ESTIMATED_OUTPUT_TOKENS, estimated_cost,
+                      input_tokens, output_tokens, extra_cost, tier, latency, hedge='duplicate')
+
+
+# ============================================================================
+# MODEL ROUTING
+# ============================================================================
+
+def compute_change_ratio(
+    cache_path: Path,
+    scenario_name: str,
+    stories_data: List,
+    workflows_data: Dict,
     logger: logging.Logger
-) -> List[Dict]:
+) -> float:
     """
-    Detect workflow categories without matching story scenarios.
+    Fraction of stories and workflows changed since the scenario's last analysis.
 
-    Returns list of proposed new scenarios.
+    Compares against the snapshot saved by save_scenario_snapshot; returns
+    1.0 when there is no snapshot (first analysis).
     """
-    logger.info("Detecting new scenarios")
+    snapshot = load_from_cache(cache_path, f"snapshot-{scenario_name}", logger, required_keys=['stories', 'workflows'])
+    if not snapshot:
+        return 1.0
+
+    current_stories = {s.filename: s.content_hash for s in stories_data}
+    current_workflows = {
+        f"{category}/{wf_name}": wf_data.checksum
+        for category, wfs in workflows_data.items()
+        for wf_name, wf_data in wfs.items()
+    }
 
-    # Find uncovered categories
-    covered_categories = set()
-    for scenario in existing_scenarios:
-        # Map scenario to workflow categories
-        if 'workflow-complet' in scenario:
-            covered_categories.update(['1-analysis', '2-plan-workflows', '3-solutioning', '4-implementation'])
-            # TEA workflows are INTEGRATED into story generation, not separate scenarios
-            covered_categories.add('testarch')
-            # QA automation enriches workflow-complet
-            covered_categories.add('qa')
-        elif 'quick-flow' in scenario:
-            covered_categories.add('bmad-quick-flow')
-        elif 'document-project' in scenario:
-            covered_categories.add('document-project')
-            # These enrich document-project scenario
-            covered_categories.add('generate-project-context')
-            covered_categories.add('excalidraw-diagrams')
-
-    uncovered = [cat for cat in all_workflows.keys() if cat not in covered_categories]
+    changed = 0
+    total = 0
+    for current, previous in ((current_stories, snapshot['stories']), (current_workflows, snapshot['workflows'])):
+        keys = set(current) | set(previous)
+        changed += sum(1 for k in keys if current.get(k) != previous.get(k))
+        total += len(keys)
 
-    if not uncovered:
-        logger.info("No uncovered workflow categories found")
-        return []
+    ratio = changed / total if total else 0.0
+    logger.debug(f"{scenario_name}: {changed}/{total} stories+workflows changed since last analysis")
+    return ratio
 
-    logger.info(f"Uncovered categories: {uncovered}")
 
-    # Use LLM to propose scenarios
-    prompt = f"""You have uncovered BMAD workflow categories: {uncovered}
+def save_scenario_snapshot(
+    cache_path: Path,
+    scenario_name: str,
+    stories_data: List,
+    workflows_data: Dict,
+    logger: logging.Logger
+):
+    """Save story and workflow checksums of a completed analysis for change detection."""
+    save_to_cache(cache_path, f"snapshot-{scenario_name}", {
+        'stories': {s.filename: s.content_hash for s in stories_data},
+        'workflows': {
+            f"{category}/{wf_name}": wf_data.checksum
+            for category, wfs in workflows_data.items()
+            for wf_name, wf_data in wfs.items()
+        }
+    }, logger)
 
-Workflows in these categories:
-{json.dumps({cat: all_workflows[cat] for cat in uncovered}, indent=2)}
 
-CONTEXT - META-BMAD:
-These are META-STORIES to generate BMAD. Stories create COMPLETE story files with embedded lifecycle.
+def choose_model_tier(story_count: int, change_ratio: float, prompt_tokens: int, llm_config: Dict) -> str:
+    """
+    Route a call to 'fast' or 'base'.
 
-EXISTING SCENARIOS & THEIR COVERAGE:
-1. workflow-complet: Full development cycle (analysis, planning, solutioning, implementation)
-   - Already includes: TEA workflows, QA automation
-2. quick-flow: Rapid atomic feature additions (spec + dev)
-   - Already includes: quick-spec, quick-dev workflows
-3. document-project: Brownfield project documentation
-   - Already includes: project-context generation, diagrams (excalidraw)
+    Fast when FAST_MODEL is configured, the prompt fits ROUTING_FAST_MAX_TOKENS
+    and either few stories are sent or little changed since the last analysis.
+    """
+    if 'FAST_MODEL' not in llm_config:
+        return 'base'
+    if prompt_tokens > llm_config['ROUTING_FAST_MAX_TOKENS']:
+        return 'base'
+    if story_count <= llm_config['ROUTING_FAST_MAX_STORIES']:
+        return 'fast'
+    if change_ratio <= llm_config['ROUTING_FAST_MAX_CHANGE']:
+        return 'fast'
+    return 'base'
 
-IMPORTANT:
-- DO NOT propose scenarios that would enrich existing ones
-- ONLY propose truly DIFFERENT scenarios (new use cases, different workflows)
-- If a workflow fits an existing scenario, it should be added to that scenario's stories, NOT a new scenario
 
-Propose ONLY truly new scenarios (not enrichments of existing ones).
+# ============================================================================
+# LLM ANALYSIS
+# ============================================================================
 
-Return JSON:
-{{
-  "new_scenarios": [
-    {{
-      "scenario_name": "descriptive-name",
-      "description": "what this scenario covers",
-      "suggested_stories": [
-        {{"filename": "1-1-0-story-name.md", "summary": "what it covers"}}
-      ]
-    }}
-  ]
-}}"""
+# Response schemas (JSON Schema subset), defined once: sent to providers supporting
+# structured output (see structured_output_params) and checked locally by validate_schema
+TEXT_SCHEMA = {'type': 'string'}
+TEXT_LIST_SCHEMA = {'type': 'array', 'items': TEXT_SCHEMA}
+STORY_PATH_SCHEMA = {'type': 'string', 'minLength': 1}
+STORY_NUMBER_SCHEMA = {'type': ['string', 'integer']}
+
+ANALYSIS_SCHEMA = {
+    'type': 'object',
+    'required': ANALYSIS_REQUIRED_KEYS,
+    'properties': {
+        'confidence': {'type': 'string', 'enum': ['high', 'medium', 'low']},
+        'stories_to_delete': {'type': 'array', 'items': {
+            'type': 'object',
+            'required': ['file_path', 'reason'],
+            'properties': {
+                'file_path': STORY_PATH_SCHEMA,
+                'reason': TEXT_SCHEMA,
+                'affects_other_scenarios': TEXT_LIST_SCHEMA,
+            },
+        }},
+        'stories_to_modify': {'type': 'array', 'items': {
+            'type': 'object',
+            'required': ['file_path'],
+            'properties': {
+                'file_path': STORY_PATH_SCHEMA,
+                'current_summary': TEXT_SCHEMA,
+                'changes_needed': TEXT_LIST_SCHEMA,
+                'affects_other_scenarios': TEXT_LIST_SCHEMA,
+            },
+        }},
+        'stories_to_add': {'type': 'array', 'items': {
+            'type': 'object',
+            'required': ['filename'],
+            'properties': {
+                'filename': STORY_PATH_SCHEMA,
+                'wave': STORY_NUMBER_SCHEMA,
+                'epic': STORY_NUMBER_SCHEMA,
+                'story': STORY_NUMBER_SCHEMA,
+                'summary': TEXT_SCHEMA,
+                'target_scenarios': TEXT_LIST_SCHEMA,
+            },
+        }},
+    },
+}
+
+STORY_EDITS_SCHEMA = {
+    'type': 'object',
+    'required': ['stories_to_modify'],
+    'properties': {
+        'stories_to_modify': {'type': 'array', 'items': {
+            'type': 'object',
+            'required': ['file_path', 'edits'],
+            'properties': {
+                'file_path': STORY_PATH_SCHEMA,
+                'edits': {'type': 'array', 'items': {
+                    'type': 'object',
+                    'required': ['op'],
+                    'properties': {
+                        'op': {'type': 'string', 'enum': ['replace_section', 'add_section', 'replace_line',
+                                                          'insert_after', 'delete_line']},
+                        'heading': TEXT_SCHEMA,
+                        'after': TEXT_SCHEMA,
+                        'find': TEXT_SCHEMA,
+                        'lines': TEXT_LIST_SCHEMA,
+                    },
+                }},
+            },
+        }},
+    },
+}
+
+NEW_SCENARIO_LIST_SCHEMA = {'type': 'array', 'items': {
+    'type': 'object',
+    'required': ['scenario_name'],
+    'properties': {
+        'scenario_name': STORY_PATH_SCHEMA,
+        'description': TEXT_SCHEMA,
+        'suggested_stories': {'type': 'array', 'items': {
+            'type': 'object',
+            'required': ['filename'],
+            'properties': {'filename': STORY_PATH_SCHEMA, 'summary': TEXT_SCHEMA},
+        }},
+    },
+}}
+
+RESPONSE_SCHEMAS = {
+    'scenario_analysis': ANALYSIS_SCHEMA,
+    'story_edits': STORY_EDITS_SCHEMA,
+    'new_scenarios': {
+        'type': 'object',
+        'required': ['new_scenarios'],
+        'properties': {'new_scenarios': NEW_SCENARIO_LIST_SCHEMA},
+    },
+    'combined_analysis': {
+        'type': 'object',
+        'required': ['scenarios'],
+        'properties': {
+            'scenarios': {'type': 'object', 'additionalProperties': ANALYSIS_SCHEMA},
+            'new_scenarios': NEW_SCENARIO_LIST_SCHEMA,
+        },
+    },
+}
+
+JSON_TYPES = {'object': dict, 'array': list, 'string': str, 'integer': int,
+              'number': (int, float), 'boolean': bool, 'null': type(None)}
+
+
+def validate_schema(value: Any, schema: Dict, path: str = 'response') -> List[str]:
+    """
+    Check a parsed response against a schema of RESPONSE_SCHEMAS.
+
+    Supports the subset used there: type (name or list), enum, minLength,
+    required, properties, additionalProperties (a schema) and items.
+    Returns the problems found, empty when the value is valid.
+    """
+    types = schema.get('type')
+    if types:
+        names = types if isinstance(types, list) else [types]
+        if not any(isinstance(value, JSON_TYPES[name])
+                   and not (isinstance(value, bool) and name in ('integer', 'number'))
+                   for name in names):
+            return [f"{path}: expected {' or '.join(names)}, got {type(value).__name__}"]
+
+    problems = []
+    if 'enum' in schema and value not in schema['enum']:
+        problems.append(f"{path}: {value!r} is not one of {schema['enum']}")
+    if isinstance(value, str) and len(value) < schema.get('minLength', 0):
+        problems.append(f"{path}: empty string")
+    if isinstance(value, dict):
+        problems.extend(f"{path}: missing required key '{key}'"
+                        for key in schema.get('required', []) if key not in value)
+        properties = schema.get('properties', {})
+        extra = schema.get('additionalProperties')
+        for key, item in value.items():
+            item_schema = properties.get(key, extra if isinstance(extra, dict) else None)
+            if item_schema:
+                problems.extend(validate_schema(item, item_schema, f"{path}.{key}"))
+    elif isinstance(value, list) and 'items' in schema:
+        for index, item in enumerate(value):
+            problems.extend(validate_schema(item, schema['items'], f"{path}[{index}]"))
+    return problems
+
+
+def parse_llm_json(content: Optional[str], logger: logging.Logger) -> Any:
+    """
+    Parse the JSON of an LLM response.
+
+    Structured output is plain JSON. Answers of the text path (providers
+    without structured output) may wrap it in a markdown fence, surround
+    it with prose or leave trailing commas; these are repaired.
+    Raises json.JSONDecodeError (a ValueError) when no JSON object is found.
+    """
+    content = content or ''
+    try:
+        return json.loads(content)
+    except json.JSONDecodeError as error:
+        first_error = error
+
+    text = content.strip()
+    fence = re.match(r'```[\w-]*\n(.*?)\n?```$', text, re.DOTALL)
+    if fence:
+        text = fence.group(1)
+    start = text.find('{')
+    if start >= 0:
+        decoder = json.JSONDecoder()
+        for candidate in (text[start:], re.sub(r',(\s*[}\]])', r'\1', text[start:])):
+            try:
+                result, _ = decoder.raw_decode(candidate)
+            except json.JSONDecodeError:
+                continue
+            logger.warning("JSON parsed after repairing the text response")
+            return result
+
+    position = first_error.pos
+    logger.error(f"JSON error near position {position}:\n...{content[max(0, position - 200):position + 200]}...")
+    raise first_error
+
+
+def validate_story_filename(filename: str) -> Optional[str]:
+    """Check a proposed story filename; returns the problem, or None if valid."""
+    if not filename:
+        return "missing filename"
+
+    # Check naming convention: {wave}-{epic}-{story}-{slug}.md
+    if not filename.endswith('.md'):
+        return f"filename doesn't end with .md: {filename}"
+
+    if Path(filename).name != filename:
+        return f"filename must not contain a directory: {filename}"
+
+    parts = filename[:-3].split('-')
+    if len(parts) < 4:
+        return f"filename doesn't follow {'{wave}-{epic}-{story}-{slug}'}.md: {filename}"
+
+    return None
+
+
+def validate_llm_response(response: Dict, workflows_data: Dict, stories_data: List, logger: logging.Logger) -> bool:
+    """
+    Validate LLM response to ensure all referenced files exist.
+
+    Checks:
+    - structure matches ANALYSIS_SCHEMA
+    - stories_to_delete reference existing stories
+    - stories_to_modify reference existing stories
+    - stories_to_add follow naming convention
+    - No duplicate filenames
+
+    Returns True if valid, False otherwise.
+    """
+    logger.debug("Validating LLM response")
+
+    problems = validate_schema(response, ANALYSIS_SCHEMA)
+    if problems:
+        for problem in problems[:5]:
+            logger.error(f"Validation failed: {problem}")
+        return False
+
+    # Extract story filenames
+    existing_story_files = {s.filename for s in stories_data}
+
+    # Deleted and modified stories must exist
+    for key in ('stories_to_delete', 'stories_to_modify'):
+        for item in response[key]:
+            filename = Path(item['file_path']).name
+            if filename not in existing_story_files:
+                logger.error(f"Validation failed: {key} references non-existent file: {filename}")
+                return False
+
+    # Validate stories_to_add naming convention
+    proposed_files = []
+    for item in response['stories_to_add']:
+        filename = item['filename']
+        problem = validate_story_filename(filename)
+        if problem:
+            logger.error(f"Validation failed: stories_to_add {problem}")
+            return False
+
+        # Check for duplicates
+        if filename in proposed_files:
+            logger.error(f"Validation failed: duplicate filename proposed: {filename}")
+            return False
+
+        proposed_files.append(filename)
+
+    # Warn about suspicious patterns
+    if len(response.get('stories_to_delete', [])) > len(existing_story_files) * 0.5:
+        logger.warning(f"Suspicious: proposing to delete {len(response['stories_to_delete'])} of {len(existing_story_files)} stories (>50%)")
+
+    if not response.get('stories_to_modify') and not response.get('stories_to_add') and not response.get('stories_to_delete'):
+        logger.warning("No changes detected in LLM response")
+
+    logger.debug("LLM response validation passed")
+    return True
+
+
+def find_anchor(lines: List[str], anchor: str, what: str) -> int:
+    """Index of the single line equal to anchor (ignoring surrounding whitespace)."""
+    matches = [i for i, line in enumerate(lines) if line.strip() == anchor.strip()]
+    if not matches:
+        raise PatchConflictError(f"{what} not found: {anchor!r}")
+    if len(matches) > 1:
+        raise PatchConflictError(f"{what} matches {len(matches)} lines: {anchor!r}")
+    return matches[0]
+
+
+def find_section(lines: List[str], heading: str) -> Tuple[int, int]:
+    """
+    (heading index, end index) of a markdown section. A heading given
+    without '#' matches that title at any level.
+    """
+    if heading.strip().startswith('#'):
+        start = find_anchor(lines, heading, "heading")
+    else:
+        matches = [i for i, line in enumerate(lines)
+                   if line.startswith('#') and line.lstrip('#').strip() == heading.strip()]
+        if len(matches) != 1:
+            raise PatchConflictError(f"heading {'not found' if not matches else 'ambiguous'}: {heading!r}")
+        start = matches[0]
+
+    level = len(lines[start]) - len(lines[start].lstrip('#'))
+    end = start + 1
+    while end < len(lines):
+        line = lines[end]
+        if line.startswith('#') and len(line) - len(line.lstrip('#')) <= level:
+            break
+        end += 1
+    return start, end
+
+
+def apply_story_edits(original: str, edits: List[Dict]) -> str:
+    """
+    Apply compact edits (see SCENARIO_PROMPT_INSTRUCTIONS) to a story's text.
+
+    Raises PatchConflictError if an anchor or heading is missing or ambiguous.
+    """
+    lines = original.splitlines()
+    for index, edit in enumerate(edits):
+        if not isinstance(edit, dict):
+            raise PatchConflictError(f"edit {index + 1} is not an object")
+        op = edit.get('op')
+        new_lines = edit.get('lines', [])
+        new_lines = [str(line) for line in (new_lines if isinstance(new_lines, list) else [new_lines])]
+        try:
+            if op == 'replace_section':
+                start, end = find_section(lines, edit['heading'])
+                # Keep the section's blank-line layout around the new body
+                lead = [''] if start + 1 < end and not lines[start + 1].strip() else []
+                trail = [''] if end < len(lines) and not lines[end - 1].strip() else []
+                lines[start + 1:end] = lead + new_lines + trail
+            elif op == 'add_section':
+                position = find_section(lines, edit['after'])[1] if edit.get('after') else len(lines)
+                section = [edit['heading'], ''] + new_lines
+                if position < len(lines):
+                    section.append('')
+                elif lines and lines[-1].strip():
+                    section.insert(0, '')
+                lines[position:position] = section
+            elif op == 'replace_line':
+                position = find_anchor(lines, edit['find'], "line")
+                lines[position:position + 1] = new_lines
+            elif op == 'insert_after':
+                position = find_anchor(lines, edit['find'], "line")
+                lines[position + 1:position + 1] = new_lines
+            elif op == 'delete_line':
+                position = find_anchor(lines, edit['find'], "line")
+                del lines[position]
+            else:
+                raise PatchConflictError(f"unknown op {op!r}")
+        except KeyError as e:
+            raise PatchConflictError(f"edit {index + 1} ({op}) is missing {e}")
+        except PatchConflictError as e:
+            raise PatchConflictError(f"edit {index + 1} ({op}): {e}")
+
+    return '\n'.join(lines) + ('\n' if original.endswith('\n') else '')
+
+
+def expand_story_edits(response: Dict, stories_data: List, logger: logging.Logger) -> bool:
+    """
+    Expand the compact edits of stories_to_modify into a unified diff
+    ('diff'), verified against the current story files.
+
+    Returns False if an edit does not apply (the response is then re-requested).
+    """
+    stories = {s.filename: s for s in stories_data}
+    for item in response.get('stories_to_modify', []):
+        if not item.get('edits'):
+            continue  # Legacy full diff (or no concrete change)
+        if not isinstance(item['edits'], list):
+            logger.error(f"Validation failed: edits for {item['file_path']} is not a list")
+            return False
+        story = stories[Path(item['file_path']).name]
+        original = Path(story.file_path).read_text(encoding='utf-8')
+        try:
+            modified = apply_story_edits(original, item['edits'])
+        except PatchConflictError as e:
+            logger.error(f"Validation failed: edits for {story.filename} do not apply: {e}")
+            return False
+        item['diff'] = '\n'.join(difflib.unified_diff(
+            original.splitlines(), modified.splitlines(),
+            f"a/{story.filename}", f"b/{story.filename}", lineterm=''
+        ))
+        if not item['diff']:
+            logger.warning(f"Edits for {story.filename} change nothing")
+    return True
+
+
+# Scenario-independent part of the scenario analysis prompt
+SCENARIO_PROMPT_INSTRUCTIONS = """CONTEXT - META-BMAD FRAMEWORK:
+These stories are META-STORIES to generate BMAD itself in Vibe Kanban.
+The goal: execute BMAD workflows to generate COMPLETE STORY FILES that will be re-imported into Vibe Kanban.
+
+A COMPLETE STORY FILE contains the ENTIRE lifecycle in ONE file:
+- ATDD (acceptance tests before dev)
+- Dev (implementation)
+- Code review
+- Test review
+- Trace/traceability
+All these steps are EMBEDDED in the story file, not separate stories.
+
+STORY TYPES TO VERIFY:
+1. PREPARATION STORIES (Waves 0-3):
+   - Wave 0-1: Project setup, analysis, research, product brief
+   - Wave 2: Planning (PRD, UX design, architecture)
+   - Wave 3: Solutioning (epics/stories generation, implementation readiness)
+   These create the INPUTS needed to generate complete stories.
+
+2. STORY GENERATION (Wave 4):
+   - Workflows that CREATE complete story files (with embedded ATDD, dev, review, trace)
+   - Sprint planning, create-story workflows generate stories
+   - dev-story workflow EXECUTES stories in Vibe Kanban - NOT a meta-story itself
+   - After import-vibe-kanban, stories are executed ONE BY ONE in Vibe Kanban using dev-story
+   - TEA workflows (atdd, test-review, trace) should be INTEGRATED into story generation, NOT separate stories
+   - Code-review workflow is INTEGRATED into dev-story execution, NOT a separate story
+   - Sprint-status, retrospective, correct-course are ORCHESTRATION workflows, NOT separate stories per feature
+
+3. DOCUMENTATION (Wave 2-3, NOT after dev):
+   - Diagrams (excalidraw) belong in architecture phase (Wave 2-3)
+   - NOT in Wave 6 - they're needed BEFORE development
+
+4. INFRASTRUCTURE & TOOLING (Valid meta-stories):
+   - renumber-waves: Manual reorganization task for wave structure
+   - import-vibe-kanban: External tooling integration scripts
+   - Templates (X-X-X-*): Template files for story generation
+   These are NORMAL and should NOT be deleted - they're part of the meta-framework
+
+TASK:
+Compare workflows with existing stories. Identify synchronization needs.
+
+CRITICAL RULES:
+- DO NOT propose separate stories for workflows that are EMBEDDED or EXECUTED in Vibe Kanban:
+  * dev-story - executes stories IN Vibe Kanban after import, NOT a meta-story
+  * code-review - runs automatically after dev-story
+  * test-review - embedded in story completion
+  * trace - embedded in story lifecycle
+  * atdd - embedded in create-story
+  * sprint-status - orchestration tool, not a feature story
+  * retrospective - orchestration, runs after epic completion
+  * correct-course - orchestration, triggered by changes
+- DO NOT propose diagram stories in Wave 6 (they belong in Wave 2-3)
+- DO NOT delete infrastructure stories: renumber-waves, import-vibe-kanban, template files (X-X-X-*)
+  (These are valid meta-framework components)
+- TEA workflows should enhance existing story generation, not create new stories
+- One story can cover multiple workflow steps
+- Only reference files that exist in provided data
+- Follow naming: {wave}-{epic}-{story}-{slug}.md
+
+CROSS-SCENARIO AWARENESS:
+- SHARED STORIES exist in this scenario but are reviewed where "analyzed_in" says:
+  - DO NOT propose delete/modify for them
+  - DO take them into account (do not propose adding a story they already cover)
+- For delete/modify: "affects_other_scenarios" is computed automatically, return []
+- For add: Specify ALL scenarios where this story should be added in "target_scenarios"
+  - Example: qa-automate story → ["workflow-complet"] only
+  - Example: project-context story → ["workflow-complet", "document-project"]
+
+Return JSON with this exact structure:
+{
+  "confidence": "high" | "medium" | "low" (how sure you are of this analysis),
+  "stories_to_delete": [
+    {
+      "file_path": "stories/.../file.md",
+      "reason": "specific reason",
+      "affects_other_scenarios": []
+    }
+  ],
+  "stories_to_modify": [
+    {
+      "file_path": "stories/.../file.md",
+      "current_summary": "what it currently covers",
+      "changes_needed": ["specific change 1", "specific change 2"],
+      "affects_other_scenarios": []
+    }
+  ],
+  "stories_to_add": [
+    {
+      "filename": "1-2-3-new-feature.md",
+      "wave": "1",
+      "epic": "2",
+      "story": "3",
+      "summary": "brief summary of what this story should cover",
+      "target_scenarios": ["workflow-complet"] or ["workflow-complet", "quick-flow"] if applies to multiple
+    }
+  ]
+}
+
+STORY DIGESTS:
+- Existing stories are given as digests: title, status, user story, complete acceptance criteria,
+  workflow references and section headings
+- For stories_to_modify, state precisely in "changes_needed" what must change (section, criterion,
+  workflow reference): the full text of these stories is sent afterwards to write the edits
+
+CRITICAL:
+- Return valid JSON only
+- Do NOT include actual newlines in string values - keep all text on single lines"""
+
+# Second stage: full text of the stories flagged for modification, answered with edits
+EDITS_PROMPT_INSTRUCTIONS = """TASK:
+Write the changes decided for each story above as compact edits against its full text.
+
+Return JSON with this exact structure:
+{
+  "stories_to_modify": [
+    {
+      "file_path": "stories/.../file.md",
+      "edits": [
+        {"op": "replace_section", "heading": "## Acceptance Criteria", "lines": ["1. [ ] new criterion", "2. [ ] ..."]},
+        {"op": "add_section", "after": "## Acceptance Criteria", "heading": "## New Heading", "lines": ["..."]},
+        {"op": "replace_line", "find": "exact existing line", "lines": ["replacement line"]},
+        {"op": "insert_after", "find": "exact existing line", "lines": ["new line"]},
+        {"op": "delete_line", "find": "exact existing line"}
+      ]
+    }
+  ]
+}
+
+EDITS:
+- One entry per story above, with the same file_path
+- Describe each change as compact "edits", NOT as a diff - the diff is computed locally
+- "find" must be an exact, unique line of the current story; "heading" an exact heading line
+- replace_section replaces everything under the heading up to the next heading of the same or higher level
+- Prefer replace_line/insert_after for small changes, replace_section only when most of a section changes
+- "lines" are the new lines, one string per line
+
+CRITICAL:
+- Return valid JSON only
+- Do NOT include actual newlines in string values - keep all text on single lines"""
+
+
+def build_scenario_prompt(
+    workflows_data: Dict,
+    stories_data: List[StoryRecord],
+    referenced_stories: List[Dict],
+    scenario_name: str
+) -> str:
+    """
+    Build the scenario analysis prompt.
+
+    stories_data are sent in full; referenced_stories ({'filename', 'analyzed_in'})
+    are only listed so the LLM knows they exist.
+    """
+    writer = PromptWriter()
+    writer.text(f'You are analyzing BMAD workflow synchronization for the "{scenario_name}" scenario.\n\n')
+    writer.text("WORKFLOWS DATA:\n").text(render_workflows(workflows_data))
+    writer.text("\n\nEXISTING STORIES:\n").json_list(s.to_prompt() for s in stories_data)
+    writer.text("\n\nSHARED STORIES (also part of this scenario, analyzed in another scenario or call):\n")
+    writer.json_list(referenced_stories)
+    writer.text("\n\n").text(SCENARIO_PROMPT_INSTRUCTIONS)
+    return writer.getvalue()
+
+
+def plan_scenario_chunks(
+    workflows_data: Dict,
+    stories_data: List,
+    referenced_stories: List[Dict],
+    scenario_name: str,
+    max_tokens: Optional[int],
+    logger: logging.Logger
+) -> List[List[Dict]]:
+    """
+    Split a scenario's owned stories so that every prompt fits max_tokens.
+
+    Strategy: keep one call if it fits, otherwise split stories in halves;
+    a single story that still does not fit gets its acceptance criteria trimmed.
+    referenced_stories is the worst-case reference list sent with each chunk.
+    Raises BudgetExceededError when even a trimmed single story does not fit.
+    """
+    def fits(chunk: List[Dict]) -> bool:
+        prompt = build_scenario_prompt(workflows_data, chunk, referenced_stories, scenario_name)
+        return estimate_tokens(prompt) <= max_tokens
+
+    if not max_tokens or fits(stories_data):
+        return [stories_data]
+
+    if len(stories_data) <= 1:
+        for story in stories_data:
+            for limit in (500, 200, 0):
+                trimmed = story.trimmed(limit)
+                if fits([trimmed]):
+                    logger.warning(f"Trimmed {story.filename} acceptance criteria to {limit} chars to fit --max-tokens-per-call")
+                    return [[trimmed]]
+        raise BudgetExceededError(
+            f"{scenario_name}: prompt exceeds --max-tokens-per-call {max_tokens} "
+            f"even with a single trimmed story (workflow corpus too large)"
+        )
+
+    middle = len(stories_data) // 2
+    return (plan_scenario_chunks(workflows_data, stories_data[:middle], referenced_stories,
+                                 scenario_name, max_tokens, logger)
+            + plan_scenario_chunks(workflows_data, stories_data[middle:], referenced_stories,
+                                   scenario_name, max_tokens, logger))
+
+
+def merge_chunk_results(results: List[Dict]) -> Dict:
+    """Merge per-chunk analysis results, dropping duplicate story proposals."""
+    merged = {'stories_to_delete': [], 'stories_to_modify': [], 'stories_to_add': []}
+    seen = {key: set() for key in merged}
+    for result in results:
+        for key, id_field in (('stories_to_delete', 'file_path'),
+                              ('stories_to_modify', 'file_path'),
+                              ('stories_to_add', 'filename')):
+            for item in result.get(key, []):
+                if item.get(id_field) in seen[key]:
+                    continue
+                seen[key].add(item.get(id_field))
+                merged[key].append(item)
+    return merged
+
+
+def plan_scenario_calls(
+    workflows_data: Dict,
+    stories_data: List,
+    scenario_name: str,
+    max_tokens: Optional[int],
+    logger: logging.Logger
+) -> List[Tuple[List, List[Dict]]]:
+    """
+    Plan the LLM calls of a scenario: [(stories sent in full, referenced stories)].
+
+    Stories shared with an earlier scenario are analyzed there and only
+    referenced; the owned stories are split by plan_scenario_chunks.
+    """
+    owned_stories = [s for s in stories_data if not s.analyzed_in]
+    shared_stories = [s for s in stories_data if s.analyzed_in]
+    if shared_stories:
+        logger.info(f"{len(shared_stories)} stories shared with other scenarios (sent by reference only)")
+
+    def references(exclude: set) -> List[Dict]:
+        refs = [{'filename': s.filename, 'analyzed_in': s.analyzed_in} for s in shared_stories]
+        return refs + [{'filename': s.filename, 'analyzed_in': f"{scenario_name} (separate call)"}
+                       for s in owned_stories if s.filename not in exclude]
+
+    chunks = plan_scenario_chunks(workflows_data, owned_stories, references(set()), scenario_name, max_tokens, logger)
+    if len(chunks) > 1:
+        logger.info(f"Splitting {scenario_name} into {len(chunks)} calls to fit --max-tokens-per-call")
+    return [(chunk, references({s.filename for s in chunk})) for chunk in chunks]
+
+
+def analyze_scenario(
+    workflows_data: Dict,
+    stories_data: List,
+    scenario_name: str,
+    llm_config: Dict,
+    logger: logging.Logger,
+    ledger: Optional[CostLedger] = None,
+    journal: Optional[RunJournal] = None,
+    change_ratio: float = 1.0,
+    chunk_index: Optional[int] = None
+) -> Dict:
+    """
+    Perform LLM-based semantic analysis of workflows vs stories.
+
+    Large scenarios are split into several calls when the prompt exceeds
+    the ledger's max_tokens_per_call. Results of split calls are recorded
+    in the run journal so an interrupted run resumes mid-scenario. Each call
+    is routed to the fast or base model tier (see choose_model_tier).
+    Calls send story digests; stories flagged for modification then get
+    a second call with their full text (see request_story_edits).
+    chunk_index runs only that call of the plan (work queue jobs).
+
+    Returns structured dict with:
+    - stories_to_delete: [{'file_path': str, 'reason': str}]
+    - stories_to_modify: [{'file_path': str, 'changes': str, 'edits': list, 'diff': str}]
+      ('diff' is expanded locally from 'edits')
+    - stories_to_add: [{'filename': str, 'content': str}]
+    """
+    logger.info(f"Analyzing scenario: {scenario_name}")
+
+    max_tokens = ledger.max_tokens_per_call if ledger else None
+    chunks = plan_scenario_calls(workflows_data, stories_data, scenario_name, max_tokens, logger)
+    selected = range(len(chunks)) if chunk_index is None else [chunk_index]
+
+    results = []
+    for index in selected:
+        chunk, referenced = chunks[index]
+        prompt = build_scenario_prompt(workflows_data, chunk, referenced, scenario_name)
+        label = scenario_name if len(chunks) == 1 else f"{scenario_name}[{index + 1}/{len(chunks)}]"
+
+        prompt_key = hashlib.sha256(prompt.encode()).hexdigest()[:16]
+        previous = journal.get_call(prompt_key) if journal and len(chunks) > 1 else None
+        if previous is not None:
+            logger.info(f"{label}: reusing result from interrupted run")
+            results.append(previous)
+            continue
+
+        tier = choose_model_tier(len(chunk), change_ratio, estimate_tokens(prompt), llm_config)
+        result = request_analysis(prompt, workflows_data, stories_data, llm_config, logger, label, ledger, tier)
+        result = request_story_edits(workflows_data, stories_data, result, scenario_name,
+                                     llm_config, logger, label, ledger, tier)
+        if journal and len(chunks) > 1:
+            journal.record_call(prompt_key, result, ledger.entries if ledger else [])
+        results.append(result)
+
+    return results[0] if len(results) == 1 else merge_chunk_results(results)
+
+
+def request_analysis(
+    prompt: str,
+    workflows_data: Dict,
+    stories_data: List,
+    llm_config: Dict,
+    logger: logging.Logger,
+    label: str,
+    ledger: Optional[CostLedger] = None,
+    tier: str = 'base',
+    check: Optional[Callable[[Dict], None]] = None,
+    schema: str = 'scenario_analysis'
+) -> Dict:
+    """
+    Send one analysis prompt with retries, then parse and validate the JSON response.
+
+    The response must match RESPONSE_SCHEMAS[schema], requested as structured
+    output when the provider supports it (see call_llm).
+
+    Invalid responses (unparsable JSON, schema mismatch, failed validation) are re-requested
+    right away; rate-limit and transport errors are handled in call_llm and
+    other API errors are raised. On the fast tier there is a single attempt:
+    a failure, an invalid response or a low self-reported confidence
+    escalates to the base model. check replaces the scenario analysis
+    validation; it raises ValueError on an invalid response.
+    """
+    logger.debug(f"Prompt length: {len(prompt)} chars")
+    logger.debug(f"Calling LLM: {llm_config[f'{tier.upper()}_MODEL']}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"Full prompt:\n{prompt}")
+
+    # Re-request invalid responses
+    max_retries = 3
+
+    for attempt in range(max_retries):
+        try:
+            response_content = call_llm(prompt, llm_config, logger, label, ledger, tier, schema)
+
+            logger.debug(f"Raw LLM response content (first 500 chars):\n{(response_content or '')[:500]}")
+            result = parse_llm_json(response_content, logger)
+            problems = validate_schema(result, RESPONSE_SCHEMAS[schema])
+            if problems:
+                raise ValueError(f"response does not match the {schema} schema: {'; '.join(problems[:3])}")
+
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Full LLM response:\n{json.dumps(result, indent=2)}")
+
+            # Validate response
+            if check:
+                check(result)
+            elif not validate_llm_response(result, workflows_data, stories_data, logger):
+                raise ValueError("LLM response validation failed")
+            elif not expand_story_edits(result, stories_data, logger):
+                raise ValueError("LLM story edits do not apply to the current files")
+
+            if tier == 'fast' and result.get('confidence') == 'low':
+                raise ValueError("fast model reported low confidence")
+
+            return result
+
+        except BudgetExceededError:
+            raise
+        except Exception as e:
+            if tier == 'fast':
+                logger.warning(f"{label}: fast tier failed ({e}), escalating to {llm_config['BASE_MODEL']}")
+                return request_analysis(prompt, workflows_data, stories_data, llm_config, logger,
+                                        label, ledger, tier='base', check=check, schema=schema)
+            logger.error(f"LLM call failed (attempt {attempt + 1}/{max_retries}): {e}")
+            if isinstance(e, ValueError) and attempt < max_retries - 1:
+                logger.info("Retrying with a new request...")
+            else:
+                if ledger:
+                    logger.error(f"All retry attempts exhausted. Total run cost so far: ${ledger.actual_total:.4f}")
+                else:
+                    logger.error("All retry attempts exhausted.")
+                raise
+
+
+def find_referenced_workflows(workflows_data: Dict, refs: Iterable[str]) -> Dict:
+    """Workflow records ({category: {name: record}}) matching story workflow references."""
+    refs = set(refs)
+    found = {}
+    for category, wfs in workflows_data.items():
+        for name, record in wfs.items():
+            if any(ref.endswith(record.path) or ref == f"{category}/{name}" for ref in refs):
+                found.setdefault(category, {})[name] = record
+    return found
+
+
+def build_edits_prompt(workflows_data: Dict, items: List[Tuple[StoryRecord, Dict]], scenario_name: str) -> str:
+    """Second-stage prompt: full text of the stories to modify, their decided changes and referenced workflows."""
+    refs = [ref for story, _ in items for ref in story.digest()['workflow_refs']]
+    writer = PromptWriter()
+    writer.text(f'You are updating BMAD stories of the "{scenario_name}" scenario.\n\n')
+    writer.text("REFERENCED WORKFLOWS:\n").workflows(find_referenced_workflows(workflows_data, refs))
+    writer.text("\n\nSTORIES TO MODIFY:\n").json_list(
+        {
+            'file_path': item['file_path'],
+            'changes_needed': item.get('changes_needed', []),
+            'content': Path(story.file_path).read_text(encoding='utf-8')
+        }
+        for story, item in items
+    )
+    writer.text("\n\n").text(EDITS_PROMPT_INSTRUCTIONS)
+    return writer.getvalue()
+
+
+def request_story_edits(
+    workflows_data: Dict,
+    stories_data: List[StoryRecord],
+    result: Dict,
+    scenario_name: str,
+    llm_config: Dict,
+    logger: logging.Logger,
+    label: str,
+    ledger: Optional[CostLedger] = None,
+    tier: str = 'base'
+) -> Dict:
+    """
+    Second stage of a scenario analysis: the scenario call works on digests,
+    so the stories it flags for modification are sent in full, in as few
+    calls as fit max_tokens_per_call, to get their edits (expanded to diffs).
+    """
+    by_filename = {s.filename: s for s in stories_data}
+    items = [(by_filename[Path(item['file_path']).name], item)
+             for item in result.get('stories_to_modify', [])
+             if not item.get('diff') and not by_filename[Path(item['file_path']).name].analyzed_in]
+    if not items:
+        return result
+
+    max_tokens = ledger.max_tokens_per_call if ledger else None
+    groups: List[List[Tuple[StoryRecord, Dict]]] = [[]]
+    for entry in items:
+        candidate = groups[-1] + [entry]
+        if groups[-1] and max_tokens and \
+                estimate_tokens(build_edits_prompt(workflows_data, candidate, scenario_name)) > max_tokens:
+            groups.append([entry])
+        else:
+            groups[-1] = candidate
+
+    for index, group in enumerate(groups):
+        edits_label = f"{label}:edits" if len(groups) == 1 else f"{label}:edits[{index + 1}/{len(groups)}]"
+        expected = {Path(item['file_path']).name: item for _, item in group}
+
+        def check(response: Dict):
+            returned = {
+                Path(entry['file_path']).name: entry['edits'] for entry in response['stories_to_modify']
+            }
+            missing = [name for name in expected if not returned.get(name)]
+            if missing:
+                raise ValueError(f"no edits returned for {', '.join(missing)}")
+            response['stories_to_modify'] = [dict(item, edits=returned[name]) for name, item in expected.items()]
+            if not expand_story_edits(response, stories_data, logger):
+                raise ValueError("LLM story edits do not apply to the current files")
+
+        logger.info(f"{edits_label}: requesting edits for {len(group)} stories (full text)")
+        prompt = build_edits_prompt(workflows_data, group, scenario_name)
+        response = request_analysis(prompt, workflows_data, stories_data, llm_config, logger,
+                                    edits_label, ledger, tier, check=check, schema='story_edits')
+        for expanded in response['stories_to_modify']:
+            expected[Path(expanded['file_path']).name].update(edits=expanded['edits'], diff=expanded['diff'])
+
+    return result
+
+
+# New scenario proposals for uncovered workflow categories
+NEW_SCENARIOS_PROMPT_INSTRUCTIONS = """CONTEXT - META-BMAD:
+These are META-STORIES to generate BMAD. Stories create COMPLETE story files with embedded lifecycle.
+
+EXISTING SCENARIOS & THEIR COVERAGE:
+1. workflow-complet: Full development cycle (analysis, planning, solutioning, implementation)
+   - Already includes: TEA workflows, QA automation
+2. quick-flow: Rapid atomic feature additions (spec + dev)
+   - Already includes: quick-spec, quick-dev workflows
+3. document-project: Brownfield project documentation
+   - Already includes: project-context generation, diagrams (excalidraw)
+
+IMPORTANT:
+- DO NOT propose scenarios that would enrich existing ones
+- ONLY propose truly DIFFERENT scenarios (new use cases, different workflows)
+- If a workflow fits an existing scenario, it should be added to that scenario's stories, NOT a new scenario
+
+Propose ONLY truly new scenarios (not enrichments of existing ones).
+
+Return JSON:
+{
+  "new_scenarios": [
+    {
+      "scenario_name": "descriptive-name",
+      "description": "what this scenario covers",
+      "suggested_stories": [
+        {"filename": "1-1-0-story-name.md", "summary": "what it covers"}
+      ]
+    }
+  ]
+}"""
+
+
+def get_scenario_coverage(scenario_name: str) -> List[str]:
+    """Return the workflow categories covered by a scenario (see SCENARIO_COVERAGE)."""
+    for key, categories in SCENARIO_COVERAGE.items():
+        if key in scenario_name:
+            return categories
+    return []
+
+
+def find_uncovered_categories(all_workflows: Dict, existing_scenarios: List[str]) -> List[str]:
+    """Workflow categories not covered by any existing scenario."""
+    covered_categories = set()
+    for scenario in existing_scenarios:
+        covered_categories.update(get_scenario_coverage(scenario))
+    return [cat for cat in all_workflows.keys() if cat not in covered_categories]
+
+
+def detect_new_scenarios(
+    all_workflows: Dict,
+    existing_scenarios: List[str],
+    llm_config: Dict,
+    logger: logging.Logger,
+    ledger: Optional[CostLedger] = None,
+    cache_path: Optional[Path] = None,
+    dry_run: bool = False
+) -> List[Dict]:
+    """
+    Detect workflow categories without matching story scenarios.
+
+    Results are cached by the checksums of the uncovered categories, so the
+    LLM is only called when those workflows (or the scenario list) change.
+    In dry-run mode only the cache is consulted.
+
+    Returns list of proposed new scenarios.
+    """
+    logger.info("Detecting new scenarios")
+
+    uncovered = find_uncovered_categories(all_workflows, existing_scenarios)
+
+    if not uncovered:
+        logger.info("No uncovered workflow categories found")
+        return []
+
+    logger.info(f"Uncovered categories: {uncovered}")
+
+    cache_key = get_new_scenarios_cache_key(all_workflows, uncovered, existing_scenarios)
+    if cache_path:
+        cached = load_from_cache(cache_path, cache_key, logger, required_keys=['new_scenarios'])
+        if cached:
+            logger.info("Using cached new scenario detection")
+            return cached['new_scenarios']
+
+    if dry_run:
+        logger.info("Skipping new scenario detection in dry-run mode (no cache)")
+        return []
+
+    # Use LLM to propose scenarios
+    prompt = (f"You have uncovered BMAD workflow categories: {uncovered}\n\n"
+              f"Workflows in these categories:\n{render_workflows({cat: all_workflows[cat] for cat in uncovered})}\n\n"
+              + NEW_SCENARIOS_PROMPT_INSTRUCTIONS)
+
+    def detect(attempts: int = 2) -> Dict:
+        response_content = call_llm(prompt, llm_config, logger, 'new-scenarios', ledger, schema='new_scenarios')
+        logger.debug(f"New scenarios response (first 500 chars):\n{(response_content or '')[:500]}")
+
+        try:
+            result = parse_llm_json(response_content, logger)
+            problems = validate_schema(result, RESPONSE_SCHEMAS['new_scenarios'])
+            if problems:
+                raise ValueError(f"response does not match the new_scenarios schema: {'; '.join(problems[:3])}")
+        except ValueError as e:
+            if attempts <= 1:
+                raise
+            logger.warning(f"New scenarios response is invalid ({e}), retrying")
+            return detect(attempts - 1)
+        return {'new_scenarios': result['new_scenarios']}
+
+    try:
+        if cache_path:
+            result, _ = single_flight(cache_path, cache_key, detect, logger, required_keys=['new_scenarios'])
+        else:
+            result = detect()
+        return result['new_scenarios']
+
+    except BudgetExceededError:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to detect new scenarios: {e}")
+        return []
+
+
+# Combined analysis (--combined): one response for all scenarios of the prompt
+COMBINED_PROMPT_INSTRUCTIONS = """COMBINED RESPONSE:
+Analyze EACH scenario above separately, with only its own EXISTING and SHARED stories, following
+all the rules above. Return ONE JSON object, with one analysis per scenario keyed by scenario name:
+{
+  "scenarios": {
+    "<scenario name>": {
+      "confidence": "high" | "medium" | "low",
+      "stories_to_delete": [...],
+      "stories_to_modify": [...],
+      "stories_to_add": [...]
+    }
+  },
+  "new_scenarios": [...]
+}
+- "scenarios" must contain an entry for every scenario above, even without changes
+- Each scenario analysis follows the scenario structure above; "file_path" values must be stories of that scenario
+- "new_scenarios" follows the NEW SCENARIOS structure above; return [] when no NEW SCENARIOS section is given
+- Return valid JSON only"""
+
+
+def build_combined_prompt(
+    workflows_data: Dict,
+    scenario_calls: Dict[str, Tuple[List[StoryRecord], List[Dict]]],
+    uncovered: List[str]
+) -> str:
+    """
+    Build one prompt for several scenarios: the workflow corpus once, then the
+    stories of each scenario ({name: (stories sent in full, referenced stories)}).
+    uncovered categories add the new scenario detection to the same prompt.
+    """
+    writer = PromptWriter()
+    writer.text(f"You are analyzing BMAD workflow synchronization for {len(scenario_calls)} scenarios "
+                f"in one pass: {', '.join(scenario_calls)}.\n\n")
+    writer.text("WORKFLOWS DATA (shared by all scenarios):\n").text(render_workflows(workflows_data))
+    for scenario_name, (stories, referenced) in scenario_calls.items():
+        writer.text(f'\n\nSCENARIO "{scenario_name}" - EXISTING STORIES:\n').json_list(s.to_prompt() for s in stories)
+        writer.text(f'\n\nSCENARIO "{scenario_name}" - SHARED STORIES '
+                    '(also part of this scenario, analyzed in another scenario or call):\n')
+        writer.json_list(referenced)
+    writer.text("\n\n").text(SCENARIO_PROMPT_INSTRUCTIONS)
+    if uncovered:
+        writer.text(f"\n\nNEW SCENARIOS:\nUncovered BMAD workflow categories: {uncovered} "
+                    "(their workflows are in WORKFLOWS DATA above)\n\n")
+        writer.text(NEW_SCENARIOS_PROMPT_INSTRUCTIONS)
+    writer.text("\n\n").text(COMBINED_PROMPT_INSTRUCTIONS)
+    return writer.getvalue()
+
+
+def analyze_scenarios_combined(
+    workflows_data: Dict,
+    scenario_stories: Dict[str, List[StoryRecord]],
+    llm_config: Dict,
+    logger: logging.Logger,
+    ledger: Optional[CostLedger] = None,
+    uncovered: Optional[List[str]] = None
+) -> Optional[Dict]:
+    """
+    Analyze several scenarios in one base-tier call that sends the workflow corpus once.
+
+    uncovered categories fold the new scenario detection into the same call.
+    Stories flagged for modification then get their edits per scenario
+    (request_story_edits), as in analyze_scenario.
+
+    Returns {'scenarios': {name: result}, 'new_scenarios': list or None}, or
+    None when the estimated prompt plus one completion per scenario exceeds
+    BASE_CONTEXT_TOKENS (or the prompt exceeds max_tokens_per_call): the
+    caller then falls back to per-scenario calls.
+    """
+    scenario_calls = {}
+    for scenario_name, stories in scenario_stories.items():
+        scenario_calls[scenario_name] = plan_scenario_calls(workflows_data, stories, scenario_name, None, logger)[0]
+    uncovered = uncovered or []
+
+    prompt = build_combined_prompt(workflows_data, scenario_calls, uncovered)
+    prompt_tokens = estimate_tokens(prompt)
+    context_tokens = llm_config.get('BASE_CONTEXT_TOKENS', CONTEXT_DEFAULTS['BASE_CONTEXT_TOKENS'])
+    max_tokens = ledger.max_tokens_per_call if ledger else None
+    if prompt_tokens + ESTIMATED_OUTPUT_TOKENS * len(scenario_calls) > context_tokens \
+            or (max_tokens and prompt_tokens > max_tokens):
+        logger.info(f"Combined prompt (~{prompt_tokens} tokens) does not fit the model context "
+                    f"({context_tokens}) or --max-tokens-per-call, falling back to per-scenario calls")
+        return None
+
+    separate_tokens = sum(
+        estimate_tokens(build_scenario_prompt(workflows_data, stories, referenced, scenario_name))
+        for scenario_name, (stories, referenced) in scenario_calls.items()
+    )
+    logger.info(f"combined: analyzing {', '.join(scenario_calls)} in one call "
+                f"(~{prompt_tokens} prompt tokens instead of ~{separate_tokens} in separate calls)")
+
+    def check(response: Dict):
+        parts = response['scenarios']
+        missing = [name for name in scenario_calls if name not in parts]
+        if missing:
+            raise ValueError(f"no analysis returned for {', '.join(missing)}")
+        for scenario_name in scenario_calls:
+            stories = scenario_stories[scenario_name]
+            if not validate_llm_response(parts[scenario_name], workflows_data, stories, logger):
+                raise ValueError(f"{scenario_name}: LLM response validation failed")
+            if not expand_story_edits(parts[scenario_name], stories, logger):
+                raise ValueError(f"{scenario_name}: LLM story edits do not apply to the current files")
+        if uncovered and 'new_scenarios' not in response:
+            raise ValueError('response has no "new_scenarios" list')
+
+    response = request_analysis(prompt, workflows_data, [], llm_config, logger, 'combined', ledger,
+                                check=check, schema='combined_analysis')
+
+    results = {}
+    for scenario_name in scenario_calls:
+        results[scenario_name] = request_story_edits(
+            workflows_data, scenario_stories[scenario_name], response['scenarios'][scenario_name],
+            scenario_name, llm_config, logger, f"combined:{scenario_name}", ledger)
+    return {'scenarios': results, 'new_scenarios': response['new_scenarios'] if uncovered else None}
+
+
+# ============================================================================
+# INCREMENTAL ANALYSIS (GIT DIFF)
+# ============================================================================
+
+def run_git(args: List[str], cwd: Path) -> str:
+    """Run a git command and return stdout (raises CalledProcessError on failure)."""
+    import subprocess
+    result = subprocess.run(['git'] + args, cwd=cwd, capture_output=True, text=True, check=True)
+    return result.stdout
+
+
+def resolve_since_commit(since: str, project_root: Path, output_base: Path, logger: logging.Logger) -> str:
+    """
+    Resolve --since to a commit hash.
+
+    'last-report' reads git_commit from the newest (non dry-run) report frontmatter.
+    """
+    if since == 'last-report':
+        reports = sorted(
+            (p for p in output_base.glob("workflow-sync-*report-*.md") if not p.name.startswith('[DRY-RUN]')),
+            key=lambda p: p.stat().st_mtime
+        )
+        if not reports:
+            logger.error(f"--since last-report: no report found in {output_base}")
+            sys.exit(1)
+        with open(reports[-1], 'r', encoding='utf-8') as f:
+            since = str(frontmatter.load(f).get('git_commit', 'NO_GIT'))
+        if since == 'NO_GIT':
+            logger.error(f"--since last-report: {reports[-1].name} has no git commit")
+            sys.exit(1)
+        logger.info(f"Last report: {reports[-1].name} (commit {since[:12]})")
+
+    try:
+        return run_git(['rev-parse', '--verify', f'{since}^{{commit}}'], project_root).strip()
+    except Exception as e:
+        logger.error(f"--since: cannot resolve commit {since!r}: {e}")
+        sys.exit(1)
+
+
+def get_changed_paths(since_commit: str, project_root: Path, logger: logging.Logger) -> List[str]:
+    """
+    List paths under bmad-templates/_bmad and bmad-templates/stories changed since a commit.
+
+    Includes committed, uncommitted and untracked changes (paths relative to project root).
+    """
+    scopes = ['bmad-templates/_bmad', 'bmad-templates/stories']
+    changed = run_git(['diff', '--name-only', since_commit, '--'] + scopes, project_root).splitlines()
+    changed += run_git(['ls-files', '--others', '--exclude-standard', '--'] + scopes, project_root).splitlines()
+    changed = sorted(set(p for p in changed if p))
+    logger.info(f"{len(changed)} paths changed since {since_commit[:12]}")
+    return changed
+
+
+def scope_changes(changed_paths: List[str], scenario_names: List[str], logger: logging.Logger) -> Dict[str, Any]:
+    """
+    Map changed paths to the analysis they affect.
+
+    Returns:
+    {
+        'workflow_categories': set of changed workflow categories,
+        'stories': {scenario_name: set of changed story filenames},
+        'scenarios': {scenario_name: 'workflows' | 'stories'}  # why it is affected
+    }
+    A scenario affected by a workflow change in a category it covers is fully
+    re-analyzed; one affected only by story edits re-analyzes those stories.
+    """
+    categories = set()
+    stories = {}
+    for path in changed_paths:
+        parts = Path(path).parts
+        if parts[:2] == ('bmad-templates', 'stories') and len(parts) == 4 and parts[3].endswith('.md'):
+            stories.setdefault(parts[2], set()).add(parts[3])
+            continue
+        for workflow_dir in WORKFLOW_DIRS.values():
+            prefix = ('bmad-templates', '_bmad') + tuple(workflow_dir.split('/'))
+            # Category is the first directory below the workflow dir
+            if parts[:len(prefix)] == prefix and len(parts) > len(prefix) + 1:
+                categories.add(parts[len(prefix)])
+                break
+        else:
+            logger.debug(f"Ignoring change outside scanned workflows/stories: {path}")
+
+    affected = {}
+    for scenario_name in scenario_names:
+        if categories & set(get_scenario_coverage(scenario_name)):
+            affected[scenario_name] = 'workflows'
+        elif scenario_name in stories:
+            affected[scenario_name] = 'stories'
+
+    logger.info(f"Changed workflow categories: {sorted(categories) or 'none'}")
+    logger.info(f"Affected scenarios: {', '.join(f'{n} ({why})' for n, why in affected.items()) or 'none'}")
+    return {'workflow_categories': categories, 'stories': stories, 'scenarios': affected}
+
+
+def scope_stories_to_changes(stories_data: List[StoryRecord], changed_files: set):
+    """Send only changed stories in full; unchanged ones become references to the previous report."""
+    for story in stories_data:
+        if story.filename not in changed_files and not story.analyzed_in:
+            story.analyzed_in = 'previous report (unchanged)'
+
+
+# ============================================================================
+# REPORT GENERATION
+# ============================================================================
+
+def get_git_commit(cwd: Optional[Path] = None) -> str:
+    """Get current git commit hash (of the repository containing cwd)."""
+    try:
+        import subprocess
+        result = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=cwd,
+                              capture_output=True, text=True, check=True)
+        return result.stdout.strip()
+    except Exception:
+        return "NO_GIT"
+
+
+def generate_report(
+    analysis_results: Dict[str, Dict],
+    new_scenarios: List[Dict],
+    workflows_checksums: Dict,
+    output_path: Path,
+    logger: logging.Logger,
+    ledger: Optional[CostLedger] = None,
+    delta: Optional[Dict] = None,
+    project_root: Optional[Path] = None
+):
+    """
+    Generate markdown synchronization report.
+
+    Structure:
+    - Frontmatter with metadata
+    - Summary statistics
+    - Changes since the base commit (delta reports, see scope_changes)
+    - Per-scenario sections (delete/modify/add)
+    - New scenarios section
+    """
+    logger.info(f"Generating report at {output_path}")
+
+    # Ensure output directory exists
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    # Compute summary statistics
+    total_deletes = sum(len(r.get('stories_to_delete', [])) for r in analysis_results.values())
+    total_modifies = sum(len(r.get('stories_to_modify', [])) for r in analysis_results.values())
+    total_adds = sum(len(r.get('stories_to_add', [])) for r in analysis_results.values())
+    total_actions = total_deletes + total_modifies + total_adds
+
+    # Get git commit
+    commit_hash = get_git_commit(project_root)
+
+    # Build report
+    report_lines = []
+
+    # Frontmatter
+    report_lines.append("---")
+    report_lines.append(f"title: BMAD Workflow ↔ Story Synchronization Report")
+    report_lines.append(f"generated: {datetime.now().isoformat()}")
+    report_lines.append(f"git_commit: {commit_hash}")
+    report_lines.append(f"total_actions: {total_actions}")
+    if ledger:
+        report_lines.append(f"llm_cost_actual: {ledger.actual_total:.4f}")
+        report_lines.append(f"llm_cost_estimated: {ledger.estimated_total:.4f}")
+    if delta:
+        report_lines.append("mode: delta")
+        report_lines.append(f"since_commit: {delta['since_commit']}")
+    report_lines.append("---")
+    report_lines.append("")
+
+    # Summary
+    report_lines.append("# BMAD Workflow ↔ Story Synchronization Report")
+    report_lines.append("")
+    report_lines.append(f"**Generated:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    report_lines.append(f"**Git Commit:** `{commit_hash}`")
+    report_lines.append("")
+    report_lines.append("## Summary")
+    report_lines.append("")
+    report_lines.append(f"- **Total Actions:** {total_actions}")
+    report_lines.append(f"  - Stories to Delete: {total_deletes}")
+    report_lines.append(f"  - Stories to Modify: {total_modifies}")
+    report_lines.append(f"  - Stories to Add: {total_adds}")
+    report_lines.append(f"- **New Scenarios Proposed:** {len(new_scenarios)}")
+    if ledger:
+        cost = ledger.summary()
+        report_lines.append(f"- **LLM Cost:** ${cost['actual_cost']:.4f} actual / "
+                            f"${cost['estimated_cost']:.4f} estimated ({cost['calls']} calls)")
+    report_lines.append("")
+
+    # Delta scope
+    if delta:
+        report_lines.append(f"## Changes Since `{delta['since_commit'][:12]}`")
+        report_lines.append("")
+        report_lines.append(f"- **Changed Paths:** {len(delta['changed_paths'])}")
+        report_lines.append(f"- **Changed Workflow Categories:** {', '.join(sorted(delta['workflow_categories'])) or 'none'}")
+        affected = [f"{name} ({why})" for name, why in delta['scenarios'].items()]
+        report_lines.append(f"- **Affected Scenarios:** {', '.join(affected) or 'none'}")
+        report_lines.append("")
+        for path in delta['changed_paths']:
+            report_lines.append(f"- `{path}`")
+        report_lines.append("")
+
+    # Per-scenario sections
+    for scenario_name, results in analysis_results.items():
+        report_lines.append(f"## Scenario: {scenario_name}")
+        report_lines.append("")
+
+        # Stories to Delete
+        if results.get('stories_to_delete'):
+            report_lines.append("### Stories to Delete")
+            report_lines.append("")
+            for item in results['stories_to_delete']:
+                report_lines.append(f"- **{item['file_path']}**")
+                report_lines.append(f"  - Reason: {item['reason']}")
+                # Show cross-scenario impact
+                affects = item.get('affects_other_scenarios', [])
+                if affects:
+                    report_lines.append(f"  - ⚠️ **Also exists in:** {', '.join(affects)}")
+                if item.get('shared_from'):
+                    report_lines.append(f"  - Verdict shared from: {item['shared_from']}")
+                report_lines.append("")
+
+        # Stories to Modify
+        if results.get('stories_to_modify'):
+            report_lines.append("### Stories to Modify")
+            report_lines.append("")
+            for item in results['stories_to_modify']:
+                report_lines.append(f"#### {item['file_path']}")
+                report_lines.append("")
+                report_lines.append(f"**Current Summary:** {item.get('current_summary', 'N/A')}")
+                report_lines.append("")
+                # Show cross-scenario impact
+                affects = item.get('affects_other_scenarios', [])
+                if affects:
+                    report_lines.append(f"⚠️ **Also exists in:** {', '.join(affects)}")
+                    report_lines.append("")
+                if item.get('shared_from'):
+                    report_lines.append(f"**Verdict shared from:** {item['shared_from']}")
+                    report_lines.append("")
+                report_lines.append("**Changes Needed:**")
+                for change in item.get('changes_needed', []):
+                    report_lines.append(f"- {change}")
+                report_lines.append("")
+                if item.get('diff'):
+                    report_lines.append("**Diff:**")
+                    # Escape triple backticks in diff content to avoid nesting issues
+                    diff_content = item['diff'].replace('```', '\\`\\`\\`')
+                    report_lines.append("```diff")
+                    report_lines.append(diff_content)
+                    report_lines.append("```")
+                    report_lines.append("")
+
+        # Stories to Add
+        if results.get('stories_to_add'):
+            report_lines.append("### Stories to Add")
+            report_lines.append("")
+            for item in results['stories_to_add']:
+                report_lines.append(f"#### New Story: {item['filename']}")
+                report_lines.append("")
+                report_lines.append(f"**Wave:** {item.get('wave', 'N/A')} | **Epic:** {item.get('epic', 'N/A')} | **Story:** {item.get('story', 'N/A')}")
+                report_lines.append("")
+                # Show target scenarios
+                targets = item.get('target_scenarios', [scenario_name])
+                if len(targets) == 1:
+                    report_lines.append(f"**Target Scenario:** {targets[0]}")
+                else:
+                    report_lines.append(f"**Target Scenarios:** {', '.join(targets)}")
+                report_lines.append("")
+                report_lines.append(f"**Summary:** {item.get('summary', 'N/A')}")
+                report_lines.append("")
+
+    # New Scenarios
+    if new_scenarios:
+        report_lines.append("## Proposed New Scenarios")
+        report_lines.append("")
+        for scenario in new_scenarios:
+            report_lines.append(f"### {scenario['scenario_name']}")
+            report_lines.append("")
+            report_lines.append(f"**Description:** {scenario.get('description', 'N/A')}")
+            report_lines.append("")
+            report_lines.append("**Suggested Stories:**")
+            for story in scenario.get('suggested_stories', []):
+                report_lines.append(f"- `{story['filename']}`: {story.get('summary', 'N/A')}")
+            report_lines.append("")
+
+    # Write report
+    with open(output_path, 'w') as f:
+        f.write('\n'.join(report_lines))
+
+    logger.info(f"Report generated: {output_path}")
+    PROGRESS.emit('report_written', path=output_path)
+
+
+# ============================================================================
+# APPLY PROPOSED CHANGES
+# ============================================================================
+
+class PatchConflictError(Exception):
+    """A proposed change cannot be applied to the current story file."""
+
+
+def resolve_story_path(stories_base: Path, scenario_name: str, file_path: str) -> Path:
+    """Map an LLM file_path ('stories/.../file.md') to the story file of the scenario."""
+    return stories_base / scenario_name / Path(file_path).name
+
+
+def save_analysis_results(
+    analysis_results: Dict,
+    new_scenarios: List[Dict],
+    scenario_stories: Dict[str, List[StoryRecord]],
+    project_root: Path,
+    path: Path,
+    logger: logging.Logger
+):
+    """
+    Save the structured analysis results for --apply.
+
+    Records the checksum of every story file a delete/modify is based on, so
+    --apply can refuse to touch files edited since the analysis.
+    """
+    base_checksums = {}
+    for scenario_name, results in analysis_results.items():
+        story_paths = {s.filename: Path(s.file_path) for s in scenario_stories.get(scenario_name, [])}
+        for key in ('stories_to_delete', 'stories_to_modify'):
+            for item in results.get(key, []):
+                story_path = story_paths.get(Path(item.get('file_path', '')).name)
+                if story_path and story_path.exists():
+                    rel = story_path.relative_to(project_root).as_posix()
+                    base_checksums[rel] = compute_checksum(story_path)
+
+    write_json_atomic(path, {
+        'generated': datetime.now().isoformat(),
+        'git_commit': get_git_commit(project_root),
+        'scenarios': analysis_results,
+        'new_scenarios': new_scenarios,
+        'base_checksums': base_checksums
+    })
+    logger.info(f"Structured results saved to: {path}")
+
+
+def resolve_results_file(spec: str, output_base: Path, logger: logging.Logger) -> Path:
+    """Resolve --apply to a results file ('latest' = newest non dry-run results)."""
+    if spec != 'latest':
+        path = Path(spec)
+        if not path.exists():
+            logger.error(f"--apply: results file not found: {path}")
+            sys.exit(1)
+        return path
+
+    results = sorted(
+        (p for p in output_base.glob("workflow-sync-*results-*.json") if not p.name.startswith('[DRY-RUN]')),
+        key=lambda p: p.stat().st_mtime
+    )
+    if not results:
+        logger.error(f"--apply latest: no results file found in {output_base}")
+        sys.exit(1)
+    return results[-1]
+
+
+def parse_diff_hunks(diff_text: str) -> List[Tuple[List[str], List[str]]]:
+    """
+    Parse a unified diff into (old_lines, new_lines) hunks.
+
+    Line numbers in '@@' headers are ignored: hunks are located by their
+    context, which tolerates the approximate headers LLMs produce. A diff
+    without '@@' headers is treated as a single hunk. File headers ('--- ',
+    '+++ ', 'diff ', 'index ') are only recognized before the first hunk line,
+    so a removed content line such as "-- comment" is kept.
+    """
+    hunks = []
+    old, new = [], []
+    in_body = False
+    for line in diff_text.splitlines():
+        if not in_body and line.startswith(('--- ', '+++ ', 'diff ', 'index ')):
+            continue
+        in_body = True
+        if line.startswith('@@'):
+            if old or new:
+                hunks.append((old, new))
+            old, new = [], []
+            continue
+        if line.startswith('\\'):
+            continue  # "\ No newline at end of file"
+        if line.startswith('-'):
+            old.append(line[1:])
+        elif line.startswith('+'):
+            new.append(line[1:])
+        else:
+            context = line[1:] if line.startswith(' ') else line
+            old.append(context)
+            new.append(context)
+    if old or new:
+        hunks.append((old, new))
+    return hunks
+
+
+def apply_diff(original: str, diff_text: str) -> str:
+    """
+    Apply a unified diff to a story's text.
+
+    Each hunk's context and removed lines must match exactly one place in the
+    file (after the previous hunk), ignoring trailing whitespace.
+
+    Raises PatchConflictError if a hunk cannot be located unambiguously.
+    """
+    lines = original.splitlines()
+    hunks = parse_diff_hunks(diff_text)
+    if not hunks:
+        raise PatchConflictError("empty diff")
+
+    position = 0
+    for index, (old, new) in enumerate(hunks):
+        if not [line for line in old if line.strip()]:
+            raise PatchConflictError(f"hunk {index + 1} has no context to locate it")
+        wanted = [line.rstrip() for line in old]
+        matches = [
+            start for start in range(position, len(lines) - len(old) + 1)
+            if [line.rstrip() for line in lines[start:start + len(old)]] == wanted
+        ]
+        if not matches:
+            raise PatchConflictError(f"hunk {index + 1} does not match the current file")
+        if len(matches) > 1:
+            raise PatchConflictError(f"hunk {index + 1} matches {len(matches)} places")
+        start = matches[0]
+        lines[start:start + len(old)] = new
+        position = start + len(new)
+
+    return '\n'.join(lines) + ('\n' if original.endswith('\n') else '')
+
+
+def render_new_story(item: Dict) -> str:
+    """Render a story skeleton for a stories_to_add entry, to be completed by hand."""
+    wave, epic, story = item.get('wave', '?'), item.get('epic', '?'), item.get('story', '?')
+    slug = '-'.join(item['filename'][:-3].split('-')[3:])
+    title = slug.replace('-', ' ').title()
+    return (
+        f"# Story {wave}-{epic}/{story}: {title}\n\n"
+        f"**Wave:** {wave} | **Epic:** {epic} | **Story:** {story}\n"
+        f"**Status:** Draft\n\n"
+        f"## Summary\n\n"
+        f"{item.get('summary', '')}\n\n"
+        f"## Acceptance Criteria\n\n"
+        f"1. [ ] TODO\n"
+    )
+
+
+def plan_changes(
+    results_data: Dict,
+    project_root: Path,
+    stories_base: Path,
+    logger: logging.Logger
+) -> Tuple[List[Dict], List[str]]:
+    """
+    Turn saved analysis results into file operations, without touching disk.
+
+    Returns (operations, conflicts). Each operation is
+    {'action': 'delete'|'modify'|'add', 'path': Path, 'content': new text or None,
+    'original': current text or None}.
+    """
+    base_checksums = results_data.get('base_checksums', {})
+    operations = []
+    conflicts = []
+    planned = {}
+
+    def conflict(path: Path, problem: str):
+        conflicts.append(f"{path.relative_to(project_root).as_posix()}: {problem}")
+
+    def check_base(path: Path) -> Optional[str]:
+        """Current text of an existing story, None (and a conflict) if it moved on."""
+        rel = path.relative_to(project_root).as_posix()
+        if path in planned:
+            conflict(path, f"already planned for {planned[path]}")
+            return None
+        if not path.exists():
+            conflict(path, "file no longer exists")
+            return None
+        if rel not in base_checksums:
+            conflict(path, "no base checksum recorded in the results")
+            return None
+        if compute_checksum(path) != base_checksums[rel]:
+            conflict(path, "file changed since the analysis")
+            return None
+        return path.read_text(encoding='utf-8')
+
+    for scenario_name, results in results_data.get('scenarios', {}).items():
+        for item in results.get('stories_to_delete', []):
+            path = resolve_story_path(stories_base, scenario_name, item.get('file_path', ''))
+            original = check_base(path)
+            if original is not None:
+                operations.append({'action': 'delete', 'path': path, 'content': None, 'original': original})
+                planned[path] = 'delete'
+
+        for item in results.get('stories_to_modify', []):
+            path = resolve_story_path(stories_base, scenario_name, item.get('file_path', ''))
+            if not item.get('diff'):
+                conflict(path, "no diff proposed")
+                continue
+            original = check_base(path)
+            if original is None:
+                continue
+            try:
+                content = apply_diff(original, item['diff'])
+            except PatchConflictError as e:
+                conflict(path, str(e))
+                continue
+            operations.append({'action': 'modify', 'path': path, 'content': content, 'original': original})
+            planned[path] = 'modify'
+
+        for item in results.get('stories_to_add', []):
+            filename = item.get('filename', '')
+            problem = validate_story_filename(filename)
+            if problem:
+                conflicts.append(f"{scenario_name}: stories_to_add {problem}")
+                continue
+            for target in item.get('target_scenarios') or [scenario_name]:
+                path = stories_base / target / filename
+                if not validate_path_safety(path, stories_base) or not (stories_base / target).is_dir():
+                    conflicts.append(f"{filename}: unknown target scenario {target!r}")
+                    continue
+                if planned.get(path) == 'add':
+                    continue  # Same story proposed by several scenarios
+                if path in planned:
+                    conflict(path, f"already planned for {planned[path]}")
+                    continue
+                if path.exists():
+                    conflict(path, "file already exists")
+                    continue
+                operations.append({'action': 'add', 'path': path, 'content': render_new_story(item), 'original': None})
+                planned[path] = 'add'
+
+    logger.debug(f"Planned {len(operations)} operations, {len(conflicts)} conflicts")
+    return operations, conflicts
+
+
+def apply_changes(operations: List[Dict], project_root: Path, logger: logging.Logger, dry_run: bool = False):
+    """Apply planned operations (atomic writes), or only preview them in dry-run mode."""
+    for op in operations:
+        rel = op['path'].relative_to(project_root).as_posix()
+        logger.info(f"{'[DRY-RUN] ' if dry_run else ''}{op['action'].upper()} {rel}")
+        if dry_run:
+            if op['action'] == 'modify':
+                for line in difflib.unified_diff(op['original'].splitlines(), op['content'].splitlines(),
+                                                 f"a/{rel}", f"b/{rel}", lineterm=''):
+                    logger.info(f"    {line}")
+            continue
+
+        if op['action'] == 'delete':
+            op['path'].unlink()
+        else:
+            write_text_atomic(op['path'], op['content'])
+
+
+def run_apply(spec: str, project_root: Path, output_base: Path, logger: logging.Logger, dry_run: bool = False):
+    """
+    --apply: apply the delete/modify/add proposals of a results file in one pass.
+
+    Conflicting proposals (story edited since the analysis, diff that does not
+    match, invalid filename, existing file) are skipped and reported; the
+    others are applied. Exits with status 1 if there were conflicts.
+    """
+    results_path = resolve_results_file(spec, output_base, logger)
+    logger.info(f"Applying results from {results_path.name}")
+    with open(results_path, 'r') as f:
+        results_data = json.load(f)
+
+    stories_base = project_root / "bmad-templates" / "stories"
+    operations, conflicts = plan_changes(results_data, project_root, stories_base, logger)
+    apply_changes(operations, project_root, logger, dry_run)
+
+    for problem in conflicts:
+        logger.warning(f"CONFLICT {problem}")
+    counts = {action: sum(1 for op in operations if op['action'] == action) for action in ('delete', 'modify', 'add')}
+    logger.info(f"{'Would apply' if dry_run else 'Applied'}: {counts['delete']} deletions, "
+                f"{counts['modify']} modifications, {counts['add']} additions; {len(conflicts)} conflicts skipped")
+    if conflicts:
+        sys.exit(1)
+
+
+# ============================================================================
+# WORKER MODE (JSON-RPC)
+# ============================================================================
+
+# JSON-RPC 2.0 error codes
+RPC_PARSE_ERROR = -32700
+RPC_INVALID_REQUEST = -32600
+RPC_METHOD_NOT_FOUND = -32601
+RPC_INVALID_PARAMS = -32602
+RPC_SERVER_ERROR = -32000
+
+# 'analyze' request parameters (same names and defaults as the CLI options)
+ANALYZE_PARAMS = ('scenario', 'since', 'dry_run', 'fresh', 'max_tokens_per_call', 'max_cost',
+                  'call_timeout', 'deadline', 'hedge', 'queue', 'cache_dir', 'combined')
+
+
+class InvalidParamsError(Exception):
+    """A worker request has missing or unknown parameters."""
+
+
+class ErrorCollector(logging.Handler):
+    """Collects the ERROR messages logged while a worker request is handled."""
+
+    def __init__(self):
+        super().__init__(logging.ERROR)
+        self.messages: List[str] = []
+
+    def emit(self, record: logging.LogRecord):
+        self.messages.append(record.getMessage())
+
+
+def workflow_tree_signature(paths: Dict[str, Path]) -> str:
+    """Signature of the workflow files from their size and mtime (no file reads)."""
+    entries = []
+    for key in ('bmm_workflows', 'tea_workflows'):
+        for pattern in ("**/workflow.md", "**/workflow.yaml"):
+            for wf_path in paths[key].glob(pattern):
+                stat = wf_path.stat()
+                entries.append(f"{wf_path}:{stat.st_size}:{stat.st_mtime_ns}")
+    return hashlib.sha256('\n'.join(sorted(entries)).encode()).hexdigest()[:16]
+
+
+def rpc_error(request_id: Any, code: int, message: str, data: Any = None) -> Dict:
+    """Build a JSON-RPC error response."""
+    error = {'code': code, 'message': message}
+    if data is not None:
+        error['data'] = data
+    return {'jsonrpc': '2.0', 'id': request_id, 'error': error}
+
+
+class AnalyzerWorker:
+    """
+    Long-running analyzer answering JSON-RPC 2.0 requests (see serve).
+
+    State kept warm between requests: project root, LLM configuration, the
+    workflow index (rescanned only when a workflow file's size or mtime
+    changes) and, by living in one process, litellm's HTTP clients, the rate
+    limiters and the hedging event loop. Requests are handled one at a time.
+
+    Methods: analyze, scan, report, cache-stats.
+    """
+
+    def __init__(self, project_root: Path, logger: logging.Logger):
+        self.project_root = project_root
+        self.paths = get_project_paths(project_root)
+        self.logger = logger
+        self.llm_config: Optional[Dict] = None
+        self.workflows: Optional[Dict] = None
+        self.workflows_signature: Optional[str] = None
+        self.lock = threading.Lock()
+        self.methods = {
+            'analyze': self.analyze,
+            'scan': self.scan,
+            'report': self.report,
+            'cache-stats': self.cache_stats,
+        }
+
+    def get_workflows(self) -> Tuple[Dict, bool]:
+        """Return (workflow index, reused) rescanning only if a workflow file changed."""
+        signature = workflow_tree_signature(self.paths)
+        if self.workflows is not None and signature == self.workflows_signature:
+            return self.workflows, True
+        self.workflows = scan_all_workflows(self.paths, self.logger)
+        self.workflows_signature = signature
+        return self.workflows, False
+
+    def handle(self, request: Any) -> Optional[Dict]:
+        """Answer one decoded JSON-RPC request (None for notifications)."""
+        if not isinstance(request, dict) or request.get('jsonrpc') != '2.0' or not isinstance(request.get('method'), str):
+            return rpc_error(request.get('id') if isinstance(request, dict) else None,
+                             RPC_INVALID_REQUEST, "Invalid Request")
+        request_id = request.get('id')
+        method = self.methods.get(request['method'])
+        params = request.get('params') or {}
+
+        if method is None:
+            response = rpc_error(request_id, RPC_METHOD_NOT_FOUND, f"Method not found: {request['method']}")
+        elif not isinstance(params, dict):
+            response = rpc_error(request_id, RPC_INVALID_PARAMS, "params must be an object")
+        else:
+            collector = ErrorCollector()
+            self.logger.addHandler(collector)
+            try:
+                with self.lock:
+                    response = {'jsonrpc': '2.0', 'id': request_id, 'result': method(params)}
+            except InvalidParamsError as e:
+                response = rpc_error(request_id, RPC_INVALID_PARAMS, str(e))
+            except SystemExit:
+                # The analysis stopped the way the CLI does (logger.error + exit)
+                message = collector.messages[0] if collector.messages else "analysis aborted"
+                response = rpc_error(request_id, RPC_SERVER_ERROR, message, {'errors': collector.messages})
+            except Exception as e:
+                self.logger.exception(f"Worker request {request['method']} failed")
+                response = rpc_error(request_id, RPC_SERVER_ERROR, str(e))
+            finally:
+                self.logger.removeHandler(collector)
+
+        return response if 'id' in request else None
+
+    def analyze(self, params: Dict) -> Dict:
+        """Run an analysis; params are the CLI options (scenario, since, dry_run, max_cost...)."""
+        args = build_arg_parser().parse_args([])
+        for name, value in params.items():
+            key = name.replace('-', '_')
+            if key not in ANALYZE_PARAMS:
+                raise InvalidParamsError(f"Unknown analyze parameter: {name}")
+            setattr(args, key, value)
+
+        started = time.monotonic()
+        if self.llm_config is None:
+            self.llm_config = load_llm_config(self.logger)
+        workflows, reused = self.get_workflows()
+        summary = run_analysis(args, self.project_root, self.llm_config, workflows, self.logger)
+
+        return {
+            'report': str(summary['report_path']),
+            'results': str(summary['results_path']) if summary['results_path'] else None,
+            'ledger': str(summary['ledger_path']) if summary['ledger_path'] else None,
+            'scenarios': {
+                name: {key: len(result.get(key, [])) for key in ANALYSIS_REQUIRED_KEYS}
+                for name, result in summary['analysis_results'].items()
+            },
+            'new_scenarios': [s.get('scenario_name') for s in summary['new_scenarios']],
+            'cost': summary['cost'],
+            'workflow_index': 'warm' if reused else 'rescanned',
+            'seconds': round(time.monotonic() - started, 3)
+        }
+
+    def scan(self, params: Dict) -> Dict:
+        """Refresh the workflow index; list workflow categories and scenarios."""
+        started = time.monotonic()
+        workflows, reused = self.get_workflows()
+        scenarios = discover_scenarios(self.paths['stories'], self.logger)
+        return {
+            'workflow_index': 'warm' if reused else 'rescanned',
+            'workflows': {category: sorted(wfs) for category, wfs in workflows.items()},
+            'scenarios': {name: len(list(path.glob("*.md"))) for name, path in scenarios.items()},
+            'seconds': round(time.monotonic() - started, 3)
+        }
+
+    def report(self, params: Dict) -> Dict:
+        """Return a report: params.path, or the newest one (params.include_dry_run to consider dry runs)."""
+        output_base = self.paths['output']
+        if params.get('path'):
+            path = Path(params['path'])
+            if not path.is_absolute():
+                path = output_base / path
+            if not validate_path_safety(path, output_base) or not path.is_file():
+                raise InvalidParamsError(f"No such report: {params['path']}")
+        else:
+            reports = sorted(
+                (p for p in output_base.glob("*workflow-sync-*report-*.md")
+                 if params.get('include_dry_run') or not p.name.startswith('[DRY-RUN]')),
+                key=lambda p: p.stat().st_mtime
+            )
+            if not reports:
+                raise InvalidParamsError(f"No report found in {output_base}")
+            path = reports[-1]
+
+        return {
+            'path': str(path),
+            'modified': datetime.fromtimestamp(path.stat().st_mtime).isoformat(),
+            'content': path.read_text(encoding='utf-8')
+        }
+
+    def cache_stats(self, params: Dict) -> Dict:
+        """Size of the cache by kind of entry, and the state of the run journal."""
+        cache_base = self.paths['cache']
+        by_kind: Dict[str, Dict[str, int]] = {}
+        mtimes = []
+        for path in (cache_base.iterdir() if cache_base.exists() else []):
+            if not path.is_file():
+                continue
+            name = path.name
+            if name == RunJournal.FILENAME:
+                kind = 'journal'
+            elif name.endswith('.lock'):
+                kind = 'locks'
+            elif name.endswith('.tmp'):
+                kind = 'partial_writes'
+            elif name.startswith('snapshot-'):
+                kind = 'snapshots'
+            elif name.startswith('new-scenarios-'):
+                kind = 'new_scenarios'
+            else:
+                kind = 'analyses'
+            stat = path.stat()
+            entry = by_kind.setdefault(kind, {'files': 0, 'bytes': 0})
+            entry['files'] += 1
+            entry['bytes'] += stat.st_size
+            mtimes.append(stat.st_mtime)
+
+        journal = None
+        journal_path = cache_base / RunJournal.FILENAME
+        if journal_path.exists():
+            try:
+                with open(journal_path, 'r') as f:
+                    data = json.load(f)
+                journal = {'status': data.get('status'), 'started': data.get('started'),
+                           'scenarios_done': len(data.get('scenarios', {}))}
+            except (json.JSONDecodeError, IOError):
+                journal = {'status': 'unreadable'}
+
+        return {
+            'path': str(cache_base),
+            'files': sum(e['files'] for e in by_kind.values()),
+            'bytes': sum(e['bytes'] for e in by_kind.values()),
+            'by_kind': by_kind,
+            'oldest': datetime.fromtimestamp(min(mtimes)).isoformat() if mtimes else None,
+            'newest': datetime.fromtimestamp(max(mtimes)).isoformat() if mtimes else None,
+            'journal': journal
+        }
+
+
+def serve_stream(reader: Iterable[str], writer, worker: AnalyzerWorker):
+    """Answer newline-delimited JSON-RPC requests from reader until EOF."""
+    for line in reader:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError as e:
+            response = rpc_error(None, RPC_PARSE_ERROR, f"Parse error: {e}")
+        else:
+            response = worker.handle(request)
+        if response is not None:
+            writer.write(json.dumps(response, default=str) + '\n')
+            writer.flush()
+
+
+def serve(spec: str, worker: AnalyzerWorker, logger: logging.Logger):
+    """
+    Serve JSON-RPC 2.0, one request/response per line, on stdin/stdout
+    ('stdio', logs stay on stderr) or a unix socket ('unix:PATH', owner-only).
+    """
+    if spec == 'stdio':
+        logger.info("Worker ready: JSON-RPC on stdin/stdout (methods: analyze, scan, report, cache-stats)")
+        serve_stream(sys.stdin, sys.stdout, worker)
+        return
+
+    if not spec.startswith('unix:'):
+        logger.error(f"Invalid --serve: {spec!r} (expected stdio or unix:PATH)")
+        sys.exit(1)
+
+    socket_path = Path(spec[len('unix:'):])
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            serve_stream(io.TextIOWrapper(self.rfile, encoding='utf-8'),
+                         io.TextIOWrapper(self.wfile, encoding='utf-8', write_through=True), worker)
+
+    if socket_path.exists():
+        socket_path.unlink()  # Left over by a previous worker
+    server = socketserver.ThreadingUnixStreamServer(str(socket_path), Handler)
+    server.daemon_threads = True
+    os.chmod(socket_path, 0o600)
+    logger.info(f"Worker ready: JSON-RPC on {socket_path} (methods: analyze, scan, report, cache-stats)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if socket_path.exists():
+            socket_path.unlink()
+
+
+# ============================================================================
+# WORK QUEUE (DISTRIBUTED ANALYSIS)
+# ============================================================================
+
+QUEUE_LEASE_SECONDS = 300        # A claimed job whose heartbeat is older is requeued
+QUEUE_POLL_SECONDS = 2
+QUEUE_WORKER_IDLE_SECONDS = 600  # A queue worker exits after this long without a job
+
+
+class QueueJobError(Exception):
+    """One or more queued jobs failed on their worker."""
+
+
+class WorkQueue:
+    """
+    Directory-backed job queue, usable on shared storage by several hosts.
+
+    pending/<job>.json -> claimed/<job>.json -> results/<job>.json
+
+    A job is claimed by renaming it into claimed/ (atomic: exactly one worker
+    wins). The claimer keeps the claimed file's mtime fresh while it works;
+    a claim whose heartbeat is older than QUEUE_LEASE_SECONDS (crashed or
+    disconnected worker) is moved back to pending/.
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.pending = root / "pending"
+        self.claimed = root / "claimed"
+        self.results = root / "results"
+        for directory in (self.pending, self.claimed, self.results):
+            directory.mkdir(parents=True, exist_ok=True)
+
+    def enqueue(self, job: Dict):
+        write_json_atomic(self.pending / f"{job['id']}.json", job)
+
+    def claim(self) -> Optional[Dict]:
+        """Claim the oldest pending job (None if there is none)."""
+        for path in sorted(self.pending.glob("*.json")):  # Job ids start with the run's timestamp
+            target = self.claimed / path.name
+            try:
+                # Fresh mtime before the rename: a claim never appears in claimed/ with a stale heartbeat
+                os.utime(path)
+                os.rename(path, target)
+                with open(target, 'r') as f:
+                    return json.load(f)
+            except FileNotFoundError:
+                continue  # Claimed by another worker
+        return None
+
+    def heartbeat(self, job_id: str):
+        try:
+            os.utime(self.claimed / f"{job_id}.json")
+        except FileNotFoundError:
+            pass
+
+    def complete(self, job_id: str, outcome: Dict):
+        write_json_atomic(self.results / f"{job_id}.json", outcome)
+        try:
+            (self.claimed / f"{job_id}.json").unlink()
+        except FileNotFoundError:
+            pass  # Requeued meanwhile; the duplicate result is ignored
+
+    def take_result(self, job_id: str) -> Optional[Dict]:
+        """Return and remove the result of a job, None if not finished."""
+        path = self.results / f"{job_id}.json"
+        try:
+            with open(path, 'r') as f:
+                outcome = json.load(f)
+        except FileNotFoundError:
+            return None
+        path.unlink()
+        return outcome
+
+    def requeue_expired(self, logger: logging.Logger):
+        now = time.time()
+        for path in self.claimed.glob("*.json"):
+            try:
+                if now - path.stat().st_mtime > QUEUE_LEASE_SECONDS:
+                    os.rename(path, self.pending / path.name)
+                    logger.warning(f"Requeued {path.stem}: worker heartbeat older than {QUEUE_LEASE_SECONDS}s")
+            except FileNotFoundError:
+                continue
+
+
+def plan_scenario_jobs(
+    run_id: str,
+    project_root: Path,
+    scenario_name: str,
+    stories: List[StoryRecord],
+    all_workflows: Dict,
+    cache_key: str,
+    change_ratio: float,
+    ledger: CostLedger,
+    logger: logging.Logger
+) -> List[Dict]:
+    """
+    Plan the jobs of a scenario analysis, one job per planned LLM call.
+
+    Jobs are self-contained: workers rescan the project themselves and
+    check that they see the same inputs (same cache key). Each job gets
+    the remaining --deadline of the run; its share of --max-cost is set
+    by enqueue_jobs.
+    """
+    calls = plan_scenario_calls(all_workflows, stories, scenario_name, ledger.max_tokens_per_call, logger)
+    deadline_at = None
+    if ledger.deadline_at is not None:
+        deadline_at = time.time() + ledger.deadline_at - time.monotonic()
+
+    jobs = []
+    for index, (chunk, referenced) in enumerate(calls):
+        prompt = build_scenario_prompt(all_workflows, chunk, referenced, scenario_name)
+        jobs.append({
+            'id': f"{run_id}-{scenario_name}-{index + 1:03d}",
+            'project_root': str(project_root),
+            'scenario': scenario_name,
+            'chunk': index if len(calls) > 1 else None,
+            'chunks': len(calls),
+            'stories': [{'filename': s.filename, 'analyzed_in': s.analyzed_in} for s in stories],
+            'cache_key': cache_key,
+            'change_ratio': change_ratio,
+            'estimated_tokens': estimate_tokens(prompt) + ESTIMATED_OUTPUT_TOKENS,
+            'max_tokens_per_call': ledger.max_tokens_per_call,
+            'call_timeout': ledger.call_timeout,
+            'deadline_at': deadline_at,
+            'hedge': ledger.hedge
+        })
+    return jobs
+
+
+def enqueue_jobs(queue: WorkQueue, jobs: List[Dict], ledger: CostLedger, logger: logging.Logger):
+    """
+    Enqueue planned jobs. The remaining --max-cost is split between them in
+    proportion to their estimated tokens, so that all workers together stay
+    under the run's ceiling.
+    """
+    remaining = ledger.max_cost - ledger.actual_total if ledger.max_cost is not None else None
+    total_tokens = sum(job['estimated_tokens'] for job in jobs)
+    for job in jobs:
+        job['max_cost'] = remaining * job['estimated_tokens'] / total_tokens if remaining is not None else None
+        queue.enqueue(job)
+    logger.info(f"Queued {len(jobs)} job(s) in {queue.root}"
+                + (f", ${remaining:.4f} of --max-cost split between them" if remaining is not None else ""))
+
+
+def run_queue_job(job: Dict, llm_config: Dict, ledger: CostLedger,
+                  projects: Dict[str, Tuple[str, Dict]], logger: logging.Logger) -> Dict:
+    """
+    Run one queued scenario analysis (or one call of a split scenario).
+
+    projects caches the workflow index per project root, rescanned only
+    when a workflow file changes (see workflow_tree_signature).
+    """
+    paths = get_project_paths(Path(job['project_root']))
+    scenario_path = paths['stories'] / job['scenario']
+    if not scenario_path.is_dir():
+        raise ValueError(f"{scenario_path} not found on this host")
+
+    signature = workflow_tree_signature(paths)
+    if job['project_root'] not in projects or projects[job['project_root']][0] != signature:
+        projects[job['project_root']] = (signature, scan_all_workflows(paths, logger))
+    all_workflows = projects[job['project_root']][1]
+
+    scanned = {s.filename: s for s in scan_stories(scenario_path, logger)}
+    stories = []
+    for entry in job['stories']:
+        if entry['filename'] not in scanned:
+            raise ValueError(f"{job['scenario']}/{entry['filename']} not found on this host")
+        story = scanned[entry['filename']]
+        story.analyzed_in = entry['analyzed_in']
+        stories.append(story)
+    # Same inputs and max_tokens_per_call as the coordinator, hence the same call plan
+    if get_cache_key(all_workflows, job['scenario'], stories) != job['cache_key']:
+        raise ValueError("project files differ from the coordinator's (cache key mismatch)")
+
+    return analyze_scenario(all_workflows, stories, job['scenario'], llm_config, logger,
+                            ledger, None, job['change_ratio'], chunk_index=job['chunk'])
+
+
+def process_queue_job(queue: WorkQueue, job: Dict, llm_config: Dict,
+                      projects: Dict[str, Tuple[str, Dict]], logger: logging.Logger):
+    """Run a claimed job under a heartbeat and publish its outcome (result or error, and spend)."""
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    logger.info(f"Processing queued job {job['id']}")
+    deadline = job['deadline_at'] - time.time() if job.get('deadline_at') else None
+    ledger = CostLedger(max_cost=job['max_cost'], max_tokens_per_call=job['max_tokens_per_call'],
+                        call_timeout=job['call_timeout'], deadline=deadline, hedge=job['hedge'])
+
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(QUEUE_LEASE_SECONDS / 3):
+            queue.heartbeat(job['id'])
+
+    threading.Thread(target=beat, daemon=True).start()
+    collector = ErrorCollector()
+    logger.addHandler(collector)
+    try:
+        outcome = {'result': run_queue_job(job, llm_config, ledger, projects, logger)}
+    except BudgetExceededError as e:
+        outcome = {'error': str(e), 'budget': True}
+    except SystemExit:
+        outcome = {'error': collector.messages[0] if collector.messages else "analysis aborted"}
+    except Exception as e:
+        logger.exception(f"Queued job {job['id']} failed")
+        outcome = {'error': str(e)}
+    finally:
+        stop.set()
+        logger.removeHandler(collector)
+
+    outcome.update(worker=worker_id, ledger=ledger.entries)
+    queue.complete(job['id'], outcome)
+
+
+def collect_queued_scenarios(
+    queue: WorkQueue,
+    queued: Dict[str, Dict],
+    llm_config: Dict,
+    ledger: CostLedger,
+    logger: logging.Logger,
+    on_done: Callable[[str, Dict], None]
+):
+    """
+    Wait for the jobs of queued scenarios ({scenario: {'jobs': [ids]}}),
+    working on the queue meanwhile, so a run progresses even without workers.
 
-    try:
-        response = completion(
-            model=llm_config['BASE_MODEL'],
-            messages=[{"role": "user", "content": prompt}],
-            api_base=llm_config['BASE_URL'],
-            api_key=llm_config['BASE_KEY'],
-            custom_llm_provider="openai"  # Force OpenAI-compatible mode, no Google auth
-        )
+    on_done(scenario, merged result) is called as each scenario completes;
+    worker spend is added to the ledger. Raises QueueJobError after every job
+    has finished if some failed (BudgetExceededError if all failures are budgets).
+    """
+    outcomes: Dict[str, Dict] = {}
+    remaining = {job_id for entry in queued.values() for job_id in entry['jobs']}
+    failures = []
+    projects: Dict[str, Tuple[str, Dict]] = {}
+
+    while remaining:
+        progressed = False
+        for job_id in sorted(remaining):
+            outcome = queue.take_result(job_id)
+            if outcome is None:
+                continue
+            progressed = True
+            remaining.discard(job_id)
+            outcomes[job_id] = outcome
+            ledger.entries.extend(outcome.get('ledger', []))
+            if 'error' in outcome:
+                logger.error(f"Queued job {job_id} failed on {outcome.get('worker')}: {outcome['error']}")
+                failures.append(outcome)
+
+        for scenario_name, entry in queued.items():
+            if entry.get('done') or any(job_id not in outcomes for job_id in entry['jobs']):
+                continue
+            entry['done'] = True
+            parts = [outcomes[job_id] for job_id in entry['jobs']]
+            if any('error' in part for part in parts):
+                continue
+            results = [part['result'] for part in parts]
+            on_done(scenario_name, results[0] if len(results) == 1 else merge_chunk_results(results))
+
+        if not remaining or progressed:
+            continue
+        queue.requeue_expired(logger)
+        job = queue.claim()
+        if job is not None:
+            process_queue_job(queue, job, llm_config, projects, logger)
+        else:
+            time.sleep(QUEUE_POLL_SECONDS)
 
-        # Parse response with markdown fence handling
-        response_content = response.choices[0].message.content
-        logger.debug(f"New scenarios response (first 500 chars):\n{response_content[:500]}")
+    if failures:
+        message = f"{len(failures)} queued job(s) failed: {failures[0]['error']}"
+        if all(failure.get('budget') for failure in failures):
+            raise BudgetExceededError(message)
+        raise QueueJobError(message)
 
-        # Handle JSON wrapped in markdown code fences
-        if response_content.strip().startswith('```'):
-            # Remove markdown code fences
-            lines = response_content.strip().split('\n')
-            # Remove first line (```json or ```) and last line (```)
-            response_content = '\n'.join(lines[1:-1])
-            logger.debug("Removed markdown code fences from new scenarios response")
 
-        result = json.loads(response_content)
-        return result.get('new_scenarios', [])
+def run_queue_worker(queue_dir: str, logger: logging.Logger):
+    """
+    Claim and run jobs of a work queue until it has been idle for
+    QUEUE_WORKER_IDLE_SECONDS. Jobs may come from several coordinators
+    and projects, as long as their project root is reachable from this host.
+    """
+    queue = WorkQueue(Path(queue_dir))
+    llm_config = load_llm_config(logger)
+    projects: Dict[str, Tuple[str, Dict]] = {}
+    logger.info(f"Queue worker {socket.gethostname()}:{os.getpid()} polling {queue.root}")
 
-    except Exception as e:
-        logger.error(f"Failed to detect new scenarios: {e}")
-        return []
+    processed = 0
+    idle_since = time.monotonic()
+    try:
+        while time.monotonic() - idle_since < QUEUE_WORKER_IDLE_SECONDS:
+            queue.requeue_expired(logger)
+            job = queue.claim()
+            if job is None:
+                time.sleep(QUEUE_POLL_SECONDS)
+                continue
+            process_queue_job(queue, job, llm_config, projects, logger)
+            processed += 1
+            idle_since = time.monotonic()
+    except KeyboardInterrupt:
+        pass
+    logger.info(f"Queue worker exiting after {processed} job(s)")
 
 
 # ============================================================================
-# REPORT GENERATION
+# MULTI-PROJECT BATCH
 # ============================================================================
 
-def get_git_commit() -> str:
-    """Get current git commit hash."""
-    try:
-        import subprocess
-        result = subprocess.run(['git', 'rev-parse', 'HEAD'],
-                              capture_output=True, text=True, check=True)
-        return result.stdout.strip()
-    except Exception:
-        return "NO_GIT"
+class ProjectLogPrefix(logging.Filter):
+    """Prefix the records of a project's logger with the project name."""
 
+    def __init__(self, name: str):
+        super().__init__()
+        self.prefix = f"[{name}] "
 
-def generate_report(
-    analysis_results: Dict[str, Dict],
-    new_scenarios: List[Dict],
-    workflows_checksums: Dict,
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.msg = f"{self.prefix}{record.msg}"
+        return True
+
+
+def resolve_projects(spec: str, logger: logging.Logger) -> List[Path]:
+    """
+    Project roots from comma-separated paths or globs ('@FILE' reads one per
+    line). Directories without bmad-templates/stories are skipped.
+    """
+    patterns = []
+    for item in (part.strip() for part in spec.split(',')):
+        if item.startswith('@'):
+            with open(os.path.expanduser(item[1:]), 'r', encoding='utf-8') as f:
+                patterns += [line.strip() for line in f if line.strip() and not line.startswith('#')]
+        elif item:
+            patterns.append(item)
+
+    projects, seen = [], set()
+    for pattern in patterns:
+        pattern = os.path.expanduser(pattern)
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        if not matches:
+            logger.warning(f"No project matches {pattern}")
+        for match in matches:
+            root = Path(match).resolve()
+            if root in seen:
+                continue
+            if not (root / "bmad-templates" / "stories").is_dir():
+                logger.warning(f"Skipping {match}: no bmad-templates/stories directory")
+                continue
+            seen.add(root)
+            projects.append(root)
+    return projects
+
+
+def workflow_tree_content_key(paths: Dict[str, Path]) -> str:
+    """Key of a project's workflow tree: same relative paths and file contents, same key."""
+    entries = []
+    for key in ('bmm_workflows', 'tea_workflows'):
+        for pattern in ("**/workflow.md", "**/workflow.yaml"):
+            for wf_path in paths[key].glob(pattern):
+                entries.append(f"{key}/{wf_path.relative_to(paths[key])}:{compute_checksum(wf_path)}")
+    return hashlib.sha256('\n'.join(sorted(entries)).encode()).hexdigest()[:16]
+
+
+def project_label(project_root: Path, projects: List[Path]) -> str:
+    """Shortest unambiguous name of a project (directory name, else the full path)."""
+    names = [p.name for p in projects]
+    return project_root.name if names.count(project_root.name) == 1 else str(project_root)
+
+
+def generate_fleet_report(
+    outcomes: List[Dict],
+    workflow_trees: int,
+    shared_cache: Path,
     output_path: Path,
     logger: logging.Logger
 ):
     """
-    Generate markdown synchronization report.
-
-    Structure:
-    - Frontmatter with metadata
-    - Summary statistics
-    - Per-scenario sections (delete/modify/add)
-    - New scenarios section
+    Combined report of a --projects run: a summary table, then every
+    project's report (headings demoted one level) or its error.
     """
-    logger.info(f"Generating report at {output_path}")
-
-    # Ensure output directory exists
+    logger.info(f"Generating combined report at {output_path}")
     output_path.parent.mkdir(parents=True, exist_ok=True)
 
-    # Compute summary statistics
-    total_deletes = sum(len(r.get('stories_to_delete', [])) for r in analysis_results.values())
-    total_modifies = sum(len(r.get('stories_to_modify', [])) for r in analysis_results.values())
-    total_adds = sum(len(r.get('stories_to_add', [])) for r in analysis_results.values())
-    total_actions = total_deletes + total_modifies + total_adds
-
-    # Get git commit
-    commit_hash = get_git_commit()
-
-    # Build report
-    report_lines = []
-
-    # Frontmatter
-    report_lines.append("---")
-    report_lines.append(f"title: BMAD Workflow ↔ Story Synchronization Report")
-    report_lines.append(f"generated: {datetime.now().isoformat()}")
-    report_lines.append(f"git_commit: {commit_hash}")
-    report_lines.append(f"total_actions: {total_actions}")
-    report_lines.append("---")
-    report_lines.append("")
-
-    # Summary
-    report_lines.append("# BMAD Workflow ↔ Story Synchronization Report")
-    report_lines.append("")
-    report_lines.append(f"**Generated:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    report_lines.append(f"**Git Commit:** `{commit_hash}`")
-    report_lines.append("")
-    report_lines.append("## Summary")
-    report_lines.append("")
-    report_lines.append(f"- **Total Actions:** {total_actions}")
-    report_lines.append(f"  - Stories to Delete: {total_deletes}")
-    report_lines.append(f"  - Stories to Modify: {total_modifies}")
-    report_lines.append(f"  - Stories to Add: {total_adds}")
-    report_lines.append(f"- **New Scenarios Proposed:** {len(new_scenarios)}")
-    report_lines.append("")
-
-    # Per-scenario sections
-    for scenario_name, results in analysis_results.items():
-        report_lines.append(f"## Scenario: {scenario_name}")
-        report_lines.append("")
-
-        # Stories to Delete
-        if results.get('stories_to_delete'):
-            report_lines.append("### Stories to Delete")
-            report_lines.append("")
-            for item in results['stories_to_delete']:
-                report_lines.append(f"- **{item['file_path']}**")
-                report_lines.append(f"  - Reason: {item['reason']}")
-                # Show cross-scenario impact
-                affects = item.get('affects_other_scenarios', [])
-                if affects:
-                    report_lines.append(f"  - ⚠️ **Also exists in:** {', '.join(affects)}")
-                report_lines.append("")
+    analyzed = [o for o in outcomes if 'summary' in o]
+    total_cost = sum(o['summary']['cost']['actual_cost'] for o in analyzed)
+    total_calls = sum(o['summary']['cost']['calls'] for o in analyzed)
+
+    lines = [
+        "---",
+        "title: BMAD Workflow ↔ Story Synchronization Report (multi-project)",
+        f"generated: {datetime.now().isoformat()}",
+        f"projects: {len(outcomes)}",
+        f"llm_cost_actual: {total_cost:.4f}",
+        "---",
+        "",
+        "# BMAD Workflow ↔ Story Synchronization Report (multi-project)",
+        "",
+        f"**Generated:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+        "",
+        "## Summary",
+        "",
+        f"- **Projects:** {len(analyzed)} analyzed, {len(outcomes) - len(analyzed)} failed",
+        f"- **Distinct Workflow Trees:** {workflow_trees} (each scanned once)",
+        f"- **Shared Analysis Cache:** `{shared_cache}`",
+        f"- **LLM Cost:** ${total_cost:.4f} actual ({total_calls} calls)",
+        "",
+        "| Project | Delete | Modify | Add | New Scenarios | LLM Calls | Cost | Report |",
+        "|---------|--------|--------|-----|---------------|-----------|------|--------|",
+    ]
+    for outcome in outcomes:
+        if 'summary' not in outcome:
+            lines.append(f"| {outcome['name']} | — | — | — | — | — | — | failed: {outcome['error']} |")
+            continue
+        summary = outcome['summary']
+        counts = {key: sum(len(r.get(key, [])) for r in summary['analysis_results'].values())
+                  for key in ANALYSIS_REQUIRED_KEYS}
+        lines.append(
+            f"| {outcome['name']} | {counts['stories_to_delete']} | {counts['stories_to_modify']} | "
+            f"{counts['stories_to_add']} | {len(summary['new_scenarios'])} | {summary['cost']['calls']} | "
+            f"${summary['cost']['actual_cost']:.4f} | `{summary['report_path']}` |"
+        )
+    lines.append("")
+
+    for outcome in outcomes:
+        lines.append(f"## Project: {outcome['name']}")
+        lines.append("")
+        lines.append(f"**Path:** `{outcome['root']}`")
+        lines.append("")
+        if 'summary' not in outcome:
+            lines.append(f"**Analysis failed:** {outcome['error']}")
+            lines.append("")
+            continue
 
-        # Stories to Modify
-        if results.get('stories_to_modify'):
-            report_lines.append("### Stories to Modify")
-            report_lines.append("")
-            for item in results['stories_to_modify']:
-                report_lines.append(f"#### {item['file_path']}")
-                report_lines.append("")
-                report_lines.append(f"**Current Summary:** {item.get('current_summary', 'N/A')}")
-                report_lines.append("")
-                # Show cross-scenario impact
-                affects = item.get('affects_other_scenarios', [])
-                if affects:
-                    report_lines.append(f"⚠️ **Also exists in:** {', '.join(affects)}")
-                    report_lines.append("")
-                report_lines.append("**Changes Needed:**")
-                for change in item.get('changes_needed', []):
-                    report_lines.append(f"- {change}")
-                report_lines.append("")
-                if item.get('diff'):
-                    report_lines.append("**Diff:**")
-                    # Escape triple backticks in diff content to avoid nesting issues
-                    diff_content = item['diff'].replace('```', '\\`\\`\\`')
-                    report_lines.append("```diff")
-                    report_lines.append(diff_content)
-                    report_lines.append("```")
-                    report_lines.append("")
+        # Embed the project report below its heading (skip its frontmatter and title)
+        text = Path(outcome['summary']['report_path']).read_text(encoding='utf-8')
+        if text.startswith('---\n'):
+            text = text.split('\n---\n', 1)[-1]
+        in_fence = False
+        for line in text.strip().splitlines():
+            if line.startswith('```'):
+                in_fence = not in_fence
+            elif not in_fence and line.startswith('# '):
+                continue
+            elif not in_fence and line.startswith('#'):
+                line = '#' + line
+            lines.append(line)
+        lines.append("")
+
+    write_text_atomic(output_path, '\n'.join(lines))
+    logger.info(f"Combined report saved: {output_path}")
+
+
+def run_projects(args: argparse.Namespace, llm_config: Dict, logger: logging.Logger) -> Dict[str, Any]:
+    """
+    Analyze several projects (--projects) concurrently and write one combined report.
 
-        # Stories to Add
-        if results.get('stories_to_add'):
-            report_lines.append("### Stories to Add")
-            report_lines.append("")
-            for item in results['stories_to_add']:
-                report_lines.append(f"#### New Story: {item['filename']}")
-                report_lines.append("")
-                report_lines.append(f"**Wave:** {item.get('wave', 'N/A')} | **Epic:** {item.get('epic', 'N/A')} | **Story:** {item.get('story', 'N/A')}")
-                report_lines.append("")
-                # Show target scenarios
-                targets = item.get('target_scenarios', [scenario_name])
-                if len(targets) == 1:
-                    report_lines.append(f"**Target Scenario:** {targets[0]}")
-                else:
-                    report_lines.append(f"**Target Scenarios:** {', '.join(targets)}")
-                report_lines.append("")
-                report_lines.append(f"**Summary:** {item.get('summary', 'N/A')}")
-                report_lines.append("")
+    Each distinct workflow tree (by content) is scanned once and shared by
+    the projects using it; analysis cache entries are shared too (--cache-dir),
+    so scenarios identical across projects are analyzed once. Every project
+    still gets its own report, results file (--apply), journal and ledger.
+    Budgets (--max-cost, --deadline) apply per project.
 
-    # New Scenarios
-    if new_scenarios:
-        report_lines.append("## Proposed New Scenarios")
-        report_lines.append("")
-        for scenario in new_scenarios:
-            report_lines.append(f"### {scenario['scenario_name']}")
-            report_lines.append("")
-            report_lines.append(f"**Description:** {scenario.get('description', 'N/A')}")
-            report_lines.append("")
-            report_lines.append("**Suggested Stories:**")
-            for story in scenario.get('suggested_stories', []):
-                report_lines.append(f"- `{story['filename']}`: {story.get('summary', 'N/A')}")
-            report_lines.append("")
+    Returns {'report_path', 'projects': [{'name', 'root', 'summary' | 'error'}]}.
+    """
+    projects = resolve_projects(args.projects, logger)
+    if not projects:
+        logger.error(f"No project found for --projects {args.projects!r}")
+        sys.exit(1)
+    logger.info(f"Batch mode: {len(projects)} projects")
+
+    fleet_output = Path.cwd() / "_bmad-output" / "planning-artifacts"
+    if not args.cache_dir:
+        args.cache_dir = str(Path.cwd() / "_bmad-output" / ".cache" / "workflow-sync")
+
+    # Scan each distinct workflow tree once
+    trees: Dict[str, Dict] = {}
+    project_workflows = {}
+    for root in projects:
+        paths = get_project_paths(root)
+        key = workflow_tree_content_key(paths)
+        if key not in trees:
+            logger.info(f"Scanning workflow tree {key} (from {root})")
+            trees[key] = scan_all_workflows(paths, logger)
+        project_workflows[root] = trees[key]
+    logger.info(f"{len(trees)} distinct workflow tree(s) for {len(projects)} projects")
+
+    def analyze(root: Path) -> Dict:
+        name = project_label(root, projects)
+        project_logger = logger.getChild(re.sub(r'\W+', '_', name))
+        project_logger.addFilter(ProjectLogPrefix(name))
+        outcome = {'name': name, 'root': str(root)}
+        try:
+            outcome['summary'] = run_analysis(argparse.Namespace(**vars(args)), root, llm_config,
+                                              project_workflows[root], project_logger)
+        except SystemExit:
+            outcome['error'] = "analysis aborted (see log)"
+        except Exception as e:
+            project_logger.exception("Analysis failed")
+            outcome['error'] = str(e)
+        return outcome
 
-    # Write report
-    with open(output_path, 'w') as f:
-        f.write('\n'.join(report_lines))
+    # LLM calls are bounded by the shared rate limiter; threads beyond it only wait
+    workers = min(len(projects), llm_config.get('RATE_LIMIT_CONCURRENCY', RATE_LIMIT_DEFAULTS['RATE_LIMIT_CONCURRENCY']))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        outcomes = list(executor.map(analyze, projects))
 
-    logger.info(f"Report generated: {output_path}")
+    timestamp = datetime.now().strftime('%Y-%m-%d-%H%M')
+    report_path = fleet_output / f"{'[DRY-RUN]-' if args.dry_run else ''}workflow-fleet-report-{timestamp}.md"
+    generate_fleet_report(outcomes, len(trees), Path(args.cache_dir), report_path, logger)
+    return {'report_path': report_path, 'projects': outcomes}
 
 
 # ============================================================================
 # MAIN ORCHESTRATION
 # ============================================================================
 
-def main():
-    """Main orchestration flow."""
+def build_arg_parser() -> argparse.ArgumentParser:
+    """Command-line options (also the parameter defaults of worker 'analyze' requests)."""
     parser = argparse.ArgumentParser(
         description='BMAD Workflow ↔ Story Semantic Sync Analyzer',
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -951,24 +4575,47 @@ def main():
     parser.add_argument('--verbose', action='store_true',
                        help='Enable DEBUG logging')
     parser.add_argument('--scenario', type=str,
-                       help='Analyze single scenario: workflow-complet, quick-flow, document-project')
-
-    args = parser.parse_args()
-
-    # Setup logging
-    logger = setup_logging(args.verbose)
-
-    logger.info("=" * 60)
-    logger.info("BMAD Workflow ↔ Story Synchronization Analyzer")
-    logger.info("=" * 60)
-
-    if args.dry_run:
-        logger.info("DRY RUN MODE: No LLM API calls will be made")
-
-    # Load configuration
-    llm_config = load_llm_config(logger)
-
-    # Detect project root (vibe-kanban directory)
+                       help='Analyze single scenario (directory name under bmad-templates/stories/)')
+    parser.add_argument('--since', type=str, metavar='COMMIT|last-report',
+                       help='Only analyze scenarios/stories changed since a commit (delta report)')
+    parser.add_argument('--fresh', action='store_true',
+                       help='Ignore the journal of an interrupted run and start over')
+    parser.add_argument('--max-tokens-per-call', type=int, metavar='N',
+                       help='Split/trim prompts estimated above N input tokens, abort if impossible')
+    parser.add_argument('--max-cost', type=float, metavar='USD',
+                       help='Abort before any LLM call that would push the run cost above USD')
+    parser.add_argument('--call-timeout', type=float, default=DEFAULT_CALL_TIMEOUT, metavar='SECONDS',
+                       help=f'Per-call deadline; a slower call fails and is retried (default: {DEFAULT_CALL_TIMEOUT:.0f})')
+    parser.add_argument('--deadline', type=float, metavar='SECONDS',
+                       help='Total run deadline; no LLM call is started after it (progress is journaled)')
+    parser.add_argument('--hedge', nargs='?', const='p95', metavar='SECONDS|p95',
+                       help='Send a duplicate request when a call is slower than SECONDS '
+                            '(default: p95 latency of past calls), keep the first response')
+    parser.add_argument('--combined', action='store_true',
+                       help='Analyze all uncached scenarios in one LLM call sharing the workflow corpus '
+                            '(per-scenario calls when it exceeds the model context)')
+    parser.add_argument('--apply', nargs='?', const='latest', metavar='RESULTS_JSON',
+                       help='Apply the proposals of a results file (default: latest); with --dry-run, preview only')
+    parser.add_argument('--progress', type=str, metavar='fd:N|unix:PATH',
+                       help='Stream NDJSON progress events to a file descriptor or a listening unix socket')
+    parser.add_argument('--serve', nargs='?', const='stdio', metavar='stdio|unix:PATH',
+                       help='Run as a persistent JSON-RPC worker on stdin/stdout or a unix socket')
+    parser.add_argument('--queue', type=str, metavar='DIR',
+                       help='Distribute scenario analyses as jobs in a (shared) queue directory, merge their results')
+    parser.add_argument('--queue-worker', type=str, metavar='DIR',
+                       help='Run jobs from a queue directory until it has been idle for '
+                            f'{QUEUE_WORKER_IDLE_SECONDS}s')
+    parser.add_argument('--projects', type=str, metavar='LIST|GLOB',
+                       help='Analyze several projects (comma-separated paths or globs, @FILE for a list) '
+                            'concurrently with a shared workflow scan and cache, one combined report')
+    parser.add_argument('--cache-dir', type=str, metavar='DIR',
+                       help='Analysis cache shared between projects or checkouts '
+                            '(default: the project\'s own; with --projects: ./_bmad-output/.cache/workflow-sync)')
+    return parser
+
+
+def detect_project_root(logger: logging.Logger) -> Path:
+    """Find the vibe-kanban root from the current directory (exits if not found)."""
     # Look for markers: bmad-templates/, frontend/, crates/
     current_dir = Path.cwd()
     project_root = None
@@ -992,36 +4639,75 @@ def main():
         logger.error("Expected markers: bmad-templates/, frontend/, crates/")
         sys.exit(1)
 
-    # Setup paths
-    bmm_workflows_path = project_root / "bmad-templates" / "_bmad" / "bmm" / "workflows"
-    tea_workflows_path = project_root / "bmad-templates" / "_bmad" / "tea" / "workflows"
-    stories_base = project_root / "bmad-templates" / "stories"
-    output_base = project_root / "_bmad-output" / "planning-artifacts"
-    cache_base = project_root / "_bmad-output" / ".cache" / "workflow-sync"
+    return project_root
 
-    # Create cache directory
-    cache_base.mkdir(parents=True, exist_ok=True)
 
-    # TODO: Implement cache cleanup - remove files older than 30 days
-    # Currently cache grows indefinitely - consider: find cache_base -type f -mtime +30 -delete
+def get_project_paths(project_root: Path, shared_cache: Optional[Path] = None) -> Dict[str, Path]:
+    """
+    Input and output locations of a project. Analysis cache entries go to
+    shared_cache when given (--cache-dir); the run journal and change
+    snapshots always stay in the project's own cache.
+    """
+    cache = project_root / "_bmad-output" / ".cache" / "workflow-sync"
+    return {
+        'root': project_root,
+        'bmm_workflows': project_root / "bmad-templates" / "_bmad" / WORKFLOW_DIRS['BMM'],
+        'tea_workflows': project_root / "bmad-templates" / "_bmad" / WORKFLOW_DIRS['TEA'],
+        'stories': project_root / "bmad-templates" / "stories",
+        'output': project_root / "_bmad-output" / "planning-artifacts",
+        'cache': cache,
+        'analysis_cache': shared_cache or cache,
+    }
 
-    # Scan workflows from both BMM and TEA
+
+def scan_all_workflows(paths: Dict[str, Path], logger: logging.Logger) -> Dict[str, Dict[str, WorkflowRecord]]:
+    """Scan BMM and TEA workflows into one category index."""
     logger.info("Scanning BMM workflows...")
-    bmm_workflows = scan_workflows(bmm_workflows_path, logger)
+    bmm_workflows = scan_workflows(paths['bmm_workflows'], logger, paths['root'])
 
     logger.info("Scanning TEA workflows...")
-    tea_workflows = scan_workflows(tea_workflows_path, logger)
+    tea_workflows = scan_workflows(paths['tea_workflows'], logger, paths['root'])
 
     # Merge workflows from both sources
     all_workflows = {**bmm_workflows, **tea_workflows}
     logger.info(f"Total workflow categories: {len(all_workflows)} (BMM: {len(bmm_workflows)}, TEA: {len(tea_workflows)})")
+    PROGRESS.emit('scan_complete', target='workflows', categories=len(all_workflows),
+                  workflows=sum(len(wfs) for wfs in all_workflows.values()))
+    return all_workflows
 
-    # Define scenarios
-    scenarios = {
-        'workflow-complet': stories_base / 'workflow-complet',
-        'quick-flow': stories_base / 'quick-flow',
-        'document-project': stories_base / 'document-project'
-    }
+
+def run_analysis(
+    args: argparse.Namespace,
+    project_root: Path,
+    llm_config: Dict,
+    all_workflows: Dict,
+    logger: logging.Logger
+) -> Dict[str, Any]:
+    """
+    Analyze the scenarios selected by args and write the report.
+
+    Shared by the CLI and the worker. Exits (SystemExit) on invalid options
+    or when a budget aborts the run, like the CLI always did.
+
+    Returns {'report_path', 'results_path', 'ledger_path', 'analysis_results',
+    'new_scenarios', 'cost'}.
+    """
+    paths = get_project_paths(project_root, Path(args.cache_dir) if args.cache_dir else None)
+    stories_base = paths['stories']
+    output_base = paths['output']
+    cache_base = paths['cache']
+    analysis_cache = paths['analysis_cache']
+
+    # Create cache directories
+    cache_base.mkdir(parents=True, exist_ok=True)
+    analysis_cache.mkdir(parents=True, exist_ok=True)
+
+    # TODO: Implement cache cleanup - remove files older than 30 days
+    # Currently cache grows indefinitely - consider: find cache_base -type f -mtime +30 -delete
+
+    # Discover scenarios (every story directory, including debug)
+    scenarios = discover_scenarios(stories_base, logger)
+    scenario_names = list(scenarios.keys())
 
     # Filter to single scenario if specified
     if args.scenario:
@@ -1029,7 +4715,93 @@ def main():
             logger.error(f"Unknown scenario: {args.scenario}")
             logger.error(f"Valid scenarios: {', '.join(scenarios.keys())}")
             sys.exit(1)
-        scenarios = {args.scenario: scenarios[args.scenario]}
+
+    # Scan all scenarios up-front so identical stories are analyzed only once; the story
+    # index spans every scenario, also when --since or --scenario narrow the analysis
+    all_stories = {name: scan_stories(path, logger) for name, path in scenarios.items()}
+    story_index = build_story_index(all_stories)
+
+    # Incremental mode: scope the analysis to what git reports as changed
+    delta = None
+    if args.since:
+        since_commit = resolve_since_commit(args.since, project_root, output_base, logger)
+        changed_paths = get_changed_paths(since_commit, project_root, logger)
+        delta = scope_changes(changed_paths, scenario_names, logger)
+        delta.update(since_commit=since_commit, changed_paths=changed_paths)
+        scenarios = {name: path for name, path in scenarios.items() if name in delta['scenarios']}
+
+    if args.scenario:
+        scenarios = {name: path for name, path in scenarios.items() if name == args.scenario}
+    scenario_stories = {name: all_stories[name] for name in scenarios}
+    assign_story_owners(scenario_stories, logger)
+    PROGRESS.emit('scan_complete', target='stories',
+                  scenarios={name: len(stories) for name, stories in scenario_stories.items()})
+
+    # Scenarios affected only by story edits re-analyze just the changed stories
+    if delta:
+        for name, stories in scenario_stories.items():
+            if delta['scenarios'][name] == 'stories':
+                scope_stories_to_changes(stories, delta['stories'][name])
+
+    # Cost ledger enforces budgets (cost, run deadline) before every call
+    if args.hedge and args.hedge != 'p95':
+        try:
+            float(args.hedge)
+        except ValueError:
+            logger.error(f"Invalid --hedge: {args.hedge!r} (expected seconds or p95)")
+            sys.exit(1)
+    latency_history = load_latency_history(output_base, logger) if args.hedge == 'p95' else None
+    ledger = CostLedger(max_cost=args.max_cost, max_tokens_per_call=args.max_tokens_per_call,
+                        call_timeout=args.call_timeout, deadline=args.deadline, hedge=args.hedge,
+                        latency_history=latency_history)
+    timestamp = datetime.now().strftime('%Y-%m-%d-%H%M')
+    ledger_path = output_base / f"workflow-sync-ledger-{timestamp}.json"
+
+    # Run journal lets an interrupted run resume where it stopped (spend included)
+    journal = None
+    if not args.dry_run:
+        fingerprint = compute_run_fingerprint(all_workflows, all_stories)
+        journal = RunJournal.open(cache_base, fingerprint, logger, fresh=args.fresh)
+        ledger.entries = list(journal.data['ledger'])
+
+    def abort_on_budget(error: BudgetExceededError):
+        logger.error(f"Budget exceeded, aborting before LLM call: {error}")
+        logger.error("Progress is journaled: rerun (with a higher budget) to resume")
+        ledger.save(ledger_path, logger)
+        sys.exit(1)
+
+    # Queue mode: uncached scenarios are analyzed by queue workers, merged below
+    queue = WorkQueue(Path(args.queue)) if args.queue and not args.dry_run else None
+    run_id = f"{datetime.now():%Y%m%d%H%M%S}-{socket.gethostname()}-{os.getpid()}"
+    queued: Dict[str, Dict] = {}
+    queue_jobs: List[Dict] = []
+
+    # Combined mode: uncached scenarios (and new scenario detection) in one call sharing the
+    # workflow payload; its results are cached per scenario below like separate analyses
+    combined: Dict[str, Dict] = {}
+    if args.combined and queue:
+        logger.warning("--combined is ignored with --queue (scenarios are distributed as separate jobs)")
+    elif args.combined and not args.dry_run:
+        pending = {name: stories for name, stories in scenario_stories.items()
+                   if not (analysis_cache / f"{get_cache_key(all_workflows, name, stories)}.json").exists()}
+        uncovered = find_uncovered_categories(all_workflows, scenario_names)
+        new_scenarios_key = get_new_scenarios_cache_key(all_workflows, uncovered, scenario_names)
+        if not uncovered or (analysis_cache / f"{new_scenarios_key}.json").exists():
+            uncovered = []
+        if len(pending) + bool(uncovered) > 1:
+            try:
+                outcome = analyze_scenarios_combined(all_workflows, pending, llm_config, logger,
+                                                     ledger, uncovered)
+            except BudgetExceededError as e:
+                abort_on_budget(e)
+            except Exception as e:
+                logger.warning(f"Combined analysis failed ({e}), falling back to per-scenario calls")
+                outcome = None
+            if outcome:
+                combined = outcome['scenarios']
+                if outcome['new_scenarios'] is not None:
+                    save_to_cache(analysis_cache, new_scenarios_key,
+                                  {'new_scenarios': outcome['new_scenarios']}, logger)
 
     # Analyze each scenario
     analysis_results = {}
@@ -1039,17 +4811,17 @@ def main():
         logger.info(f"Processing scenario: {scenario_name}")
         logger.info(f"{'='*60}")
 
-        # Scan stories
-        stories = scan_stories(scenario_path, logger)
+        stories = scenario_stories[scenario_name]
 
         # Check cache (include story checksums for proper invalidation)
         cache_key = get_cache_key(all_workflows, scenario_name, stories)
-        cached_result = load_from_cache(cache_base, cache_key, logger)
+        cached_result = load_from_cache(analysis_cache, cache_key, logger)
 
         if args.dry_run:
             if cached_result:
                 logger.info("Using cached analysis result")
                 analysis_results[scenario_name] = cached_result
+                emit_scenario_progress(scenario_name, cached_result, cached=True)
             else:
                 logger.warning("No cache found for dry-run, using mock data")
                 analysis_results[scenario_name] = {
@@ -1060,46 +4832,188 @@ def main():
         elif cached_result:
             logger.info("Using cached analysis result")
             analysis_results[scenario_name] = cached_result
+            emit_scenario_progress(scenario_name, cached_result, cached=True)
+        elif scenario_name in combined:
+            result = combined[scenario_name]
+            save_to_cache(analysis_cache, cache_key, result, logger)
+            analysis_results[scenario_name] = result
+            emit_scenario_progress(scenario_name, result, cached=False)
+            save_scenario_snapshot(cache_base, scenario_name, stories, all_workflows, logger)
+            journal.scenario_done(scenario_name, cache_key, ledger.entries)
+        elif queue:
+            change_ratio = compute_change_ratio(cache_base, scenario_name, stories, all_workflows, logger)
+            try:
+                jobs = plan_scenario_jobs(run_id, project_root, scenario_name, stories, all_workflows,
+                                          cache_key, change_ratio, ledger, logger)
+            except BudgetExceededError as e:
+                abort_on_budget(e)
+            queue_jobs.extend(jobs)
+            queued[scenario_name] = {'jobs': [job['id'] for job in jobs], 'cache_key': cache_key}
         else:
-            # Perform LLM analysis
-            result = analyze_scenario(all_workflows, stories, scenario_name, llm_config, logger)
+            # Perform LLM analysis (once across concurrent runs sharing the cache)
+            def analyze():
+                change_ratio = compute_change_ratio(cache_base, scenario_name, stories, all_workflows, logger)
+                return analyze_scenario(all_workflows, stories, scenario_name, llm_config, logger,
+                                        ledger, journal, change_ratio)
+            try:
+                result, computed = single_flight(analysis_cache, cache_key, analyze, logger)
+            except BudgetExceededError as e:
+                abort_on_budget(e)
+            analysis_results[scenario_name] = result
+            emit_scenario_progress(scenario_name, result, cached=not computed)
+
+            if computed:
+                save_scenario_snapshot(cache_base, scenario_name, stories, all_workflows, logger)
+            journal.scenario_done(scenario_name, cache_key, ledger.entries)
+
+    if queued:
+        def scenario_merged(scenario_name: str, result: Dict):
+            cache_key = queued[scenario_name]['cache_key']
+            save_to_cache(analysis_cache, cache_key, result, logger)
+            save_scenario_snapshot(cache_base, scenario_name, scenario_stories[scenario_name], all_workflows, logger)
+            journal.scenario_done(scenario_name, cache_key, ledger.entries)
+            emit_scenario_progress(scenario_name, result, cached=False)
             analysis_results[scenario_name] = result
 
-            # Save to cache
-            save_to_cache(cache_base, cache_key, result, logger)
+        enqueue_jobs(queue, queue_jobs, ledger, logger)
+        logger.info(f"Waiting for {len(queue_jobs)} queued job(s) in {queue.root}")
+        try:
+            collect_queued_scenarios(queue, queued, llm_config, ledger, logger, scenario_merged)
+        except BudgetExceededError as e:
+            abort_on_budget(e)
+        except QueueJobError as e:
+            logger.error(str(e))
+            logger.error("Completed scenarios are cached: rerun to retry the failed ones")
+            ledger.save(ledger_path, logger)
+            sys.exit(1)
+        analysis_results = {name: analysis_results[name] for name in scenarios}
+
+    # Share verdicts of stories present in several scenarios
+    # (in delta runs, unaffected scenarios sharing a story receive the verdict too)
+    analysis_results = share_story_verdicts(analysis_results, scenario_stories, story_index, logger,
+                                            receivers=scenario_names if delta else ())
 
     # Detect new scenarios
     logger.info(f"\n{'='*60}")
     logger.info("Detecting new scenarios")
     logger.info(f"{'='*60}")
 
-    if args.dry_run:
-        logger.info("Skipping new scenario detection in dry-run mode")
-        new_scenarios = []
-    else:
+    try:
         new_scenarios = detect_new_scenarios(
             all_workflows,
-            list(scenarios.keys()),
+            scenario_names,
             llm_config,
-            logger
+            logger,
+            ledger,
+            cache_path=analysis_cache,
+            dry_run=args.dry_run
         )
+    except BudgetExceededError as e:
+        logger.warning(f"Budget exceeded, skipping new scenario detection: {e}")
+        new_scenarios = []
 
     # Generate report
-    timestamp = datetime.now().strftime('%Y-%m-%d-%H%M')
-    report_filename = f"workflow-sync-report-{timestamp}.md"
+    report_filename = f"workflow-sync-{'delta-' if delta else ''}report-{timestamp}.md"
     if args.dry_run:
         report_filename = f"[DRY-RUN]-{report_filename}"
 
     report_path = output_base / report_filename
 
-    generate_report(analysis_results, new_scenarios, all_workflows, report_path, logger)
+    generate_report(analysis_results, new_scenarios, all_workflows, report_path, logger, ledger, delta, project_root)
+    results_path = None
+    if not args.dry_run:
+        results_path = output_base / f"workflow-sync-{'delta-' if delta else ''}results-{timestamp}.json"
+        save_analysis_results(analysis_results, new_scenarios, all_stories, project_root, results_path, logger)
+    if ledger.entries:
+        ledger.save(ledger_path, logger)
+    if journal:
+        journal.complete(ledger.entries)
+    PROGRESS.emit('run_complete', report=report_path, results=results_path, cost=ledger.summary())
+
+    return {
+        'report_path': report_path,
+        'results_path': results_path,
+        'ledger_path': ledger_path if ledger.entries else None,
+        'analysis_results': analysis_results,
+        'new_scenarios': new_scenarios,
+        'cost': ledger.summary()
+    }
+
+
+def main():
+    """Main orchestration flow."""
+    args = build_arg_parser().parse_args()
+
+    # Setup logging
+    logger = setup_logging(args.verbose)
+
+    logger.info("=" * 60)
+    logger.info("BMAD Workflow ↔ Story Synchronization Analyzer")
+    logger.info("=" * 60)
+
+    if args.dry_run:
+        logger.info("DRY RUN MODE: No LLM API calls will be made")
+
+    if args.progress:
+        PROGRESS.open(args.progress, logger)
+
+    # Queue workers take the project of each job, run from any directory
+    if args.queue_worker:
+        run_queue_worker(args.queue_worker, logger)
+        return
+
+    # Batch mode analyzes the listed projects instead of the enclosing one
+    if args.projects:
+        batch = run_projects(args, load_llm_config(logger), logger)
+        failed = [o['name'] for o in batch['projects'] if 'error' in o]
+        logger.info(f"\n{'='*60}")
+        logger.info("BATCH ANALYSIS COMPLETE")
+        logger.info(f"{'='*60}")
+        logger.info(f"Combined report saved to: {batch['report_path']}")
+        if failed:
+            logger.error(f"Failed projects: {', '.join(failed)}")
+            sys.exit(1)
+        return
+
+    # Detect project root (vibe-kanban directory)
+    project_root = detect_project_root(logger)
+    paths = get_project_paths(project_root)
+
+    # Worker mode keeps the workflow index, config and HTTP clients warm between requests
+    if args.serve:
+        serve(args.serve, AnalyzerWorker(project_root, logger), logger)
+        return
+
+    # Apply mode works from a saved results file, no analysis or LLM config needed
+    if args.apply:
+        run_apply(args.apply, project_root, paths['output'], logger, dry_run=args.dry_run)
+        return
+
+    # Load configuration
+    llm_config = load_llm_config(logger)
+
+    # Scan workflows from both BMM and TEA
+    all_workflows = scan_all_workflows(paths, logger)
+
+    summary = run_analysis(args, project_root, llm_config, all_workflows, logger)
 
     # Final summary
     logger.info(f"\n{'='*60}")
     logger.info("ANALYSIS COMPLETE")
     logger.info(f"{'='*60}")
-    logger.info(f"Report saved to: {report_path}")
-    logger.info("Review the report and implement the suggested changes.")
+    logger.info(f"Report saved to: {summary['report_path']}")
+    cost = summary['cost']
+    logger.info(f"LLM cost: ${cost['actual_cost']:.4f} actual / ${cost['estimated_cost']:.4f} estimated "
+                f"({cost['calls']} calls)")
+    for tier, stats in cost['by_tier'].items():
+        logger.info(f"  {tier}: {stats['calls']} calls, ${stats['actual_cost']:.4f}, "
+                    f"{stats['latency_seconds']:.1f}s total latency")
+    if cost['hedged_calls']:
+        logger.info(f"  hedged: {cost['hedged_calls']} calls, ${cost['hedge_extra_cost']:.4f} extra")
+    peak_rss = get_peak_rss_mb()
+    if peak_rss is not None:
+        logger.info(f"Peak RSS: {peak_rss} MB")
+    logger.info("Review the report, then apply the suggested changes with --apply (preview with --apply --dry-run).")
 
 
 if __name__ == "__main__":